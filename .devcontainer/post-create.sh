@@ -28,3 +28,4 @@ sudo chmod a+x /usr/local/bin/protoc
 rm -f protoc.zip
 
 protoc --python_out=./ --pyi_out=./ ./mahjongsoul_sniffer/mahjongsoul.proto
+PYTHONPATH=. python3 bin/generate-descriptor-tables.py
@@ -6,5 +6,6 @@ rm -rf /opt/mahjongsoul-sniffer/*
 rm -rf /srv/mahjongsoul-sniffer/*
 cp -rf /opt/mahjongsoul-sniffer.orig/* .
 protoc --python_out=. mahjongsoul_sniffer/mahjongsoul.proto
+PYTHONPATH=. python3 bin/generate-descriptor-tables.py
 (cd api-visualizer/web-server/vue && yarn install && yarn build)
 touch build.timestamp
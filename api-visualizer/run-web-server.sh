@@ -10,13 +10,17 @@ while [[ ! -f build.timestamp ]]; do sleep 1; done
 
 set -x
 
-# `api-visualizer/sniffer.py` を addon として mitmproxy を起動する．
+# `api-visualizer/sniffer.py` を addon として mitmproxy を起動する．addon は
+# プロキシが接続を受け付け始めると `$MAHJONGSOUL_SNIFFER_READY_FILE` を作る．
+MAHJONGSOUL_SNIFFER_READY_FILE=$(mktemp -u)
+export MAHJONGSOUL_SNIFFER_READY_FILE
 mitmdump -qs api-visualizer/sniffer.py &
 
 set +x
 
-# mitmproxy の証明書が作成されるまで待つ
-while [[ ! -f ~/.mitmproxy/mitmproxy-ca-cert.pem ]]; do sleep 1; done
+# addon の準備ができて mitmproxy の証明書が作成されるまで待つ
+while [[ ! -f $MAHJONGSOUL_SNIFFER_READY_FILE || ! -f ~/.mitmproxy/mitmproxy-ca-cert.pem ]]; do sleep 0.1; done
+rm -f "$MAHJONGSOUL_SNIFFER_READY_FILE"
 
 set -x
 
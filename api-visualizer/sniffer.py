@@ -15,34 +15,17 @@ _THIS_FILENAME = inspect.getframeinfo(inspect.currentframe()).filename
 _THIS_DIR_PATH = Path(_THIS_FILENAME).resolve().parent
 sys.path.append(str(_THIS_DIR_PATH))
 
+import mahjongsoul_sniffer.descriptor_tables as descriptor_tables_
 import mahjongsoul_sniffer.logging as logging_
-from mahjongsoul_sniffer import mahjongsoul_pb2
+import mahjongsoul_sniffer.readiness as readiness_
 from mahjongsoul_sniffer.redis_mirroring import RedisMirroring
 
 logging_.initialize(module_name="api_visualizer", service_name="sniffer")
 
 
-_METHOD_NAMES = [
-    "." + mdesc.full_name
-    for sdesc in mahjongsoul_pb2.DESCRIPTOR.services_by_name.values()
-    for mdesc in sdesc.methods
-]
-
-
-_MESSAGE_TYPE_NAMES = [
-    "." + tdesc.full_name
-    for tdesc in mahjongsoul_pb2.DESCRIPTOR.message_types_by_name.values()
-]
-
-
 _REDIS_MIRRORING_CONFIG: dict[str, dict] = {"websocket": {}}
-for mname in _METHOD_NAMES:
-    _REDIS_MIRRORING_CONFIG["websocket"][mname] = {
-        "request_direction": "both",
-        "action": {"command": "RPUSH", "key": "api-call-queue"},
-    }
-for tname in _MESSAGE_TYPE_NAMES:
-    _REDIS_MIRRORING_CONFIG["websocket"][tname] = {
+for name in descriptor_tables_.get_names():
+    _REDIS_MIRRORING_CONFIG["websocket"][name] = {
         "request_direction": "both",
         "action": {"command": "RPUSH", "key": "api-call-queue"},
     }
@@ -54,13 +37,37 @@ _redis_mirroring = RedisMirroring(
 )
 
 
+def running() -> None:
+    readiness_.notify()
+
+
+def response(flow: HTTPFlow) -> None:
+    try:
+        _redis_mirroring.on_http_response(flow)
+    except Exception:
+        logging.exception(
+            "`RedisMirroring.on_http_response` threw an exception.",
+        )
+
+
 def websocket_message(flow: HTTPFlow) -> None:
     if (websocket_data := flow.websocket) is None:
         msg = "HTTP flow does not contain WebSocket data."
         raise RuntimeError(msg)
     try:
-        _redis_mirroring.on_websocket_message(websocket_data)
+        _redis_mirroring.on_websocket_message(
+            websocket_data,
+            flow_id=flow.id,
+        )
     except Exception:
         logging.exception(
             "`RedisMirroring.on_websocket_message` threw an exception.",
         )
+
+
+def websocket_end(flow: HTTPFlow) -> None:
+    _redis_mirroring.on_websocket_end(flow.id)
+
+
+def done() -> None:
+    _redis_mirroring.close()
@@ -2,20 +2,22 @@
 # ruff: noqa: N999
 
 import base64
+import functools
+import importlib
 import os
 import subprocess
+from types import ModuleType
 from typing import TYPE_CHECKING, Any
 
 import flask
 from google.protobuf.descriptor import FieldDescriptor
 from google.protobuf.message import DecodeError, Message
-from google.protobuf.message_factory import GetMessageClass
 
 if TYPE_CHECKING:
     from google.protobuf.descriptor import Descriptor
 
+import mahjongsoul_sniffer.descriptor_tables as descriptor_tables_
 import mahjongsoul_sniffer.redis as redis_
-from mahjongsoul_sniffer import mahjongsoul_pb2
 
 app = flask.Flask(
     __name__,
@@ -53,15 +55,28 @@ def mitmproxy_certificate() -> flask.Response:
     return response
 
 
-_MESSAGE_TYPE_MAP = {}
-for sdesc in mahjongsoul_pb2.DESCRIPTOR.services_by_name.values():
-    for mdesc in sdesc.methods:
-        _MESSAGE_TYPE_MAP["." + mdesc.full_name] = (
-            GetMessageClass(mdesc.input_type),
-            GetMessageClass(mdesc.output_type),
-        )
-for tdesc in mahjongsoul_pb2.DESCRIPTOR.message_types_by_name.values():
-    _MESSAGE_TYPE_MAP["." + tdesc.full_name] = (GetMessageClass(tdesc), None)
+@functools.cache
+def _get_mahjongsoul_pb2() -> ModuleType:
+    # Importing `mahjongsoul_pb2` is slow, especially with the pure Python
+    # implementation of protobuf, so it is deferred until the first API
+    # call is parsed.
+    return importlib.import_module("mahjongsoul_sniffer.mahjongsoul_pb2")
+
+
+def _get_message_class(full_name: str) -> type[Message]:
+    return getattr(_get_mahjongsoul_pb2(), full_name.rsplit(".", 1)[1])
+
+
+@functools.cache
+def _get_message_classes(
+    name: str,
+) -> tuple[type[Message], type[Message] | None] | None:
+    types = descriptor_tables_.get_method_types(name)
+    if types is not None:
+        return (_get_message_class(types[0]), _get_message_class(types[1]))
+    if name in descriptor_tables_.get_names():
+        return (_get_message_class(name), None)
+    return None
 
 
 _SCALAR_VALUE_TYPE_NAME_MAP = {
@@ -85,7 +100,7 @@ _SCALAR_VALUE_TYPE_NAME_MAP = {
 
 
 def _unwrap(data: bytes) -> tuple[str, bytes]:
-    parse = mahjongsoul_pb2.Wrapper()
+    parse = _get_mahjongsoul_pb2().Wrapper()
     parse.ParseFromString(data)
     return (parse.name, parse.data)
 
@@ -128,10 +143,10 @@ def _decode_bytes(buf: bytes) -> bytes:
 
 
 def _parse_action_prototype(msg: Message) -> Message | dict[str, Any]:
-    if not isinstance(msg, mahjongsoul_pb2.ActionPrototype):
+    if not isinstance(msg, _get_mahjongsoul_pb2().ActionPrototype):
         return msg
 
-    wrapped_msg: Message = getattr(mahjongsoul_pb2, msg.name)()
+    wrapped_msg: Message = getattr(_get_mahjongsoul_pb2(), msg.name)()
     try:
         wrapped_msg.ParseFromString(msg.data)
     except DecodeError:
@@ -172,7 +187,7 @@ def _parse_impl(
             return _parse_action_prototype(val)
 
     if isinstance(val, bytes):
-        msg = mahjongsoul_pb2.Wrapper()
+        msg = _get_mahjongsoul_pb2().Wrapper()
         try:
             msg.ParseFromString(val)
         except DecodeError:
@@ -185,8 +200,9 @@ def _parse_impl(
         name = msg.name
         data = msg.data
 
-        if name in _MESSAGE_TYPE_MAP:
-            wrapped_msg: Message = _MESSAGE_TYPE_MAP[name][0]()
+        message_classes = _get_message_classes(name)
+        if message_classes is not None:
+            wrapped_msg: Message = message_classes[0]()
         else:
             return {
                 "wrapped": False,
@@ -241,10 +257,14 @@ def _parse_top_level(
     *,
     is_response: bool,
 ) -> Message | dict[str, Any]:
+    message_classes = _get_message_classes(name)
+    if message_classes is None:
+        msg = f"""{name}: An unknown method or message type."""
+        raise RuntimeError(msg)
     if not is_response:
-        msg: Message = _MESSAGE_TYPE_MAP[name][0]()
+        msg: Message = message_classes[0]()
     else:
-        msg: Message = _MESSAGE_TYPE_MAP[name][1]()
+        msg: Message = message_classes[1]()
 
     try:
         msg.ParseFromString(data)
@@ -288,53 +308,61 @@ stderr: {stderr}"""
     }
 
 
-@app.route("/api-calls.json")
-def fetch_api_calls() -> flask.Response:
-    api_calls = []
-    while True:
-        api_call = _redis.lpop_websocket_message("api-call-queue")
-        if api_call is None:
-            break
+def _parse_api_call(api_call: dict) -> dict:
+    request_direction = api_call["request_direction"]
+    timestamp = api_call["timestamp"]
 
-        request_direction = api_call["request_direction"]
-        timestamp = api_call["timestamp"]
+    request = api_call["request"]
+    if request[0] == 1:
+        name, request_data = _unwrap(request[1:])
+    elif request[0] == 2:
+        name, request_data = _unwrap(request[3:])
+    else:
+        msg = f"""{request[0]}: An unknown type in a request."""
+        raise RuntimeError(msg)
+    request_parse = _parse_top_level(name, request_data, is_response=False)
 
-        request = api_call["request"]
-        if request[0] == 1:
-            name, request_data = _unwrap(request[1:])
-        elif request[0] == 2:
-            name, request_data = _unwrap(request[3:])
-        else:
-            msg = f"""{request[0]}: An unknown type in a request."""
+    response = api_call["response"]
+    response_parse = None
+    if response is not None:
+        if response[0] != 3:
+            msg = f"""{response[0]}: An unknown type in a response."""
             raise RuntimeError(msg)
-        request_parse = _parse_top_level(name, request_data, is_response=False)
-
-        response = api_call["response"]
-        response_parse = None
-        if response is not None:
-            if response[0] != 3:
-                msg = f"""{response[0]}: An unknown type in a response."""
-                raise RuntimeError(msg)
-            _, response_data = _unwrap(response[3:])
-            if _ != "":
-                msg = f"""{_}: A response has a name."""
-                raise RuntimeError(msg)
-            response_parse = _parse_top_level(
-                name,
-                response_data,
-                is_response=True,
-            )
-        elif request[0] != 1:
-            msg = """A request does not expect any response but has one."""
+        _, response_data = _unwrap(response[3:])
+        if _ != "":
+            msg = f"""{_}: A response has a name."""
             raise RuntimeError(msg)
+        response_parse = _parse_top_level(
+            name,
+            response_data,
+            is_response=True,
+        )
+    elif request[0] != 1:
+        msg = """A request does not expect any response but has one."""
+        raise RuntimeError(msg)
 
-        api_call = {
-            "name": name,
-            "request_direction": request_direction,
-            "timestamp": int(timestamp.timestamp()),
-            "request": request_parse,
-            "response": response_parse,
-        }
-        api_calls.append(api_call)
+    return {
+        "name": name,
+        "request_direction": request_direction,
+        "timestamp": int(timestamp.timestamp()),
+        "request": request_parse,
+        "response": response_parse,
+    }
+
+
+_FETCH_BATCH_SIZE = 1000
+
+
+@app.route("/api-calls.json")
+def fetch_api_calls() -> flask.Response:
+    api_calls = []
+    while True:
+        popped_api_calls = _redis.pop_websocket_messages(
+            "api-call-queue",
+            _FETCH_BATCH_SIZE,
+        )
+        if len(popped_api_calls) == 0:
+            break
+        api_calls.extend(_parse_api_call(e) for e in popped_api_calls)
 
     return flask.json.jsonify(api_calls)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import argparse
+import pathlib
+import random
+import tempfile
+import time
+
+import zstandard
+
+from mahjongsoul_sniffer.game_detail_compression import Codec
+
+
+def _measure(label: str, codec: Codec, corpus: list[bytes]) -> None:
+    start_time = time.perf_counter()
+    compressed = [codec.compress(data) for data in corpus]
+    compress_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for data in compressed:
+        codec.decompress(data, codec.encoding)
+    decompress_time = time.perf_counter() - start_time
+
+    original_size = sum(len(data) for data in corpus)
+    compressed_size = sum(len(data) for data in compressed)
+    print(
+        f"{label}: ratio {original_size / compressed_size:.2f}"
+        f" ({compressed_size} bytes),"
+        f" compress {original_size / compress_time / 1e6:.1f} MB/s,"
+        f" decompress {original_size / decompress_time / 1e6:.1f} MB/s"
+        f" ({len(corpus) / decompress_time:.0f} objects/s)",
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare compression of game details in a local corpus.",
+    )
+    parser.add_argument(
+        "corpus_path",
+        type=pathlib.Path,
+        help="A directory with raw game-detail objects.",
+    )
+    parser.add_argument("--dictionary-size", type=int, default=112640)
+    parser.add_argument(
+        "--training-fraction",
+        type=float,
+        default=0.5,
+        help="The fraction of the corpus used to train the dictionary.",
+    )
+    parser.add_argument(
+        "--save-dictionary",
+        type=pathlib.Path,
+        help="Write the trained dictionary to this file.",
+    )
+    args = parser.parse_args()
+
+    corpus = [
+        p.read_bytes() for p in args.corpus_path.rglob("*") if p.is_file()
+    ]
+    if len(corpus) == 0:
+        msg = f"{args.corpus_path}: No game detail is found."
+        raise RuntimeError(msg)
+    print(
+        f"corpus: {len(corpus)} objects,"
+        f" {sum(len(data) for data in corpus)} bytes",
+    )
+
+    # 辞書の学習に使わなかったオブジェクトで辞書付き zstd を評価する．
+    random.seed(0)
+    shuffled = random.sample(corpus, len(corpus))
+    training_size = max(1, int(len(shuffled) * args.training_fraction))
+    training, evaluation = shuffled[:training_size], shuffled[training_size:]
+    if len(evaluation) == 0:
+        evaluation = training
+
+    _measure("gzip", Codec(encoding="gzip"), corpus)
+    _measure("zstd", Codec(encoding="zstd"), corpus)
+
+    dictionary = zstandard.train_dictionary(args.dictionary_size, training)
+    if args.save_dictionary is not None:
+        args.save_dictionary.write_bytes(dictionary.as_bytes())
+        dictionary_path = args.save_dictionary
+    else:
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(dictionary.as_bytes())
+        dictionary_path = pathlib.Path(f.name)
+    try:
+        _measure(
+            "zstd + dictionary (held-out)",
+            Codec(encoding="zstd", dictionary_path=dictionary_path),
+            evaluation,
+        )
+        _measure(
+            "zstd (held-out)",
+            Codec(encoding="zstd"),
+            evaluation,
+        )
+    finally:
+        if args.save_dictionary is None:
+            dictionary_path.unlink()
+
+
+if __name__ == "__main__":
+    main()
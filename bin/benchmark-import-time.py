@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+_REPOSITORY_PATH = Path(__file__).resolve().parent.parent
+
+# 各スクリプトを新しいプロセスで読み込むまでの時間を測る．mitmdump や
+# Flask 自体の import はどのみち必要なので，測定の前に済ませておく．
+_TARGETS = {
+    "api-visualizer/sniffer.py": "mitmproxy.http",
+    "game-abstract-crawler/sniffer.py": "mitmproxy.http",
+    "game-detail-crawler/sniffer.py": "mitmproxy.http",
+    "api-visualizer/web-server/__init__.py": "flask",
+}
+
+_CHILD_SCRIPT = """\
+import os
+import runpy
+import sys
+import time
+
+import {preload}
+
+start = time.perf_counter()
+runpy.run_path(sys.argv[1])
+print(time.perf_counter() - start, flush=True)
+# Do not wait for the threads started by the script.
+os._exit(0)
+"""
+
+
+def _measure(target: str, preload: str) -> float:
+    env = dict(os.environ)
+    python_path = [str(_REPOSITORY_PATH)]
+    if "PYTHONPATH" in env:
+        python_path.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(python_path)
+
+    proc = subprocess.run(  # noqa: S603
+        [
+            sys.executable,
+            "-c",
+            _CHILD_SCRIPT.format(preload=preload),
+            str(_REPOSITORY_PATH / target),
+        ],
+        capture_output=True,
+        check=True,
+        cwd=_REPOSITORY_PATH,
+        env=env,
+    )
+    return float(proc.stdout.decode("UTF-8").splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure the time to load the sniffer addons and the"
+        " API visualizer web server in a fresh process.",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("targets", nargs="*", metavar="target")
+    args = parser.parse_args()
+    for target in args.targets:
+        if target not in _TARGETS:
+            parser.error(f"{target}: An unknown target.")
+
+    for target in args.targets or _TARGETS:
+        # 1 回目は `.pyc` の作成が入るので捨てる．
+        _measure(target, _TARGETS[target])
+        times = [
+            _measure(target, _TARGETS[target]) for _ in range(args.repeat)
+        ]
+        print(
+            f"{target}: median {statistics.median(times) * 1000:8.1f} ms,"
+            f" min {min(times) * 1000:8.1f} ms",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import argparse
+import time
+
+from mitmproxy.websocket import WebSocketData
+
+import mahjongsoul_sniffer.config as config_
+from mahjongsoul_sniffer.frame_capture import make_websocket_data
+from mahjongsoul_sniffer.redis_mirroring import RedisMirroring
+
+_REDIS_MIRRORING_CONFIG = {
+    "websocket": {
+        ".lq.Lobby.loginBeat": {
+            "request_direction": "outbound",
+            "action": {
+                "command": "SET",
+                "key": "login-beat",
+            },
+        },
+        ".lq.Lobby.fetchGameRecord": {
+            "request_direction": "outbound",
+            "action": {
+                "command": "RPUSH",
+                "key": "game-detail-list",
+            },
+        },
+        ".lq.NotifyAccountUpdate": {
+            "request_direction": "inbound",
+            "action": "NOP",
+        },
+    },
+}
+
+
+def _encode_varint(value: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value == 0:
+            encoded.append(byte)
+            return bytes(encoded)
+        encoded.append(byte | 0x80)
+
+
+def _wrap(name: str, data: bytes) -> bytes:
+    # `.lq.Wrapper` (name = 1, data = 2) と同じバイト列．レスポンスの
+    # 空の `name` も省略せずに書く．
+    name = name.encode("UTF-8")
+    return b"".join(
+        (
+            b"\n",
+            _encode_varint(len(name)),
+            name,
+            b"\x12",
+            _encode_varint(len(data)),
+            data,
+        ),
+    )
+
+
+def _make_frames(count: int, response_size: int) -> list[WebSocketData]:
+    frames = []
+    for i in range(count):
+        index = (i % 65536).to_bytes(2, "little")
+        if i % 10 == 0:
+            name = ".lq.Lobby.fetchGameRecord"
+            response_data = b"\x00" * response_size
+        else:
+            name = ".lq.Lobby.loginBeat"
+            response_data = b""
+        request = b"\x02" + index + _wrap(name, b"\x0a\x04uuid")
+        response = b"\x03" + index + _wrap("", response_data)
+        notify = b"\x01" + _wrap(".lq.NotifyAccountUpdate", b"\x0a\x00")
+        frames.append(make_websocket_data(request, from_client=True))
+        frames.append(make_websocket_data(response, from_client=False))
+        frames.append(make_websocket_data(notify, from_client=False))
+    return frames
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay synthetic WebSocket frames into RedisMirroring.",
+    )
+    parser.add_argument("--module-name", default="api_visualizer")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--response-size", type=int, default=64 * 1024)
+    args = parser.parse_args()
+
+    # Redis サーバなしで測れるように，プロセス内のバックエンドを使う．
+    config = config_.get(args.module_name)
+    config["redis"]["backend"] = {"type": "in_process"}
+
+    redis_mirroring = RedisMirroring(
+        module_name=args.module_name,
+        config=_REDIS_MIRRORING_CONFIG,
+    )
+    frames = _make_frames(args.count, args.response_size)
+
+    start_time = time.perf_counter()
+    for websocket_data in frames:
+        redis_mirroring.on_websocket_message(websocket_data)
+    hook_time = time.perf_counter() - start_time
+    redis_mirroring.close()
+    total_time = time.perf_counter() - start_time
+
+    print(f"frames: {len(frames)}")
+    print(
+        f"hook: {hook_time:.3f} s,"
+        f" {len(frames) / hook_time:.0f} frames/s,"
+        f" {hook_time / len(frames) * 1e6:.2f} us/frame",
+    )
+    print(
+        f"end-to-end: {total_time:.3f} s,"
+        f" {len(frames) / total_time:.0f} frames/s",
+    )
+    print(f"writer: {redis_mirroring.get_writer_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import argparse
+import datetime
+import functools
+import os
+import timeit
+
+import mahjongsoul_sniffer.websocket_message as websocket_message_
+
+
+def _make_message(request_size: int, response_size: int | None) -> dict:
+    return {
+        "request_direction": "outbound",
+        "request": os.urandom(request_size),
+        "response": (
+            os.urandom(response_size) if response_size is not None else None
+        ),
+        "timestamp": datetime.datetime.now(tz=datetime.timezone.utc),
+    }
+
+
+def _measure(label: str, message: dict, number: int) -> None:
+    print(f"{label}:")
+
+    for codec_name, encode in (
+        ("json", websocket_message_.encode_json),
+        ("binary", websocket_message_.encode),
+    ):
+        encoded = encode(message)
+        assert websocket_message_.decode(encoded) == message  # noqa: S101
+
+        encode_time = timeit.timeit(
+            functools.partial(encode, message),
+            number=number,
+        )
+        decode_time = timeit.timeit(
+            functools.partial(websocket_message_.decode, encoded),
+            number=number,
+        )
+
+        print(
+            f"  {codec_name:>6}: {len(encoded):>9} bytes,"
+            f" encode {encode_time / number * 1e6:9.2f} us,"
+            f" decode {decode_time / number * 1e6:9.2f} us",
+        )
+
+    json_size = len(websocket_message_.encode_json(message))
+    binary_size = len(websocket_message_.encode(message))
+    saved = json_size - binary_size
+    print(f"  saved: {saved} bytes ({saved / json_size:.1%})")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare the JSON and binary WebSocket message codecs.",
+    )
+    parser.add_argument("--number", type=int, default=1000)
+    args = parser.parse_args()
+
+    # `.lq.Lobby.loginBeat` 程度の小さなメッセージ．
+    _measure("small", _make_message(64, 16), args.number)
+    # `.lq.Lobby.fetchGameRecord` 程度の大きなメッセージ．
+    _measure("large", _make_message(64, 256 * 1024), args.number)
+
+
+if __name__ == "__main__":
+    main()
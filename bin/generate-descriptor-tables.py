@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import argparse
+import pathlib
+
+import mahjongsoul_sniffer.descriptor_tables as descriptor_tables_
+
+_HEADER = """\
+# Generated by `bin/generate-descriptor-tables.py`. Do not edit.
+"""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Write the method and message type name tables of"
+        " `mahjongsoul.proto` to a module.",
+    )
+    parser.add_argument(
+        "--output",
+        type=pathlib.Path,
+        default=pathlib.Path("mahjongsoul_sniffer/mahjongsoul_names.py"),
+    )
+    args = parser.parse_args()
+
+    methods, message_types = descriptor_tables_.build()
+
+    lines = [_HEADER]
+    lines.append(f"PROTO_DIGEST = {descriptor_tables_.get_proto_digest()!r}")
+    lines.append("")
+    lines.append("METHODS = {")
+    lines.extend(
+        f"    {name!r}: {types!r}," for name, types in methods.items()
+    )
+    lines.append("}")
+    lines.append("")
+    lines.append("MESSAGE_TYPES = (")
+    lines.extend(f"    {name!r}," for name in message_types)
+    lines.append(")")
+    lines.append("")
+
+    temp_path = args.output.with_suffix(".tmp")
+    temp_path.write_text("\n".join(lines), encoding="UTF-8")
+    temp_path.replace(args.output)
+
+
+if __name__ == "__main__":
+    main()
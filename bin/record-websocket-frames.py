@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+# ruff: noqa: E402
+import inspect
+import sys
+from pathlib import Path
+
+# This file is executed by `mitmdump' with `execfile'. Therefore, in
+# order to import submodules under the repository root, we need some
+# tricks. See http://stackoverflow.com/questions/3718657 for the details
+# of the tricks used in the following lines.
+_THIS_FILENAME = inspect.getframeinfo(inspect.currentframe()).filename
+_REPOSITORY_ROOT_PATH = Path(_THIS_FILENAME).resolve().parent.parent
+sys.path.append(str(_REPOSITORY_ROOT_PATH))
+
+from mahjongsoul_sniffer.frame_capture import FrameRecorder
+
+# 使い方:
+#
+#   mitmdump -s api-visualizer/sniffer.py -s bin/record-websocket-frames.py \
+#     --set frame_capture_path=frames.bin
+addons = [FrameRecorder()]
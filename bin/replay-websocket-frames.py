@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import argparse
+import logging
+import pathlib
+import time
+
+import yaml
+
+import mahjongsoul_sniffer.config as config_
+import mahjongsoul_sniffer.descriptor_tables as descriptor_tables_
+import mahjongsoul_sniffer.redis as redis_
+from mahjongsoul_sniffer.frame_capture import make_websocket_data, read_frames
+from mahjongsoul_sniffer.redis_mirroring import RedisMirroring
+
+_DEFAULT_KEY = "api-call-queue"
+
+
+def _make_default_config() -> dict:
+    # api-visualizer と同じく，全てのメソッドとメッセージを 1 つのリストに
+    # 積む．
+    return {
+        "websocket": {
+            name: {
+                "request_direction": "both",
+                "action": {"command": "RPUSH", "key": _DEFAULT_KEY},
+            }
+            for name in descriptor_tables_.get_names()
+        },
+    }
+
+
+def _get_list_keys(config: dict) -> list[str]:
+    keys = []
+    for message_config in config.get("websocket", {}).values():
+        action = message_config["action"]
+        if isinstance(action, dict) and action["command"] in (
+            "LPUSH",
+            "LPUSHX",
+            "RPUSH",
+            "RPUSHX",
+        ):
+            keys.append(action["key"])
+    return sorted(set(keys))
+
+
+def _percentile(sorted_values: list[int], fraction: float) -> float:
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index] / 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Replay captured WebSocket frames into RedisMirroring.",
+    )
+    parser.add_argument("capture_path", type=pathlib.Path)
+    parser.add_argument("--module-name", default="api_visualizer")
+    parser.add_argument(
+        "--config",
+        type=pathlib.Path,
+        help="A YAML file with the RedisMirroring config.",
+    )
+    parser.add_argument(
+        "--use-configured-backend",
+        action="store_true",
+        help="Use the Redis backend in the module config.",
+    )
+    args = parser.parse_args()
+
+    if not args.use_configured_backend:
+        # Redis サーバなしで測れるように，プロセス内のバックエンドを使う．
+        config = config_.get(args.module_name)
+        config["redis"]["backend"] = {"type": "in_process"}
+
+    if args.config is not None:
+        with args.config.open() as f:
+            mirroring_config = yaml.safe_load(f)
+    else:
+        mirroring_config = _make_default_config()
+
+    # 計測に読み込みを含めないよう，先に全てのフレームを用意しておく．
+    frames = [
+        (
+            str(connection),
+            make_websocket_data(
+                content,
+                from_client=from_client,
+                opcode=opcode,
+                timestamp=timestamp,
+            ),
+        )
+        for connection, timestamp, from_client, opcode, content in (
+            read_frames(args.capture_path)
+        )
+    ]
+    if len(frames) == 0:
+        msg = f"{args.capture_path}: No frames are captured."
+        raise RuntimeError(msg)
+
+    redis_mirroring = RedisMirroring(
+        module_name=args.module_name,
+        config=mirroring_config,
+    )
+
+    # 記録された接続ごとのフレームをそのまま流す．例外はスニッファと同様に
+    # 記録して続ける．
+    latencies = []
+    errors = 0
+    logging.disable(logging.WARNING)
+    start_time = time.perf_counter()
+    for flow_id, websocket_data in frames:
+        frame_start_time = time.perf_counter_ns()
+        try:
+            redis_mirroring.on_websocket_message(
+                websocket_data,
+                flow_id=flow_id,
+            )
+        except Exception:  # noqa: BLE001
+            errors += 1
+        latencies.append(time.perf_counter_ns() - frame_start_time)
+    hook_time = time.perf_counter() - start_time
+    redis_mirroring.close()
+    total_time = time.perf_counter() - start_time
+    logging.disable(logging.NOTSET)
+
+    # アーカイバと同じように取り出してデコードする．
+    r = redis_.Redis(module_name=args.module_name)
+    decoded = 0
+    start_time = time.perf_counter()
+    for key in _get_list_keys(mirroring_config):
+        while True:
+            messages = r.pop_websocket_messages(key, 1000)
+            if len(messages) == 0:
+                break
+            decoded += len(messages)
+    decode_time = time.perf_counter() - start_time
+
+    latencies.sort()
+    print(f"frames: {len(frames)} ({errors} errors)")
+    print(
+        f"hook: {hook_time:.3f} s, {len(frames) / hook_time:.0f} frames/s",
+    )
+    print(
+        f"hook latency: p50 {_percentile(latencies, 0.5):.2f} us,"
+        f" p99 {_percentile(latencies, 0.99):.2f} us,"
+        f" max {latencies[-1] / 1000.0:.2f} us",
+    )
+    print(
+        f"end-to-end: {total_time:.3f} s,"
+        f" {len(frames) / total_time:.0f} frames/s",
+    )
+    print(f"writer: {redis_mirroring.get_writer_stats()}")
+    if decoded > 0:
+        print(
+            f"decode: {decoded} messages, {decode_time:.3f} s,"
+            f" {decoded / decode_time:.0f} messages/s",
+        )
+
+
+if __name__ == "__main__":
+    main()
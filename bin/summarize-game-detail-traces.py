@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime
+
+import mahjongsoul_sniffer.s3 as s3_
+import mahjongsoul_sniffer.trace as trace_
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Summarize per-stage latencies of archived game details.",
+    )
+    parser.add_argument("--module-name", default="game_detail_crawler")
+    parser.add_argument(
+        "--hours",
+        type=float,
+        default=24.0,
+        help="Summarize game details archived in the last N hours.",
+    )
+    parser.add_argument(
+        "--lookback-days",
+        type=int,
+        default=7,
+        help="How many days before the window games may have started.",
+    )
+    args = parser.parse_args()
+
+    end_time = datetime.datetime.now(tz=datetime.timezone.utc)
+    start_time = end_time - datetime.timedelta(hours=args.hours)
+
+    s3_bucket = s3_.Bucket(module_name=args.module_name)
+    traces = s3_bucket.get_game_detail_traces(
+        start_time,
+        end_time,
+        lookback=datetime.timedelta(days=args.lookback_days),
+    )
+
+    print(f"window: {start_time.isoformat()} - {end_time.isoformat()}")
+    print(f"{'interval':<24}{'count':>8}{'p50':>10}{'p99':>10}{'max':>10}")
+    for entry in trace_.summarize(traces):
+        interval = f"{entry['from']} -> {entry['to']}"
+        if entry["count"] == 0:
+            print(f"{interval:<24}{0:>8}")
+            continue
+        print(
+            f"{interval:<24}{entry['count']:>8}"
+            f"{entry['p50']:>10.3f}{entry['p99']:>10.3f}"
+            f"{entry['max']:>10.3f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
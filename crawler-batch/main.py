@@ -643,16 +643,22 @@ class Sheet(object):
 
 class S3Bucket(object):
     def __init__(self):
-        import boto3
-        bucket_name = _CONFIG['s3']['bucket_name']
-        s3 = boto3.resource('s3')
-        self.__bucket = s3.Bucket(bucket_name)
+        import mahjongsoul_sniffer.s3_backend as s3_backend_
+        self.__bucket_name = _CONFIG['s3']['bucket_name']
+        self.__client = s3_backend_.create_client(_CONFIG['s3'])
+
+    def __list_keys(self, prefix: str):
+        paginator = self.__client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(
+                Bucket=self.__bucket_name, Prefix=prefix):
+            for content in page.get('Contents', []):
+                yield content['Key']
 
     def get_num_objects(self, prefix: str) -> int:
         prefix.rstrip('/')
         prefix += '/'
         num = 0
-        for obj in self.__bucket.objects.filter(Prefix=prefix):
+        for key in self.__list_keys(prefix):
             num += 1
         return num
 
@@ -661,8 +667,10 @@ class S3Bucket(object):
         for prefix in _CONFIG['s3']['game_abstract_key_prefixes']:
             prefix = prefix.rstrip('/')
             prefix += '/' + date.strftime('%Y/%m/%d/')
-            for obj in self.__bucket.objects.filter(Prefix=prefix):
-                body = obj.get()['Body'].read().decode('UTF-8')
+            for key in self.__list_keys(prefix):
+                body = self.__client.get_object(
+                    Bucket=self.__bucket_name, Key=key)
+                body = body['Body'].read().decode('UTF-8')
                 abstract = json.loads(body)
                 uuid = abstract['uuid']
                 mode = abstract['mode']
@@ -7,6 +7,7 @@ import jsonschema
 import jsonschema.exceptions
 import google.protobuf.json_format
 import mahjongsoul_sniffer.logging as logging_
+import mahjongsoul_sniffer.metrics as metrics_
 import mahjongsoul_sniffer.redis as redis_
 import mahjongsoul_sniffer.s3 as s3_
 from mahjongsoul_sniffer.mahjongsoul_pb2 \
@@ -405,11 +406,15 @@ JSON: {result_json}''')
 
 def main():
     redis = redis_.Redis(module_name='game_abstract_crawler')
+    queue = redis_.WebSocketMessageQueue(
+        module_name='game_abstract_crawler', key='game-abstract-list')
     finished = {}
     s3_bucket = s3_.Bucket(module_name='game_abstract_crawler')
+    archived = metrics_.counter(
+        'game_abstract_archived_total', 'Archived game abstracts.')
 
     while True:
-        message = redis.blpop_websocket_message('game-abstract-list')
+        message_id, message = queue.pop()
         redis.set_timestamp('archiver.heartbeat')
         if message['request_direction'] != 'outbound':
             raise RuntimeError(
@@ -419,13 +424,19 @@ def main():
         message = message['response']
         game_abstract_list = _parse(message)
 
+        new_game_abstract_list = []
         for game_abstract in game_abstract_list:
             uuid = game_abstract['uuid']
             if uuid in finished:
                 continue
-            s3_bucket.put_game_abstract(game_abstract)
-            logging.info(f'Archived the abstract of the game {uuid}.')
+            new_game_abstract_list.append(game_abstract)
             finished[uuid] = game_abstract['start_time']
+        s3_bucket.put_game_abstracts(new_game_abstract_list)
+        archived.inc(len(new_game_abstract_list))
+        for game_abstract in new_game_abstract_list:
+            uuid = game_abstract['uuid']
+            logging.info(f'Archived the abstract of the game {uuid}.')
+        queue.ack(message_id)
 
         if len(finished) > 20000:
             now = datetime.datetime.now(tz=datetime.timezone.utc)
@@ -441,6 +452,8 @@ if __name__ == '__main__':
     try:
         logging_.initialize(module_name='game_abstract_crawler',
                             service_name='archiver')
+        metrics_.start_publisher(module_name='game_abstract_crawler',
+                                 service_name='archiver')
         main()
     except Exception as e:
         logging.exception('Abort with an unhandled exception.')
@@ -19,6 +19,7 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver import ActionChains
 import mahjongsoul_sniffer.config as config_
 import mahjongsoul_sniffer.logging as logging_
+import mahjongsoul_sniffer.metrics as metrics_
 import mahjongsoul_sniffer.redis as redis_
 from mahjongsoul_sniffer.yostar_login import YostarLogin
 
@@ -311,6 +312,8 @@ def main(driver: WebDriver) -> None:
 if __name__ == '__main__':
     logging_.initialize(module_name='game_abstract_crawler',
                         service_name='crawler')
+    metrics_.start_publisher(module_name='game_abstract_crawler',
+                             service_name='crawler')
 
     for screenshot_path in _SCREENSHOT_PREFIX.glob('*.png'):
         screenshot_path.unlink()
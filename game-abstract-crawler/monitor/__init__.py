@@ -6,6 +6,7 @@ import os.path
 import hashlib
 import os
 import flask
+import mahjongsoul_sniffer.metrics as metrics_
 import mahjongsoul_sniffer.redis as redis_
 
 
@@ -104,6 +105,14 @@ def crawler_log():
         'crawler.log', mimetype='text/plain')
 
 
+@app.route('/metrics')
+def metrics():
+    snapshots = metrics_.get_published(
+        _redis, service_names=['sniffer', 'archiver', 'crawler'])
+    return flask.Response(
+        metrics_.render(snapshots), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/running')
 def running():
     timestamp = _redis.get_timestamp('archiver.heartbeat')
@@ -3,41 +3,61 @@
 import datetime
 import logging
 import mahjongsoul_sniffer.logging as logging_
+import mahjongsoul_sniffer.metrics as metrics_
 import mahjongsoul_sniffer.redis as redis_
 import mahjongsoul_sniffer.game_detail as game_detail_
 import mahjongsoul_sniffer.s3 as s3_
+import mahjongsoul_sniffer.trace as trace_
 
 
 def main():
     redis = redis_.Redis(module_name='game_detail_crawler')
+    queue = redis_.WebSocketMessageQueue(
+        module_name='game_detail_crawler', key='game-detail-list')
     s3_bucket = s3_.Bucket(module_name='game_detail_crawler')
+    validation_seconds = metrics_.histogram(
+        'game_detail_validation_seconds',
+        'Time to validate the detail of a game.')
+    upload_seconds = metrics_.histogram(
+        'game_detail_upload_seconds',
+        'Time to upload the detail of a game to S3.')
+    archived = metrics_.counter(
+        'game_detail_archived_total', 'Archived game details.')
 
     while True:
-        message = redis.blpop_websocket_message('game-detail-list')
+        message_id, message = queue.pop()
+        trace_.mark(message, 'dequeued')
         redis.set_timestamp('archiver.heartbeat')
-        fetch_time = datetime.datetime.now(tz=datetime.timezone.utc)
         if message['request_direction'] != 'outbound':
             raise RuntimeError('An outbound WebSocket message is\
  expected, but got an inbound one.')
 
+        envelope = message
         message = message['response']
+        validation_start = datetime.datetime.now(tz=datetime.timezone.utc)
         try:
             game_detail_.validate(message)
         except game_detail_.ValidationError as e:
             raise
-
-        s3_bucket.put_game_detail(message)
-
         now = datetime.datetime.now(tz=datetime.timezone.utc)
-        elapsed_time = now - fetch_time
+        elapsed_time = now - validation_start
+        validation_seconds.observe(elapsed_time.total_seconds())
         logging.info(
             f'Elapsed time to validate the message: {elapsed_time}')
 
+        trace_.mark(envelope, 'uploading')
+        with upload_seconds.time():
+            s3_bucket.put_game_detail(message, trace=envelope['trace'])
+        queue.ack(message_id)
+        archived.inc()
+
 
 if __name__ == '__main__':
     try:
         logging_.initialize(
             module_name='game_detail_crawler', service_name='archiver')
+        metrics_.start_publisher(
+            module_name='game_detail_crawler', service_name='archiver')
         main()
     except Exception as e:
         logging.exception('Abort with an unhandled exception.')
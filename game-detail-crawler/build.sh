@@ -6,6 +6,7 @@ rm -rf /opt/mahjongsoul-sniffer/*
 rm -rf /srv/mahjongsoul-sniffer/*
 cp -rf /opt/mahjongsoul-sniffer.orig/* .
 protoc --python_out=. mahjongsoul_sniffer/mahjongsoul.proto
+PYTHONPATH=. python3 bin/generate-descriptor-tables.py
 pushd game-detail-crawler/monitor
 yes 'y' | npm init vue@latest vue || true
 cp vue_/src/* vue/src
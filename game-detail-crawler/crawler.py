@@ -20,9 +20,11 @@ from selenium.webdriver.support import expected_conditions as ec
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver import ActionChains
 import mahjongsoul_sniffer.logging as logging_
+import mahjongsoul_sniffer.metrics as metrics_
 from mahjongsoul_sniffer.yostar_login import YostarLogin
 import mahjongsoul_sniffer.redis as redis_
 import mahjongsoul_sniffer.s3 as s3_
+import mahjongsoul_sniffer.trace as trace_
 from mahjongsoul_sniffer.mahjongsoul_pb2 import (ResGameRecord, Wrapper)
 
 
@@ -32,6 +34,10 @@ _BROWSER_RESTART_INTERVAL = 3600
 _RETRY_COUNT = 3
 _RETRY_INTERVAL = 0
 
+# 取得したがまだ処理していない牌譜概要．`RetryRequest` や
+# `RestartRequest` の後も引き継ぐ．
+_game_abstracts = []
+
 
 class RetryRequest(Exception):
     pass
@@ -100,15 +106,22 @@ def _after_login(
 
     _get_screenshot(driver, '06-ロビー.png')
 
-    game_abstracts = []
+    game_abstracts = _game_abstracts
 
-    s3_bucket = s3_.Bucket(module_name='game_detail_crawler')
+    queue = redis_.WebSocketMessageQueue(
+        module_name='game_detail_crawler', key='game-detail-list')
 
     count = 0
 
     while True:
         if len(game_abstracts) <= 100:
-            game_abstracts = s3_bucket.get_game_abstracts(max_keys=1000)
+            # 残っている牌譜概要も捨てずに，新たに取得したものに加える．
+            # 一周して同じ牌譜概要がまた返ることがあるので重複は除く．
+            keys = {g['key'] for g in game_abstracts}
+            for game_abstract in s3_bucket.get_game_abstracts(
+                    max_keys=1000, resume=True):
+                if game_abstract['key'] not in keys:
+                    game_abstracts.append(game_abstract)
             if len(game_abstracts) == 0:
                 logging.warning('No game abstract is available. Sleep\
  for 1 minute...')
@@ -133,12 +146,16 @@ def _after_login(
 
         if s3_bucket.has_game_detail(game_abstract):
             logging.info(f'Found the detail of the game {uuid}.')
-            s3_bucket.delete_object(key)
+            s3_bucket.delete_object(key, deferred=True)
+            s3_bucket.ack_game_abstract(game_abstract)
             logging.info(f'Deleted the abstract of the game {uuid}.')
             continue
 
         now = datetime.datetime.now(tz=datetime.timezone.utc)
         if now - start_time < datetime.timedelta(days=1):
+            s3_bucket.defer_game_abstract(
+                game_abstract, start_time + datetime.timedelta(days=1))
+            s3_bucket.ack_game_abstract(game_abstract)
             continue
 
         try:
@@ -146,6 +163,7 @@ def _after_login(
         except TimeoutException:
             logging.warning(f'Timeout occurred while loading the URL\
  `https://game.mahjongsoul.com/?paipu={uuid}`.')
+            game_abstracts.append(game_abstract)
             raise RetryRequest
 
         got = False
@@ -154,6 +172,7 @@ def _after_login(
             game_detail = redis.get_websocket_message('game-detail')
 
             if game_detail is not None:
+                trace_.mark(game_detail, 'polled', uuid=uuid)
                 redis.delete('game-detail')
                 got = True
                 logging.info(f'Got the detail of the game {uuid}.')
@@ -165,6 +184,7 @@ def _after_login(
             logging.warning(
                 f'Failed to get the detail of the game {uuid}.')
             _get_screenshot(driver, '98-ゲーム詳細取得タイムアウト.png')
+            game_abstracts.append(game_abstract)
             raise RetryRequest
 
         wrapper = Wrapper()
@@ -180,14 +200,17 @@ def _after_login(
         if error_code == 1203:
             # 「対戦が存在しません」
             logging.warning(f'{uuid}: 対戦が存在しません (error_code = {error_code})')
-            s3_bucket.delete_object(key)
+            s3_bucket.delete_object(key, deferred=True)
+            s3_bucket.ack_game_abstract(game_abstract)
             logging.warning(f'Deleted the abstract of the game {uuid}.')
             continue
 
         if error_code != 0:
             raise RuntimeError(f'uuid = {uuid}, error_code = {error_code}')
 
-        redis.rpush_websocket_message('game-detail-list', game_detail)
+        trace_.mark(game_detail, 'enqueued')
+        queue.push(game_detail)
+        s3_bucket.ack_game_abstract(game_abstract)
 
 
 def _wait_for_page_to_present(driver: WebDriver) -> WebElement:
@@ -252,7 +275,12 @@ def main(driver: WebDriver) -> None:
     retry_count = 0
     while True:
         try:
-            _after_login(fetch_time, canvas, redis)
+            try:
+                _after_login(fetch_time, canvas, redis)
+            finally:
+                # 再試行やブラウザの再起動で待つ前に，遅延させていた
+                # 牌譜概要の削除を済ませておく．
+                s3_bucket.flush_deletions()
         except RetryRequest:
             retry_count += 1
 
@@ -284,6 +312,12 @@ def main(driver: WebDriver) -> None:
 if __name__ == '__main__':
     logging_.initialize(
         module_name='game_detail_crawler', service_name='crawler')
+    metrics_.start_publisher(
+        module_name='game_detail_crawler', service_name='crawler')
+
+    # 遅延削除のスレッドや牌譜詳細の索引を使い回すため，`RetryRequest` や
+    # `RestartRequest` の後も同じものを使う．
+    s3_bucket = s3_.Bucket(module_name='game_detail_crawler')
 
     for screenshot_path in _SCREENSHOT_PREFIX.glob('*.png'):
         screenshot_path.unlink()
@@ -2,6 +2,7 @@ import os.path
 import logging
 import sys
 import inspect
+from mitmproxy.http import HTTPFlow
 
 # This file is executed by `mitmdump' with `execfile'. Therefore, in
 # order to import submodules under the directory where this file exists,
@@ -11,11 +12,15 @@ THIS_FILENAME = inspect.getframeinfo(inspect.currentframe()).filename
 THIS_DIR_PATH = os.path.dirname(os.path.abspath(THIS_FILENAME))
 sys.path.append(THIS_DIR_PATH)
 import mahjongsoul_sniffer.logging as logging_
+import mahjongsoul_sniffer.metrics as metrics_
+import mahjongsoul_sniffer.readiness as readiness_
 from mahjongsoul_sniffer.redis_mirroring import RedisMirroring
 
 
 logging_.initialize(
     module_name='game_detail_crawler', service_name='sniffer')
+metrics_.start_publisher(
+    module_name='game_detail_crawler', service_name='sniffer')
 
 
 _REDIS_MIRRORING_CONFIG = {
@@ -42,9 +47,29 @@ redis_mirroring = RedisMirroring(
     module_name='game_detail_crawler', config=_REDIS_MIRRORING_CONFIG)
 
 
+def running() -> None:
+    readiness_.notify()
+
+
+def response(flow: HTTPFlow) -> None:
+    try:
+        redis_mirroring.on_http_response(flow)
+    except Exception:
+        logging.exception(
+            '`RedisMirroring.on_http_response` threw an exception.')
+
+
 def websocket_message(flow) -> None:
     try:
-        redis_mirroring.on_websocket_message(flow)
+        redis_mirroring.on_websocket_message(flow, flow_id=flow.id)
     except Exception as e:
         logging.exception(
             '`RedisMirroring.on_websocket_message` threw an exception.')
+
+
+def websocket_end(flow) -> None:
+    redis_mirroring.on_websocket_end(flow.id)
+
+
+def done() -> None:
+    redis_mirroring.close()
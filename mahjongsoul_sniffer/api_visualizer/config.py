@@ -2,6 +2,27 @@
 
 import pathlib
 
+_REDIS_BACKEND_CONFIG_SCHEMA = {
+    "type": "object",
+    "required": [
+        "type",
+    ],
+    "properties": {
+        "type": {
+            "enum": [
+                "redis",
+                "in_process",
+                "sqlite",
+            ],
+        },
+        "path": {
+            "type": "string",
+        },
+    },
+    "additionalProperties": False,
+}
+
+
 _REDIS_CONFIG_SCHEMA = {
     "type": "object",
     "required": [
@@ -17,6 +38,61 @@ _REDIS_CONFIG_SCHEMA = {
             "minimum": 1,
             "maximum": 65535,
         },
+        "backend": _REDIS_BACKEND_CONFIG_SCHEMA,
+    },
+    "additionalProperties": False,
+}
+
+
+_LOGGING_PAYLOAD_CONFIG_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "max_length": {
+            "type": "integer",
+            "minimum": 0,
+        },
+        "spool": {
+            "type": "object",
+            "required": [
+                "path",
+                "max_bytes",
+                "backup_count",
+            ],
+            "properties": {
+                "path": {
+                    "type": "string",
+                },
+                "max_bytes": {
+                    "type": "integer",
+                    "minimum": 0,
+                },
+                "backup_count": {
+                    "type": "integer",
+                    "minimum": 0,
+                },
+            },
+            "additionalProperties": False,
+        },
+    },
+    "additionalProperties": False,
+}
+
+
+_LOGGING_RATE_LIMIT_CONFIG_SCHEMA = {
+    "type": "object",
+    "required": [
+        "interval",
+        "burst",
+    ],
+    "properties": {
+        "interval": {
+            "type": "number",
+            "exclusiveMinimum": 0,
+        },
+        "burst": {
+            "type": "integer",
+            "minimum": 1,
+        },
     },
     "additionalProperties": False,
 }
@@ -60,6 +136,8 @@ _LOGGING_CONFIG_SCHEMA = {
             },
             "additionalProperties": False,
         },
+        "payload": _LOGGING_PAYLOAD_CONFIG_SCHEMA,
+        "rate_limit": _LOGGING_RATE_LIMIT_CONFIG_SCHEMA,
     },
     "additionalProperties": False,
 }
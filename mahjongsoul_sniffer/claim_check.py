@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import hashlib
+import logging
+import os
+import pathlib
+import tempfile
+import time
+
+import mahjongsoul_sniffer.config as config_
+
+# 参照として Redis に流れるダイジェストの長さ (SHA-256)．
+DIGEST_SIZE = hashlib.sha256().digest_size
+# 掃除で消すまでの既定の経過時間 (秒)．ペイロードは普通，キューの
+# コンシューマが ack したときに `release` で消す．掃除はキューに積まれ
+# なかったペイロード，例えばスニファが書いたがクローラが積まなかった
+# もののためにある．アーカイバが滞ってもキューに残るメッセージのペイロード
+# を消さないよう，キューに残りうる時間より十分長くする．
+_DEFAULT_MAX_AGE = 7 * 86400
+
+
+class ClaimCheck:
+    def __init__(
+        self,
+        *,
+        directory: pathlib.Path,
+        threshold: int,
+        max_age: int,
+    ) -> None:
+        if directory.exists() and not directory.is_dir():
+            msg = f"{directory}: Not a directory."
+            raise RuntimeError(msg)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        self.__directory = directory
+        self.__threshold = threshold
+        self.__max_age = max_age
+        self.__last_sweep_time = 0.0
+
+    def __get_path(self, digest: bytes) -> pathlib.Path:
+        name = digest.hex()
+        return self.__directory / name[:2] / name
+
+    def should_offload(self, data: bytes) -> bool:
+        return len(data) > self.__threshold
+
+    def put(self, data: bytes) -> bytes:
+        digest = hashlib.sha256(data).digest()
+        path = self.__get_path(digest)
+
+        if path.exists():
+            # 内容アドレスなので同じ内容は書き直さず，掃除の対象にならない
+            # よう更新時刻だけ更新する．
+            path.touch()
+        else:
+            path.parent.mkdir(exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=path.parent)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                pathlib.Path(temp_path).replace(path)
+            except BaseException:
+                pathlib.Path(temp_path).unlink(missing_ok=True)
+                raise
+
+        self.__sweep()
+
+        return digest
+
+    def get(self, digest: bytes) -> bytes:
+        path = self.__get_path(digest)
+        try:
+            return path.read_bytes()
+        except FileNotFoundError as e:
+            msg = f"{path}: A claim-checked payload does not exist."
+            raise RuntimeError(msg) from e
+
+    def release(self, data: bytes) -> None:
+        # コンシューマが ack したメッセージのペイロードを消す．閾値以下で
+        # 退避されなかったものは何もしない．
+        if not self.should_offload(data):
+            return
+        path = self.__get_path(hashlib.sha256(data).digest())
+        path.unlink(missing_ok=True)
+
+    def __sweep(self) -> None:
+        now = time.time()
+        if now - self.__last_sweep_time < min(self.__max_age, 60):
+            return
+        self.__last_sweep_time = now
+
+        for path in self.__directory.glob("*/*"):
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if now - mtime > self.__max_age:
+                path.unlink(missing_ok=True)
+                logging.info(
+                    "Deleted a stale claim-checked payload `%s`.",
+                    path,
+                )
+
+
+def create(*, module_name: str) -> ClaimCheck | None:
+    config = config_.get(module_name)
+    config = config["redis"]
+
+    if "claim_check" not in config:
+        return None
+    config = config["claim_check"]
+
+    return ClaimCheck(
+        directory=pathlib.Path(config["directory"]),
+        threshold=config["threshold"],
+        max_age=config.get("max_age", _DEFAULT_MAX_AGE),
+    )
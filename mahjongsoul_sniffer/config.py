@@ -1,13 +1,28 @@
 #!/usr/bin/env python3
+# ruff: noqa: RUF003
 
 import importlib
 import pathlib
 from functools import cache
 
 import jsonschema
+import jsonschema.exceptions
+import jsonschema.validators
 import yaml
 
 
+def validate(*, instance: object, schema: dict[str, object]) -> None:
+    # `jsonschema.validate` と同じだが，スキーマ自体をメタスキーマで検証
+    # しない．設定のスキーマはどれも定数で，メタスキーマでの検証の方が
+    # 設定の検証よりずっと重い (起動が数十ミリ秒から数百ミリ秒遅れる)．
+    validator_class = jsonschema.validators.validator_for(schema)
+    error = jsonschema.exceptions.best_match(
+        validator_class(schema).iter_errors(instance),
+    )
+    if error is not None:
+        raise error
+
+
 def _load(file_path: pathlib.Path, schema: dict[str, object]) -> dict:
     if not file_path.exists():
         msg = f"{file_path}: File does not exist."
@@ -19,7 +34,7 @@ def _load(file_path: pathlib.Path, schema: dict[str, object]) -> dict:
     with file_path.open() as config_file:
         config = yaml.safe_load(config_file)
 
-    jsonschema.validate(instance=config, schema=schema)
+    validate(instance=config, schema=schema)
 
     return config
 
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import functools
+import hashlib
+import importlib
+import pathlib
+import re
+
+# `mahjongsoul.proto` のサービスのメソッド名とメッセージ型名の表．
+# `mahjongsoul_pb2` の import と記述子の走査には時間がかかるので，ビルド
+# 時に `bin/generate-descriptor-tables.py` が `mahjongsoul_names.py` に
+# 書き出したものを使う．それが無いか，`mahjongsoul.proto` と食い違う
+# 場合だけ `mahjongsoul.proto` を直接読んで作る．ビルド用のコンテナには
+# protobuf の Python ライブラリが無いので，`mahjongsoul_pb2` は使わない．
+_PROTO_PATH = pathlib.Path(__file__).with_name("mahjongsoul.proto")
+_GENERATED_MODULE_NAME = "mahjongsoul_sniffer.mahjongsoul_names"
+
+_COMMENT_PATTERN = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+_WORD_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|[A-Za-z_][\w.]*|\S')
+
+
+def get_proto_digest() -> str:
+    return hashlib.sha256(_PROTO_PATH.read_bytes()).hexdigest()
+
+
+def _qualify(name: str, package: str) -> str:
+    if name.startswith("."):
+        return name
+    if package != "" and not name.startswith(package + "."):
+        name = f"{package}.{name}"
+    return "." + name
+
+
+def build() -> tuple[dict[str, tuple[str, str]], tuple[str, ...]]:
+    # メソッド名 → (引数の型名，戻り値の型名) の表と，トップレベルの
+    # メッセージ型名のタプル．名前はいずれも WebSocket メッセージに現れる
+    # `.lq.` 形式で，順序は `mahjongsoul.proto` での宣言順．
+    text = _PROTO_PATH.read_text(encoding="UTF-8")
+    text = _COMMENT_PATTERN.sub(" ", text)
+    words = _WORD_PATTERN.findall(text)
+
+    package = ""
+    methods = {}
+    message_types = []
+    # 開いているブロックの (種類，名前) のスタック．
+    scopes: list[tuple[str, str]] = []
+    i = 0
+    while i < len(words):
+        word = words[i]
+        if word == "package" and len(scopes) == 0:
+            package = words[i + 1]
+            i += 2
+        elif word in ("message", "enum", "service") and words[i + 2] == "{":
+            name = words[i + 1]
+            if word == "message" and len(scopes) == 0:
+                message_types.append(_qualify(name, package))
+            scopes.append((word, name))
+            i += 3
+        elif word == "rpc" and scopes and scopes[-1][0] == "service":
+            # `rpc NAME ( [stream] TYPE ) returns ( [stream] TYPE )`
+            j = words.index("(", i) + 1
+            if words[j] == "stream":
+                j += 1
+            input_type = words[j]
+            j = words.index("(", j) + 1
+            if words[j] == "stream":
+                j += 1
+            output_type = words[j]
+            service_name = _qualify(scopes[-1][1], package)
+            methods[f"{service_name}.{words[i + 1]}"] = (
+                _qualify(input_type, package),
+                _qualify(output_type, package),
+            )
+            i = j + 1
+        elif word == "{":
+            scopes.append(("", ""))
+            i += 1
+        elif word == "}":
+            scopes.pop()
+            i += 1
+        else:
+            i += 1
+
+    return methods, tuple(message_types)
+
+
+@functools.cache
+def _get_tables() -> tuple[dict[str, tuple[str, str]], tuple[str, ...]]:
+    try:
+        generated = importlib.import_module(_GENERATED_MODULE_NAME)
+    except ImportError:
+        return build()
+    if generated.PROTO_DIGEST != get_proto_digest():
+        return build()
+    return generated.METHODS, generated.MESSAGE_TYPES
+
+
+def get_method_names() -> tuple[str, ...]:
+    return tuple(_get_tables()[0])
+
+
+def get_message_type_names() -> tuple[str, ...]:
+    return _get_tables()[1]
+
+
+def get_method_types(name: str) -> tuple[str, str] | None:
+    return _get_tables()[0].get(name)
+
+
+@functools.cache
+def get_names() -> frozenset[str]:
+    methods, message_types = _get_tables()
+    return frozenset(methods) | frozenset(message_types)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import logging
+import pathlib
+import struct
+from collections.abc import Iterator
+
+import wsproto.frame_protocol
+from mitmproxy import ctx
+from mitmproxy.addonmanager import Loader
+from mitmproxy.http import HTTPFlow
+from mitmproxy.websocket import WebSocketData, WebSocketMessage
+
+# WebSocket フレームのキャプチャファイル．
+#
+#   magic (4 bytes) | version (1 byte) | record*
+#
+# 各レコードは
+#
+#   timestamp (float64, LE) | connection (uint32, LE) |
+#   from client (uint8) | opcode (uint8) | length (uint32, LE) | content
+#
+# で，connection はキャプチャ中に現れた順に WebSocket 接続に振った番号．
+_MAGIC = b"MSFC"
+_VERSION = 1
+_FILE_HEADER = struct.Struct("<4sB")
+_RECORD_HEADER = struct.Struct("<dIBBI")
+
+
+def make_websocket_data(
+    content: bytes,
+    *,
+    from_client: bool,
+    opcode: int = wsproto.frame_protocol.Opcode.BINARY,
+    timestamp: float | None = None,
+) -> WebSocketData:
+    # mitmproxy なしで `RedisMirroring.on_websocket_message` に渡せる，
+    # メッセージを 1 つだけ持つ `WebSocketData`．
+    websocket_data = WebSocketData()
+    websocket_data.messages.append(
+        WebSocketMessage(opcode, from_client, content, timestamp),
+    )
+    return websocket_data
+
+
+def read_frames(
+    path: pathlib.Path,
+) -> Iterator[tuple[int, float, bool, int, bytes]]:
+    with path.open("rb") as f:
+        header = f.read(_FILE_HEADER.size)
+        if len(header) != _FILE_HEADER.size:
+            msg = f"{path}: A truncated frame capture header."
+            raise RuntimeError(msg)
+        magic, version = _FILE_HEADER.unpack(header)
+        if magic != _MAGIC:
+            msg = f"{path}: Not a frame capture file."
+            raise RuntimeError(msg)
+        if version != _VERSION:
+            msg = f"{path}: {version}: An unsupported frame capture version."
+            raise RuntimeError(msg)
+
+        while True:
+            header = f.read(_RECORD_HEADER.size)
+            if len(header) == 0:
+                return
+            if len(header) != _RECORD_HEADER.size:
+                logging.warning("%s: Discarded a truncated frame.", path)
+                return
+            timestamp, connection, from_client, opcode, length = (
+                _RECORD_HEADER.unpack(header)
+            )
+            content = f.read(length)
+            if len(content) != length:
+                logging.warning("%s: Discarded a truncated frame.", path)
+                return
+            yield connection, timestamp, from_client != 0, opcode, content
+
+
+class FrameRecorder:
+    # WebSocket フレームをそのままキャプチャファイルに書き出す mitmproxy
+    # の addon．`frame_capture_path` オプションで出力先を指定する．
+    def __init__(self) -> None:
+        self.__file = None
+        self.__connections: dict[str, int] = {}
+
+    def load(self, loader: Loader) -> None:
+        loader.add_option(
+            name="frame_capture_path",
+            typespec=str,
+            default="",
+            help="Write captured WebSocket frames to this file.",
+        )
+
+    def configure(self, updated: set[str]) -> None:
+        if "frame_capture_path" not in updated:
+            return
+
+        self.done()
+        path = ctx.options.frame_capture_path
+        if path == "":
+            return
+        path = pathlib.Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.__file = path.open("wb")
+        self.__file.write(_FILE_HEADER.pack(_MAGIC, _VERSION))
+        self.__connections = {}
+
+    def websocket_message(self, flow: HTTPFlow) -> None:
+        if self.__file is None or flow.websocket is None:
+            return
+        message = flow.websocket.messages[-1]
+
+        connection = self.__connections.setdefault(
+            flow.id,
+            len(self.__connections),
+        )
+        self.__file.write(
+            _RECORD_HEADER.pack(
+                message.timestamp,
+                connection,
+                1 if message.from_client else 0,
+                message.type,
+                len(message.content),
+            ),
+        )
+        self.__file.write(message.content)
+
+    def websocket_end(self, flow: HTTPFlow) -> None:  # noqa: ARG002
+        if self.__file is not None:
+            self.__file.flush()
+
+    def done(self) -> None:
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
@@ -16,6 +16,51 @@ _YOSTAR_LOGIN_CONFIG_SCHEMA = {
 }
 
 
+_REDIS_QUEUE_CONFIG_SCHEMA = {
+    "type": "object",
+    "required": [
+        "backend",
+    ],
+    "properties": {
+        "backend": {
+            "enum": [
+                "list",
+                "stream",
+            ],
+        },
+        "group": {
+            "type": "string",
+        },
+        "min_idle_time": {
+            "type": "integer",
+            "minimum": 1,
+        },
+    },
+    "additionalProperties": False,
+}
+
+
+_REDIS_BACKEND_CONFIG_SCHEMA = {
+    "type": "object",
+    "required": [
+        "type",
+    ],
+    "properties": {
+        "type": {
+            "enum": [
+                "redis",
+                "in_process",
+                "sqlite",
+            ],
+        },
+        "path": {
+            "type": "string",
+        },
+    },
+    "additionalProperties": False,
+}
+
+
 _REDIS_CONFIG_SCHEMA = {
     "type": "object",
     "required": [
@@ -31,6 +76,53 @@ _REDIS_CONFIG_SCHEMA = {
             "minimum": 1,
             "maximum": 65535,
         },
+        "queue": _REDIS_QUEUE_CONFIG_SCHEMA,
+        "backend": _REDIS_BACKEND_CONFIG_SCHEMA,
+    },
+    "additionalProperties": False,
+}
+
+
+_S3_BACKEND_CONFIG_SCHEMA = {
+    "type": "object",
+    "required": [
+        "type",
+    ],
+    "properties": {
+        "type": {
+            "enum": [
+                "s3",
+                "directory",
+            ],
+        },
+        "endpoint_url": {
+            "type": "string",
+        },
+        "path": {
+            "type": "string",
+        },
+    },
+    "additionalProperties": False,
+}
+
+
+_GAME_ABSTRACT_SEGMENT_CONFIG_SCHEMA = {
+    "type": "object",
+    "required": [
+        "key_prefix",
+    ],
+    "properties": {
+        "key_prefix": {
+            "type": "string",
+        },
+        "max_size": {
+            "type": "integer",
+            "minimum": 1,
+        },
+        "max_age": {
+            "type": "integer",
+            "minimum": 1,
+        },
     },
     "additionalProperties": False,
 }
@@ -53,6 +145,62 @@ _S3_CONFIG_SCHEMA = {
         "game_abstract_key_prefix": {
             "type": "string",
         },
+        "game_abstract_segment": _GAME_ABSTRACT_SEGMENT_CONFIG_SCHEMA,
+        "backend": _S3_BACKEND_CONFIG_SCHEMA,
+    },
+    "additionalProperties": False,
+}
+
+
+_LOGGING_PAYLOAD_CONFIG_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "max_length": {
+            "type": "integer",
+            "minimum": 0,
+        },
+        "spool": {
+            "type": "object",
+            "required": [
+                "path",
+                "max_bytes",
+                "backup_count",
+            ],
+            "properties": {
+                "path": {
+                    "type": "string",
+                },
+                "max_bytes": {
+                    "type": "integer",
+                    "minimum": 0,
+                },
+                "backup_count": {
+                    "type": "integer",
+                    "minimum": 0,
+                },
+            },
+            "additionalProperties": False,
+        },
+    },
+    "additionalProperties": False,
+}
+
+
+_LOGGING_RATE_LIMIT_CONFIG_SCHEMA = {
+    "type": "object",
+    "required": [
+        "interval",
+        "burst",
+    ],
+    "properties": {
+        "interval": {
+            "type": "number",
+            "exclusiveMinimum": 0,
+        },
+        "burst": {
+            "type": "integer",
+            "minimum": 1,
+        },
     },
     "additionalProperties": False,
 }
@@ -114,6 +262,8 @@ _LOGGING_CONFIG_SCHEMA = {
             },
             "additionalProperties": False,
         },
+        "payload": _LOGGING_PAYLOAD_CONFIG_SCHEMA,
+        "rate_limit": _LOGGING_RATE_LIMIT_CONFIG_SCHEMA,
     },
     "additionalProperties": False,
 }
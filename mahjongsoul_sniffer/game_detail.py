@@ -2,7 +2,6 @@
 # ruff: noqa: E501, S101, RUF001, RUF003
 
 import datetime
-import json
 import logging
 import re
 
@@ -10,6 +9,7 @@ import google.protobuf.json_format
 import jsonschema
 import jsonschema.exceptions
 
+import mahjongsoul_sniffer.logging as logging_
 from mahjongsoul_sniffer.mahjongsoul_pb2 import (
     GameDetailRecords,
     RecordAnGangAddGang,
@@ -2831,8 +2831,8 @@ class ValidationError(RuntimeError):
             assert header is None
             super().__init__(
                 f"""Failed to validate the detail of the game {uuid}:
-message: {message}
-json: {message_json}""",
+message: {logging_.payload(message)}
+json: {logging_.payload(message_json)}""",
             )
             return
 
@@ -2844,8 +2844,8 @@ json: {message_json}""",
         super().__init__(
             f"""Failed to validate the detail of the game {uuid},\
  {chang}{ju + 1}局{ben}本場, header = {header}, index = {index}:
-message: {message}
-json: {json.dumps(message_json)}""",
+message: {logging_.payload(message)}
+json: {logging_.payload(message_json)}""",
         )
 
 
@@ -3003,8 +3003,8 @@ def validate(message: bytes) -> None:  # noqa: C901
                 "json: %s",
                 name,
                 uuid,
-                record,
-                json.dumps(parse_json),
+                logging_.payload(record),
+                logging_.payload(parse_json),
             )
             raise ValidationError(
                 uuid,
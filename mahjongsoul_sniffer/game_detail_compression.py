@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import gzip
+import pathlib
+
+# 圧縮形式ごとのマジックナンバー．`ContentEncoding` が付いていない
+# オブジェクトでも形式を判別できる．圧縮していない牌譜詳細は WebSocket
+# のレスポンスメッセージそのもので，`\x03` から始まる．
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _import_zstandard():  # noqa: ANN202
+    # zstd を使うときだけ必要になる依存なので，遅延して import する．
+    try:
+        import zstandard  # noqa: PLC0415
+    except ImportError as e:
+        msg = "The `zstandard` package is required for zstd compression."
+        raise RuntimeError(msg) from e
+    return zstandard
+
+
+class Codec:
+    def __init__(
+        self,
+        *,
+        encoding: str | None,
+        level: int | None = None,
+        dictionary_path: pathlib.Path | None = None,
+    ) -> None:
+        if encoding not in (None, "gzip", "zstd"):
+            msg = f"{encoding}: An unsupported encoding."
+            raise RuntimeError(msg)
+        if dictionary_path is not None and encoding != "zstd":
+            msg = "A compression dictionary is only supported by zstd."
+            raise RuntimeError(msg)
+
+        self.__encoding = encoding
+        self.__level = level
+        self.__dictionary = None
+        if dictionary_path is not None:
+            zstandard = _import_zstandard()
+            self.__dictionary = zstandard.ZstdCompressionDict(
+                dictionary_path.read_bytes(),
+            )
+        self.__compressor = None
+        self.__decompressor = None
+
+    @property
+    def encoding(self) -> str | None:
+        return self.__encoding
+
+    @property
+    def dictionary_id(self) -> int | None:
+        if self.__dictionary is None:
+            return None
+        return self.__dictionary.dict_id()
+
+    def compress(self, data: bytes) -> bytes:
+        if self.__encoding is None:
+            return data
+        if self.__encoding == "gzip":
+            level = 9 if self.__level is None else self.__level
+            return gzip.compress(data, compresslevel=level, mtime=0)
+
+        if self.__compressor is None:
+            zstandard = _import_zstandard()
+            self.__compressor = zstandard.ZstdCompressor(
+                level=3 if self.__level is None else self.__level,
+                dict_data=self.__dictionary,
+            )
+        return self.__compressor.compress(data)
+
+    def decompress(self, data: bytes, encoding: str | None = None) -> bytes:
+        if encoding is None:
+            if data.startswith(_ZSTD_MAGIC):
+                encoding = "zstd"
+            elif data.startswith(_GZIP_MAGIC):
+                encoding = "gzip"
+
+        if encoding is None or encoding == "identity":
+            return data
+        if encoding == "gzip":
+            return gzip.decompress(data)
+        if encoding != "zstd":
+            msg = f"{encoding}: An unsupported encoding."
+            raise RuntimeError(msg)
+
+        zstandard = _import_zstandard()
+        dictionary_id = zstandard.get_frame_parameters(data).dict_id
+        if dictionary_id not in (0, self.dictionary_id):
+            msg = f"""A game detail is compressed with an unknown dictionary:
+expected: {self.dictionary_id}
+actual: {dictionary_id}"""
+            raise RuntimeError(msg)
+        if self.__decompressor is None:
+            self.__decompressor = zstandard.ZstdDecompressor(
+                dict_data=self.__dictionary,
+            )
+        # 圧縮時に内容の長さをフレームに書いているので，一度に展開できる．
+        return self.__decompressor.decompress(data)
+
+
+def create(config: dict | None) -> Codec:
+    if config is None:
+        return Codec(encoding=None)
+
+    dictionary_path = None
+    if "dictionary" in config:
+        dictionary_path = pathlib.Path(config["dictionary"])
+    return Codec(
+        encoding=config["encoding"],
+        level=config.get("level"),
+        dictionary_path=dictionary_path,
+    )
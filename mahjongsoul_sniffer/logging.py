@@ -1,9 +1,15 @@
 #!/usr/bin/env python3
-# ruff: noqa: PLW0603
+# ruff: noqa: PLW0603, RUF003
 
+import base64
+import collections
+import hashlib
+import json
 import logging
 import logging.handlers
 import pathlib
+import threading
+import time
 
 import mahjongsoul_sniffer.config as config_
 
@@ -11,6 +17,163 @@ _module_name = None
 _service_name = None
 _initialized = False
 
+# `payload` でログに残す先頭部分の既定の長さ (バイト数)．
+_DEFAULT_PAYLOAD_MAX_LENGTH = 1024
+# ペイロードのスプールに書いたハッシュ値を覚えておく最大数．
+_MAX_SPOOLED_DIGESTS = 4096
+
+_payload_max_length = _DEFAULT_PAYLOAD_MAX_LENGTH
+_payload_spool_logger = None
+_spooled_digests: collections.OrderedDict[str, None] = (
+    collections.OrderedDict()
+)
+_spool_lock = threading.Lock()
+
+
+def _spool_payload(digest: str, data: bytes) -> None:
+    if _payload_spool_logger is None:
+        return
+    with _spool_lock:
+        if digest in _spooled_digests:
+            return
+        _spooled_digests[digest] = None
+        if len(_spooled_digests) > _MAX_SPOOLED_DIGESTS:
+            _spooled_digests.popitem(last=False)
+    _payload_spool_logger.info(
+        "%s %s",
+        digest,
+        base64.b64encode(data).decode("ASCII"),
+    )
+
+
+def _format_payload(data: object) -> str:
+    if isinstance(data, bytes | bytearray | memoryview):
+        data = bytes(data)
+        encoded = data
+    else:
+        if isinstance(data, dict | list):
+            data = json.dumps(data, ensure_ascii=False)
+        else:
+            data = str(data)
+        encoded = data.encode("UTF-8")
+
+    if len(encoded) <= _payload_max_length:
+        return repr(data) if isinstance(data, bytes) else data
+
+    digest = hashlib.sha256(encoded).hexdigest()
+    _spool_payload(digest, encoded)
+    if isinstance(data, bytes):
+        head = repr(data[:_payload_max_length])
+    else:
+        head = encoded[:_payload_max_length].decode("UTF-8", errors="ignore")
+    return f"{head}... ({len(encoded)} bytes, sha256 = {digest})"
+
+
+class Payload:
+    # ログの引数に渡すと，そのログが実際に出力されるときにだけ整形する．
+    # `payload.max_length` バイトを超える部分は切り詰めて長さと SHA-256
+    # を付け，`payload.spool` が設定されていれば全体をスプールに書く．
+    def __init__(self, data: object) -> None:
+        self.__data = data
+        self.__text = None
+
+    def __str__(self) -> str:
+        if self.__text is None:
+            self.__text = _format_payload(self.__data)
+        return self.__text
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+def payload(data: object) -> Payload:
+    return Payload(data)
+
+
+class RateLimitFilter(logging.Filter):
+    # 同じキーのログを `interval` 秒あたり `burst` 件までに制限する．
+    # キーは `extra={"rate_limit_key": ...}` で指定でき，指定がなければ
+    # WARNING のログについてだけ呼び出し元の位置をキーにする．抑制した件数
+    # は次に出力するログの末尾に付ける．
+    def __init__(self, *, interval: float, burst: int) -> None:
+        super().__init__()
+        self.__interval = interval
+        self.__burst = burst
+        # キー → (トークン数，最後に更新した時刻，抑制した件数)．
+        self.__buckets: dict[object, list] = {}
+        self.__lock = threading.Lock()
+
+    def __get_key(self, record: logging.LogRecord) -> object | None:
+        key = getattr(record, "rate_limit_key", None)
+        if key is not None:
+            return key
+        if record.levelno != logging.WARNING:
+            return None
+        return (record.pathname, record.lineno)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # 複数のハンドラに同じフィルタを付けるので，判定は 1 つのログに
+        # つき 1 回だけ行う．
+        decision = getattr(record, "_rate_limit_decision", None)
+        if decision is not None:
+            return decision
+
+        decision = True
+        key = self.__get_key(record)
+        if key is not None:
+            now = time.monotonic()
+            with self.__lock:
+                bucket = self.__buckets.setdefault(key, [self.__burst, now, 0])
+                tokens = bucket[0] + (now - bucket[1]) * (
+                    self.__burst / self.__interval
+                )
+                bucket[0] = min(tokens, self.__burst)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    bucket[2] += 1
+                    decision = False
+                else:
+                    bucket[0] -= 1
+                    suppressed = bucket[2]
+                    bucket[2] = 0
+            if decision and suppressed > 0:
+                record.msg = f"""{record.msg}
+({suppressed} similar records were suppressed.)"""
+
+        record._rate_limit_decision = decision  # noqa: SLF001
+        return decision
+
+
+def _initialize_payload(config: dict) -> None:
+    global _payload_max_length
+    global _payload_spool_logger
+
+    _payload_max_length = config.get(
+        "max_length",
+        _DEFAULT_PAYLOAD_MAX_LENGTH,
+    )
+
+    if "spool" not in config:
+        return
+    spool_config = config["spool"]
+
+    spool_path = pathlib.Path(spool_config["path"])
+    spool_path.parent.mkdir(parents=True, exist_ok=True)
+    spool_handler = logging.handlers.RotatingFileHandler(
+        spool_path,
+        maxBytes=spool_config["max_bytes"],
+        backupCount=spool_config["backup_count"],
+        delay=True,
+    )
+    spool_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+
+    # 通常のログには流さない．
+    logger = logging.getLogger("mahjongsoul_sniffer.payload")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(spool_handler)
+    _payload_spool_logger = logger
+
 
 def initialize(
     *,
@@ -72,6 +235,16 @@ Current call: module_name = {module_name}, service_name = {service_name}"""
         )
         handlers.append(redis_handler)
 
+    if "rate_limit" in config:
+        rate_limit_filter = RateLimitFilter(
+            interval=config["rate_limit"]["interval"],
+            burst=config["rate_limit"]["burst"],
+        )
+        for handler in handlers:
+            handler.addFilter(rate_limit_filter)
+
+    _initialize_payload(config.get("payload", {}))
+
     log_format = "%(asctime)s:%(filename)s:%(funcName)s:%(lineno)d:\
 %(levelname)s: %(message)s"
     logging.basicConfig(format=log_format, level=level, handlers=handlers)
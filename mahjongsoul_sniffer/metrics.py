@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import abc
+import bisect
+import contextlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterator
+
+import mahjongsoul_sniffer.redis as redis_
+
+# プロセス内のメトリクス (カウンタ，ゲージ，ヒストグラム) を集計し，
+# 定期的に Redis の `metrics.<service name>.<instance>` に書き込む．
+# `<instance>` は `<hostname>:<pid>` で，同じサービスを複数のプロセスで
+# 動かしても互いに上書きしない．モニタはそれを読んで Prometheus の
+# テキスト形式で返す．更新はロックを 1 回取るだけ
+# なので，mitmproxy のイベントフック等からも呼べる．
+
+# ヒストグラムの既定の境界 (秒)．
+_DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# 集計値を Redis に書き込む既定の間隔 (秒)．
+_DEFAULT_PUBLISH_INTERVAL = 10.0
+# 書き込みが途絶えたサービスの集計値が消えるまでの，書き込み間隔に
+# 対する倍数．
+_PUBLISH_EXPIRY_FACTOR = 6
+_KEY_PREFIX = "metrics."
+
+
+class _Metric(abc.ABC):
+    type_name = ""
+
+    def __init__(self, name: str, help_: str, labels: dict[str, str]) -> None:
+        self._name = name
+        self._help = help_
+        self._labels = labels
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _snapshot_value(self) -> object:
+        pass
+
+    def snapshot(self) -> dict:
+        return {
+            "name": self._name,
+            "type": self.type_name,
+            "help": self._help,
+            "labels": self._labels,
+            "value": self._snapshot_value(),
+        }
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, help_: str, labels: dict[str, str]) -> None:
+        super().__init__(name, help_, labels)
+        self.__value = 0
+        self.__function = None
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.__value += amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        # 集計するときに `function` を呼んで値を得る．持ち主が既に
+        # 数えている単調増加の値に使う．
+        with self._lock:
+            self.__function = function
+
+    def _snapshot_value(self) -> float:
+        with self._lock:
+            function = self.__function
+            value = self.__value
+        if function is not None:
+            return function()
+        return value
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_: str, labels: dict[str, str]) -> None:
+        super().__init__(name, help_, labels)
+        self.__value = 0
+        self.__function = None
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.__value = value
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.__value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        # 集計するときに `function` を呼んで値を得る．キューの長さ等，
+        # 持ち主が既に数えている値に使う．
+        with self._lock:
+            self.__function = function
+
+    def _snapshot_value(self) -> float:
+        with self._lock:
+            function = self.__function
+            value = self.__value
+        if function is not None:
+            return function()
+        return value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_: str,
+        labels: dict[str, str],
+        buckets: tuple[float, ...],
+    ) -> None:
+        super().__init__(name, help_, labels)
+        self.__buckets = tuple(sorted(buckets))
+        # 最後の要素は `+Inf` のバケット．
+        self.__counts = [0] * (len(self.__buckets) + 1)
+        self.__sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.__buckets, value)
+        with self._lock:
+            self.__counts[index] += 1
+            self.__sum += value
+
+    @contextlib.contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def _snapshot_value(self) -> dict:
+        with self._lock:
+            counts = list(self.__counts)
+            total = self.__sum
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(
+            [*self.__buckets, "+Inf"],
+            counts,
+            strict=True,
+        ):
+            cumulative += count
+            buckets.append([bound, cumulative])
+        return {"buckets": buckets, "sum": total, "count": cumulative}
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.__metrics: dict[tuple, _Metric] = {}
+        self.__lock = threading.Lock()
+
+    def __get(
+        self,
+        metric_type: type,
+        name: str,
+        help_: str,
+        labels: dict[str, str] | None,
+        *args: object,
+    ) -> _Metric:
+        labels = {} if labels is None else dict(labels)
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            metric = self.__metrics.get(key)
+            if metric is None:
+                metric = metric_type(name, help_, labels, *args)
+                self.__metrics[key] = metric
+        if not isinstance(metric, metric_type):
+            msg = f"{name}: Already registered as a {metric.type_name}."
+            raise TypeError(msg)
+        return metric
+
+    def counter(
+        self,
+        name: str,
+        help_: str,
+        *,
+        labels: dict[str, str] | None = None,
+    ) -> Counter:
+        return self.__get(Counter, name, help_, labels)
+
+    def gauge(
+        self,
+        name: str,
+        help_: str,
+        *,
+        labels: dict[str, str] | None = None,
+    ) -> Gauge:
+        return self.__get(Gauge, name, help_, labels)
+
+    def histogram(
+        self,
+        name: str,
+        help_: str,
+        *,
+        labels: dict[str, str] | None = None,
+        buckets: tuple[float, ...] = _DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.__get(Histogram, name, help_, labels, buckets)
+
+    def snapshot(self) -> list[dict]:
+        with self.__lock:
+            metrics = list(self.__metrics.values())
+        return [metric.snapshot() for metric in metrics]
+
+
+_registry = Registry()
+
+
+def counter(
+    name: str,
+    help_: str,
+    *,
+    labels: dict[str, str] | None = None,
+) -> Counter:
+    return _registry.counter(name, help_, labels=labels)
+
+
+def gauge(
+    name: str,
+    help_: str,
+    *,
+    labels: dict[str, str] | None = None,
+) -> Gauge:
+    return _registry.gauge(name, help_, labels=labels)
+
+
+def histogram(
+    name: str,
+    help_: str,
+    *,
+    labels: dict[str, str] | None = None,
+    buckets: tuple[float, ...] = _DEFAULT_BUCKETS,
+) -> Histogram:
+    return _registry.histogram(name, help_, labels=labels, buckets=buckets)
+
+
+def snapshot() -> list[dict]:
+    return _registry.snapshot()
+
+
+class _Publisher:
+    def __init__(
+        self,
+        *,
+        module_name: str,
+        service_name: str,
+        interval: float,
+    ) -> None:
+        self.__redis = redis_.Redis(module_name=module_name)
+        instance = f"{socket.gethostname()}:{os.getpid()}"
+        self.__key = f"{_KEY_PREFIX}{service_name}.{instance}"
+        self.__interval = interval
+        self.__thread = threading.Thread(
+            target=self.__run,
+            name="MetricsPublisher",
+            daemon=True,
+        )
+        self.__thread.start()
+
+    def __run(self) -> None:
+        while True:
+            time.sleep(self.__interval)
+            try:
+                self.publish()
+            except Exception:
+                logging.exception("Failed to publish metrics to Redis.")
+
+    def publish(self) -> None:
+        data = json.dumps(snapshot(), separators=(",", ":"))
+        self.__redis.set(
+            self.__key,
+            data.encode("UTF-8"),
+            ex=max(int(self.__interval * _PUBLISH_EXPIRY_FACTOR), 1),
+        )
+
+
+_publisher = None
+
+
+def start_publisher(
+    *,
+    module_name: str,
+    service_name: str,
+    interval: float = _DEFAULT_PUBLISH_INTERVAL,
+) -> None:
+    global _publisher  # noqa: PLW0603
+
+    if _publisher is not None:
+        return
+    _publisher = _Publisher(
+        module_name=module_name,
+        service_name=service_name,
+        interval=interval,
+    )
+
+
+def get_published(
+    redis: redis_.Redis,
+    *,
+    service_names: list[str],
+) -> dict[str, dict[str, list[dict]]]:
+    # サービス名 → インスタンス → `snapshot()` の表．モニタのスクレイプ
+    # ごとに呼ばれるので，接続は呼び出し側のものを使う．
+    result = {}
+    for service_name in service_names:
+        key_prefix = f"{_KEY_PREFIX}{service_name}."
+        instances = {}
+        for key in redis.scan_keys(f"{key_prefix}*"):
+            data = redis.get(key)
+            if data is not None:
+                instances[key.removeprefix(key_prefix)] = json.loads(data)
+        if len(instances) > 0:
+            result[service_name] = instances
+    return result
+
+
+def _escape_label_value(value: str) -> str:
+    value = value.replace("\\", "\\\\")
+    value = value.replace('"', '\\"')
+    return value.replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if len(labels) == 0:
+        return ""
+    pairs = ",".join(
+        f'{key}="{_escape_label_value(str(value))}"'
+        for key, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+def _format_number(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def render(snapshots: dict[str, dict[str, list[dict]]]) -> str:
+    # `get_published` の表を Prometheus のテキスト形式にする．サービス名
+    # とインスタンスは `service` と `instance` ラベルになる．
+    families: dict[str, list[tuple[dict[str, str], dict]]] = {}
+    for service_name, instances in snapshots.items():
+        for instance, metrics in instances.items():
+            for metric in metrics:
+                families.setdefault(metric["name"], []).append(
+                    ({"service": service_name, "instance": instance}, metric),
+                )
+
+    lines = []
+    for name in sorted(families):
+        first = families[name][0][1]
+        lines.append(f"# HELP {name} {first['help']}")
+        lines.append(f"# TYPE {name} {first['type']}")
+        for service_labels, metric in families[name]:
+            labels = {**service_labels, **metric["labels"]}
+            value = metric["value"]
+            if metric["type"] != "histogram":
+                lines.append(
+                    f"{name}{_format_labels(labels)} {_format_number(value)}",
+                )
+                continue
+            for bound, count in value["buckets"]:
+                bucket_labels = {**labels, "le": str(bound)}
+                lines.append(
+                    f"{name}_bucket{_format_labels(bucket_labels)} {count}",
+                )
+            lines.append(
+                f"{name}_sum{_format_labels(labels)} "
+                f"{_format_number(value['sum'])}",
+            )
+            lines.append(
+                f"{name}_count{_format_labels(labels)} {value['count']}",
+            )
+    lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import os
+import pathlib
+
+# mitmdump の addon の準備ができたことを起動スクリプトに知らせる．
+# 起動スクリプトはこの環境変数にファイルのパスを設定して mitmdump を
+# 起動し，そのファイルが作られるまで待つ．
+READY_FILE_ENVIRONMENT_VARIABLE = "MAHJONGSOUL_SNIFFER_READY_FILE"
+
+
+def notify() -> None:
+    # mitmproxy の `running` フック (プロキシが接続を受け付け始めたとき)
+    # から呼ぶ．環境変数が無ければ何もしない．
+    path = os.environ.get(READY_FILE_ENVIRONMENT_VARIABLE)
+    if path is None or path == "":
+        return
+    pathlib.Path(path).touch()
@@ -1,56 +1,191 @@
 #!/usr/bin/env python3
+# ruff: noqa: RUF003
 
-import base64
 import datetime
-import json
+import os
+import socket
 
-import jsonschema
 import redis
+import redis.asyncio
 from redis.typing import ExpiryT
 
+import mahjongsoul_sniffer.claim_check as claim_check_
 import mahjongsoul_sniffer.config as config_
+import mahjongsoul_sniffer.redis_backend as redis_backend_
+import mahjongsoul_sniffer.websocket_message as websocket_message_
 
-_WEBSOCKET_MESSAGE_SCHEMA = {
-    "type": "object",
-    "required": [
-        "request_direction",
-        "request",
-        "response",
-        "timestamp",
-    ],
-    "properties": {
-        "request_direction": {
-            "enum": [
-                "inbound",
-                "outbound",
-            ],
-        },
-        "request": {
-            "type": "string",
-        },
-        "response": {
-            "type": [
-                "string",
-                "null",
-            ],
-        },
-        "timestamp": {
-            "type": "number",
-        },
-    },
-    "additionalProperties": False,
-}
+_STREAM_FIELD = b"message"
 
 
-class Redis:
-    def __init__(self, *, module_name: str) -> None:
-        config = config_.get(module_name)
-        config = config["redis"]
+def _create_local_backend(
+    config: dict,
+) -> redis_backend_.InProcessBackend | redis_backend_.SQLiteBackend:
+    backend_type = config["backend"]["type"]
+
+    if backend_type == "in_process":
+        return redis_backend_.get_in_process_backend()
+
+    assert backend_type == "sqlite"  # noqa: S101
+    if "path" not in config["backend"]:
+        msg = "`redis.backend.path` is required for the `sqlite` backend."
+        raise RuntimeError(msg)
+    return redis_backend_.get_sqlite_backend(config["backend"]["path"])
+
+
+def _create_backend(
+    module_name: str,
+    socket_timeout: float | None,
+) -> object:
+    config = config_.get(module_name)
+    config = config["redis"]
+
+    if "backend" not in config or config["backend"]["type"] == "redis":
+        return redis.Redis(
+            host=config["host"],
+            port=config["port"],
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout,
+        )
+
+    return _create_local_backend(config)
+
+
+def _create_async_backend(module_name: str) -> object:
+    config = config_.get(module_name)
+    config = config["redis"]
+
+    if "backend" not in config or config["backend"]["type"] == "redis":
+        return redis.asyncio.Redis(host=config["host"], port=config["port"])
+
+    return redis_backend_.AsyncAdapter(_create_local_backend(config))
+
+
+def _parse_xautoclaim(
+    result: list,
+) -> tuple[bytes, list[tuple[bytes, dict]], list[bytes]]:
+    # `XAUTOCLAIM` の応答を (次の開始 ID，エントリ，既に `XDEL` された
+    # エントリの ID) に分ける．`XDEL` されたエントリは，Redis 6.2 では
+    # フィールドが無いエントリとして (redis-py は `(None, None)` か
+    # `(ID, None)` にする)，Redis 7 以降では 3 番目の要素の ID の一覧と
+    # して返る．
+    start_id = result[0]
+    entries = []
+    deleted_ids = []
+    for entry_id, fields in result[1]:
+        if entry_id is None:
+            continue
+        if fields is None:
+            deleted_ids.append(entry_id)
+            continue
+        entries.append((entry_id, fields))
+    if len(result) > 2:
+        deleted_ids.extend(result[2])
+    return start_id, entries, deleted_ids
+
+
+def _check_max_count(max_count: int) -> None:
+    if max_count < 1:
+        msg = f"{max_count}: `max_count` must be a positive integer."
+        raise ValueError(msg)
+
+
+def _encode_timestamp(timestamp: datetime.datetime) -> bytes:
+    timestamp = timestamp.timestamp()
+    timestamp = str(timestamp)
+    return timestamp.encode("UTF-8")
+
+
+def _decode_timestamp(timestamp: bytes | None) -> datetime.datetime | None:
+    if timestamp is None:
+        return None
+
+    timestamp = timestamp.decode("UTF-8")
+    timestamp = float(timestamp)
+    return datetime.datetime.fromtimestamp(
+        timestamp,
+        tz=datetime.timezone.utc,
+    )
 
-        host = config["host"]
-        port = config["port"]
 
-        self.__redis = redis.Redis(host=host, port=port)
+class Pipeline:
+    def __init__(self, pipeline: object) -> None:
+        self._pipeline = pipeline
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def set(
+        self,
+        key: str,
+        value: bytes,
+        *,
+        ex: ExpiryT | None = None,
+        px: ExpiryT | None = None,
+        nx: bool = False,
+        xx: bool = False,
+    ) -> None:
+        key = key.encode("UTF-8")
+        self._pipeline.set(key, value, ex=ex, px=px, nx=nx, xx=xx)
+        self._length += 1
+
+    def lpush(self, key: str, value: bytes) -> None:
+        key = key.encode("UTF-8")
+        self._pipeline.lpush(key, value)
+        self._length += 1
+
+    def lpushx(self, key: str, value: bytes) -> None:
+        key = key.encode("UTF-8")
+        self._pipeline.lpushx(key, value)
+        self._length += 1
+
+    def rpush(self, key: str, *values: bytes) -> None:
+        key = key.encode("UTF-8")
+        self._pipeline.rpush(key, *values)
+        self._length += 1
+
+    def rpushx(self, key: str, value: bytes) -> None:
+        key = key.encode("UTF-8")
+        self._pipeline.rpushx(key, value)
+        self._length += 1
+
+    def ltrim(self, key: str, start: int, end: int) -> None:
+        key = key.encode("UTF-8")
+        self._pipeline.ltrim(key, start, end)
+        self._length += 1
+
+    def xadd(self, key: str, value: bytes) -> None:
+        key = key.encode("UTF-8")
+        self._pipeline.xadd(key, {_STREAM_FIELD: value})
+        self._length += 1
+
+    def execute(self) -> None:
+        if self._length == 0:
+            return
+        self._pipeline.execute()
+        self._length = 0
+
+
+class AsyncPipeline(Pipeline):
+    # コマンドの記録は同期的で，`execute` だけが往復を待つ．
+    async def execute(self) -> None:
+        if self._length == 0:
+            return
+        await self._pipeline.execute()
+        self._length = 0
+
+
+class Redis:
+    def __init__(
+        self,
+        *,
+        module_name: str,
+        socket_timeout: float | None = None,
+    ) -> None:
+        # `socket_timeout` は Redis サーバへの接続と各コマンドの応答を
+        # 待つ上限 (秒)．既定では無制限に待つ．
+        self.__redis = _create_backend(module_name, socket_timeout)
+        self.__claim_check = claim_check_.create(module_name=module_name)
 
     def set(
         self,
@@ -103,36 +238,112 @@ class Redis:
         key = key.encode("UTF-8")
         self.__redis.delete(key)
 
-    def rpush_websocket_message(self, key: str, message: dict) -> None:
+    def scan_keys(self, pattern: str) -> list[str]:
+        # glob 形式の `pattern` に合うキーを `SCAN` で集める．
+        keys = self.__redis.scan_iter(match=pattern.encode("UTF-8"), count=100)
+        return sorted({key.decode("UTF-8") for key in keys})
+
+    def xadd(self, key: str, value: bytes) -> bytes:
         key = key.encode("UTF-8")
+        return self.__redis.xadd(key, {_STREAM_FIELD: value})
 
-        message["request"] = base64.b64encode(message["request"])
-        message["request"] = message["request"].decode("UTF-8")
-        if message["response"] is not None:
-            message["response"] = base64.b64encode(message["response"])
-            message["response"] = message["response"].decode("UTF-8")
-        message["timestamp"] = message["timestamp"].timestamp()
-        jsonschema.validate(instance=message, schema=_WEBSOCKET_MESSAGE_SCHEMA)
+    def xgroup_create(self, key: str, group: str) -> None:
+        key = key.encode("UTF-8")
+        group = group.encode("UTF-8")
+        try:
+            # ストリームとグループが存在しなければ作成する．グループ作成前に
+            # 追加されたエントリも配送されるように `id="0"` を指定する．
+            self.__redis.xgroup_create(key, group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if not str(e).startswith("BUSYGROUP"):
+                raise
+
+    def xreadgroup(
+        self,
+        key: str,
+        group: str,
+        consumer: str,
+        *,
+        block: int,
+    ) -> tuple[bytes, bytes] | None:
+        key = key.encode("UTF-8")
+        group = group.encode("UTF-8")
+        consumer = consumer.encode("UTF-8")
+        result = self.__redis.xreadgroup(
+            group,
+            consumer,
+            {key: ">"},
+            count=1,
+            block=block,
+        )
+        if not result:
+            return None
 
-        message = json.dumps(message, allow_nan=False, separators=(",", ":"))
-        message = message.encode("UTF-8")
+        key_, entries = result[0]
+        assert key_ == key  # noqa: S101
+        entry_id, fields = entries[0]
+        return entry_id, fields[_STREAM_FIELD]
 
+    def xautoclaim(
+        self,
+        key: str,
+        group: str,
+        consumer: str,
+        *,
+        min_idle_time: int,
+    ) -> tuple[bytes, bytes] | None:
+        key = key.encode("UTF-8")
+        group = group.encode("UTF-8")
+        consumer = consumer.encode("UTF-8")
+
+        start_id = b"0-0"
+        while True:
+            result = self.__redis.xautoclaim(
+                key,
+                group,
+                consumer,
+                min_idle_time,
+                start_id=start_id,
+                count=1,
+            )
+            start_id, entries, deleted_ids = _parse_xautoclaim(result)
+            if len(deleted_ids) > 0:
+                self.__redis.xack(key, group, *deleted_ids)
+
+            if len(entries) > 0:
+                entry_id, fields = entries[0]
+                return entry_id, fields[_STREAM_FIELD]
+
+            if start_id == b"0-0":
+                return None
+
+    def xackdel(self, key: str, group: str, entry_id: bytes) -> None:
+        key = key.encode("UTF-8")
+        group = group.encode("UTF-8")
+        # 処理済みのエントリを保留中リストとストリームの両方から
+        # 1往復で取り除き，ストリームが際限なく伸びないようにする．
+        pipeline = self.__redis.pipeline(transaction=True)
+        pipeline.xack(key, group, entry_id)
+        pipeline.xdel(key, entry_id)
+        pipeline.execute()
+
+    def rpush_websocket_message(self, key: str, message: dict) -> None:
+        key = key.encode("UTF-8")
+        message = websocket_message_.encode(message, self.__claim_check)
         self.__redis.rpush(key, message)
 
-    def __decode_websocket_message(self, message: bytes) -> dict:
-        message = message.decode("UTF-8")
-        message = json.loads(message)
-        jsonschema.validate(instance=message, schema=_WEBSOCKET_MESSAGE_SCHEMA)
+    def rpush_websocket_messages(self, key: str, messages: list[dict]) -> None:
+        if len(messages) == 0:
+            return
 
-        message["request"] = base64.b64decode(message["request"])
-        if message["response"] is not None:
-            message["response"] = base64.b64decode(message["response"])
-        message["timestamp"] = datetime.datetime.fromtimestamp(
-            message["timestamp"],
-            tz=datetime.timezone.utc,
-        )
+        key = key.encode("UTF-8")
+        messages = [
+            websocket_message_.encode(message, self.__claim_check)
+            for message in messages
+        ]
 
-        return message
+        # 1回の `RPUSH` で全てのメッセージを送信する．
+        self.__redis.rpush(key, *messages)
 
     def lpop_websocket_message(self, key: str) -> dict | None:
         message = self.lpop(key)
@@ -140,11 +351,46 @@ class Redis:
         if message is None:
             return None
 
-        return self.__decode_websocket_message(message)
+        return websocket_message_.decode(message, self.__claim_check)
 
     def blpop_websocket_message(self, key: str) -> dict:
         message = self.blpop(key)
-        return self.__decode_websocket_message(message)
+        return websocket_message_.decode(message, self.__claim_check)
+
+    def pop_websocket_messages(
+        self,
+        key: str,
+        max_count: int,
+        timeout: float | None = None,
+    ) -> list[dict]:
+        _check_max_count(max_count)
+
+        key = key.encode("UTF-8")
+
+        if timeout is None:
+            # `LPOP key count` (Redis 6.2 以降) で最大 `max_count` 個の
+            # メッセージを1往復で取り出す．
+            messages = self.__redis.lpop(key, max_count)
+            if messages is None:
+                return []
+        else:
+            # `BLMPOP` (Redis 7.0 以降) で最大 `timeout` 秒待ってから
+            # 最大 `max_count` 個のメッセージを1往復で取り出す．
+            result = self.__redis.blmpop(
+                timeout,
+                1,
+                key,
+                direction="LEFT",
+                count=max_count,
+            )
+            if result is None:
+                return []
+            key_, messages = result
+            assert key_ == key  # noqa: S101
+
+        return [
+            websocket_message_.decode(m, self.__claim_check) for m in messages
+        ]
 
     def get_websocket_message(self, key: str) -> dict | None:
         message = self.get(key)
@@ -152,31 +398,365 @@ class Redis:
         if message is None:
             return None
 
-        return self.__decode_websocket_message(message)
+        return websocket_message_.decode(message, self.__claim_check)
 
     def set_timestamp(self, key: str) -> None:
         key = key.encode("UTF-8")
         now = datetime.datetime.now(tz=datetime.timezone.utc)
-        timestamp = now.timestamp()
-        timestamp = str(timestamp)
-        timestamp = timestamp.encode("UTF-8")
-        self.__redis.set(key, timestamp)
+        self.__redis.set(key, _encode_timestamp(now))
 
     def get_timestamp(self, key: str) -> datetime.datetime | None:
         key = key.encode("UTF-8")
         timestamp = self.__redis.get(key)
+        return _decode_timestamp(timestamp)
 
-        if timestamp is None:
-            return None
+    def get_all_log_records(self, key: str) -> list[str]:
+        key = key.encode("UTF-8")
+        records = self.__redis.lrange(key, 0, -1)
+        return [record.decode("UTF-8") for record in records]
+
+    def pipeline(self) -> Pipeline:
+        # 複数のコマンドを1往復で送る．トランザクションは張らない．
+        return Pipeline(self.__redis.pipeline(transaction=False))
 
-        timestamp = timestamp.decode("UTF-8")
-        timestamp = float(timestamp)
-        return datetime.datetime.fromtimestamp(
-            timestamp,
-            tz=datetime.timezone.utc,
+
+class AsyncRedis:
+    def __init__(self, *, module_name: str) -> None:
+        self.__redis = _create_async_backend(module_name)
+        self.__claim_check = claim_check_.create(module_name=module_name)
+
+    async def aclose(self) -> None:
+        await self.__redis.aclose()
+
+    async def set(
+        self,
+        key: str,
+        value: bytes,
+        *,
+        ex: ExpiryT | None = None,
+        px: ExpiryT | None = None,
+        nx: bool = False,
+        xx: bool = False,
+    ) -> None:
+        key = key.encode("UTF-8")
+        await self.__redis.set(key, value, ex=ex, px=px, nx=nx, xx=xx)
+
+    async def get(self, key: str) -> bytes | None:
+        key = key.encode("UTF-8")
+        return await self.__redis.get(key)
+
+    async def lpush(self, key: str, value: bytes) -> None:
+        key = key.encode("UTF-8")
+        await self.__redis.lpush(key, value)
+
+    async def lpushx(self, key: str, value: bytes) -> None:
+        key = key.encode("UTF-8")
+        await self.__redis.lpushx(key, value)
+
+    async def rpush(self, key: str, value: bytes) -> None:
+        key = key.encode("UTF-8")
+        await self.__redis.rpush(key, value)
+
+    async def rpushx(self, key: str, value: bytes) -> None:
+        key = key.encode("UTF-8")
+        await self.__redis.rpushx(key, value)
+
+    async def llen(self, key: str) -> int:
+        key = key.encode("UTF-8")
+        return await self.__redis.llen(key)
+
+    async def lpop(self, key: str) -> bytes | None:
+        key = key.encode("UTF-8")
+        return await self.__redis.lpop(key)
+
+    async def blpop(self, key: str) -> bytes:
+        key = key.encode("UTF-8")
+        key_, value = await self.__redis.blpop(key)
+        assert key_ == key  # noqa: S101
+        return value
+
+    async def delete(self, key: str) -> None:
+        key = key.encode("UTF-8")
+        await self.__redis.delete(key)
+
+    async def xadd(self, key: str, value: bytes) -> bytes:
+        key = key.encode("UTF-8")
+        return await self.__redis.xadd(key, {_STREAM_FIELD: value})
+
+    async def xgroup_create(self, key: str, group: str) -> None:
+        key = key.encode("UTF-8")
+        group = group.encode("UTF-8")
+        try:
+            # ストリームとグループが存在しなければ作成する．グループ作成前に
+            # 追加されたエントリも配送されるように `id="0"` を指定する．
+            await self.__redis.xgroup_create(key, group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if not str(e).startswith("BUSYGROUP"):
+                raise
+
+    async def xreadgroup(
+        self,
+        key: str,
+        group: str,
+        consumer: str,
+        *,
+        block: int,
+    ) -> tuple[bytes, bytes] | None:
+        key = key.encode("UTF-8")
+        group = group.encode("UTF-8")
+        consumer = consumer.encode("UTF-8")
+        result = await self.__redis.xreadgroup(
+            group,
+            consumer,
+            {key: ">"},
+            count=1,
+            block=block,
         )
+        if not result:
+            return None
 
-    def get_all_log_records(self, key: str) -> list[str]:
+        key_, entries = result[0]
+        assert key_ == key  # noqa: S101
+        entry_id, fields = entries[0]
+        return entry_id, fields[_STREAM_FIELD]
+
+    async def xautoclaim(
+        self,
+        key: str,
+        group: str,
+        consumer: str,
+        *,
+        min_idle_time: int,
+    ) -> tuple[bytes, bytes] | None:
         key = key.encode("UTF-8")
-        records = self.__redis.lrange(key, 0, -1)
+        group = group.encode("UTF-8")
+        consumer = consumer.encode("UTF-8")
+
+        start_id = b"0-0"
+        while True:
+            result = await self.__redis.xautoclaim(
+                key,
+                group,
+                consumer,
+                min_idle_time,
+                start_id=start_id,
+                count=1,
+            )
+            start_id, entries, deleted_ids = _parse_xautoclaim(result)
+            if len(deleted_ids) > 0:
+                await self.__redis.xack(key, group, *deleted_ids)
+
+            if len(entries) > 0:
+                entry_id, fields = entries[0]
+                return entry_id, fields[_STREAM_FIELD]
+
+            if start_id == b"0-0":
+                return None
+
+    async def xackdel(self, key: str, group: str, entry_id: bytes) -> None:
+        key = key.encode("UTF-8")
+        group = group.encode("UTF-8")
+        # 処理済みのエントリを保留中リストとストリームの両方から
+        # 1往復で取り除き，ストリームが際限なく伸びないようにする．
+        pipeline = self.__redis.pipeline(transaction=True)
+        pipeline.xack(key, group, entry_id)
+        pipeline.xdel(key, entry_id)
+        await pipeline.execute()
+
+    async def rpush_websocket_message(self, key: str, message: dict) -> None:
+        key = key.encode("UTF-8")
+        message = websocket_message_.encode(message, self.__claim_check)
+        await self.__redis.rpush(key, message)
+
+    async def rpush_websocket_messages(
+        self,
+        key: str,
+        messages: list[dict],
+    ) -> None:
+        if len(messages) == 0:
+            return
+
+        key = key.encode("UTF-8")
+        messages = [
+            websocket_message_.encode(message, self.__claim_check)
+            for message in messages
+        ]
+
+        # 1回の `RPUSH` で全てのメッセージを送信する．
+        await self.__redis.rpush(key, *messages)
+
+    async def lpop_websocket_message(self, key: str) -> dict | None:
+        message = await self.lpop(key)
+
+        if message is None:
+            return None
+
+        return websocket_message_.decode(message, self.__claim_check)
+
+    async def blpop_websocket_message(self, key: str) -> dict:
+        message = await self.blpop(key)
+        return websocket_message_.decode(message, self.__claim_check)
+
+    async def pop_websocket_messages(
+        self,
+        key: str,
+        max_count: int,
+        timeout: float | None = None,
+    ) -> list[dict]:
+        _check_max_count(max_count)
+
+        key = key.encode("UTF-8")
+
+        if timeout is None:
+            # `LPOP key count` (Redis 6.2 以降) で最大 `max_count` 個の
+            # メッセージを1往復で取り出す．
+            messages = await self.__redis.lpop(key, max_count)
+            if messages is None:
+                return []
+        else:
+            # `BLMPOP` (Redis 7.0 以降) で最大 `timeout` 秒待ってから
+            # 最大 `max_count` 個のメッセージを1往復で取り出す．
+            result = await self.__redis.blmpop(
+                timeout,
+                1,
+                key,
+                direction="LEFT",
+                count=max_count,
+            )
+            if result is None:
+                return []
+            key_, messages = result
+            assert key_ == key  # noqa: S101
+
+        return [
+            websocket_message_.decode(m, self.__claim_check) for m in messages
+        ]
+
+    async def get_websocket_message(self, key: str) -> dict | None:
+        message = await self.get(key)
+
+        if message is None:
+            return None
+
+        return websocket_message_.decode(message, self.__claim_check)
+
+    async def set_timestamp(self, key: str) -> None:
+        key = key.encode("UTF-8")
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        await self.__redis.set(key, _encode_timestamp(now))
+
+    async def get_timestamp(self, key: str) -> datetime.datetime | None:
+        key = key.encode("UTF-8")
+        timestamp = await self.__redis.get(key)
+        return _decode_timestamp(timestamp)
+
+    async def get_all_log_records(self, key: str) -> list[str]:
+        key = key.encode("UTF-8")
+        records = await self.__redis.lrange(key, 0, -1)
         return [record.decode("UTF-8") for record in records]
+
+    def pipeline(self) -> AsyncPipeline:
+        # 複数のコマンドを1往復で送る．
+        return AsyncPipeline(self.__redis.pipeline(transaction=False))
+
+
+def get_queue_backend(*, module_name: str) -> str:
+    config = config_.get(module_name)
+    config = config["redis"]
+    if "queue" not in config:
+        return "list"
+    return config["queue"]["backend"]
+
+
+def get_queue_push_command(*, module_name: str) -> str:
+    backend = get_queue_backend(module_name=module_name)
+    if backend == "stream":
+        return "XADD"
+    assert backend == "list"  # noqa: S101
+    return "RPUSH"
+
+
+class WebSocketMessageQueue:
+    def __init__(self, *, module_name: str, key: str) -> None:
+        config = config_.get(module_name)
+        config = config["redis"]
+
+        self.__redis = Redis(module_name=module_name)
+        self.__claim_check = claim_check_.create(module_name=module_name)
+        self.__key = key
+        self.__backend = get_queue_backend(module_name=module_name)
+        # 取り出したがまだ ack していないメッセージの ID → claim check に
+        # 退避されていたかもしれないペイロード．ack したときに消す．
+        self.__unacked_payloads: dict[bytes | None, list[bytes]] = {}
+
+        if self.__backend == "stream":
+            queue_config = config["queue"]
+            self.__group = queue_config.get("group", "archiver")
+            self.__consumer = f"{socket.gethostname()}-{os.getpid()}"
+            self.__min_idle_time = queue_config.get("min_idle_time", 600000)
+            self.__redis.xgroup_create(self.__key, self.__group)
+
+    def push(self, message: dict) -> None:
+        if self.__backend == "list":
+            self.__redis.rpush_websocket_message(self.__key, message)
+            return
+
+        message = websocket_message_.encode(message, self.__claim_check)
+        self.__redis.xadd(self.__key, message)
+
+    def __track_payloads(
+        self,
+        message_id: bytes | None,
+        message: dict,
+    ) -> None:
+        if self.__claim_check is None:
+            return
+        payloads = [message["request"]]
+        if message["response"] is not None:
+            payloads.append(message["response"])
+        self.__unacked_payloads[message_id] = payloads
+
+    def pop(self) -> tuple[bytes | None, dict]:
+        if self.__backend == "list":
+            message = self.__redis.blpop_websocket_message(self.__key)
+            self.__track_payloads(None, message)
+            return None, message
+
+        while True:
+            # 停止したコンシューマが処理中のまま残したエントリを優先して
+            # 引き取る．
+            entry = self.__redis.xautoclaim(
+                self.__key,
+                self.__group,
+                self.__consumer,
+                min_idle_time=self.__min_idle_time,
+            )
+            if entry is None:
+                entry = self.__redis.xreadgroup(
+                    self.__key,
+                    self.__group,
+                    self.__consumer,
+                    block=self.__min_idle_time,
+                )
+            if entry is not None:
+                break
+
+        entry_id, message = entry
+        message = websocket_message_.decode(message, self.__claim_check)
+        self.__track_payloads(entry_id, message)
+        return entry_id, message
+
+    def __release_payloads(self, message_id: bytes | None) -> None:
+        payloads = self.__unacked_payloads.pop(message_id, [])
+        for payload in payloads:
+            self.__claim_check.release(payload)
+
+    def ack(self, message_id: bytes | None) -> None:
+        if self.__backend == "list":
+            assert message_id is None  # noqa: S101
+            self.__release_payloads(message_id)
+            return
+
+        assert message_id is not None  # noqa: S101
+        self.__redis.xackdel(self.__key, self.__group, message_id)
+        self.__release_payloads(message_id)
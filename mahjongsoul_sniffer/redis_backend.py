@@ -0,0 +1,621 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import asyncio
+import collections
+import fnmatch
+import functools
+import pathlib
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+
+from redis.typing import ExpiryT
+
+# `mahjongsoul_sniffer.redis.Redis` が使う `redis.Redis` のメソッドのうち，
+# リストとキー・バリューに関するものだけを同じシグネチャで実装する．
+# ストリーム (`XADD` など) は Redis サーバでしか使えない．
+
+
+def _to_seconds(*, ex: ExpiryT | None, px: ExpiryT | None) -> float | None:
+    if ex is not None:
+        if hasattr(ex, "total_seconds"):
+            return ex.total_seconds()
+        return float(ex)
+    if px is not None:
+        if hasattr(px, "total_seconds"):
+            return px.total_seconds()
+        return px / 1000.0
+    return None
+
+
+def _normalize_keys(keys: bytes | Iterable[bytes]) -> list[bytes]:
+    if isinstance(keys, bytes | str):
+        keys = [keys]
+    return [k.encode("UTF-8") if isinstance(k, str) else k for k in keys]
+
+
+def _filter_keys(keys: Iterable[bytes], match: bytes | None) -> list[bytes]:
+    # `SCAN` の `MATCH` と同じく glob 形式のパターンで絞り込む．
+    if match is None:
+        return list(keys)
+    return [key for key in keys if fnmatch.fnmatchcase(key, match)]
+
+
+class _Pipeline:
+    # ローカルなバックエンドには往復のコストがないので，記録したコマンドを
+    # `execute` で順番に実行するだけでよい．
+    def __init__(self, backend: "_LocalBackend") -> None:
+        self.__backend = backend
+        self.__commands: list[tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str) -> Callable:
+        def record(*args, **kwargs) -> "_Pipeline":
+            self.__commands.append((name, args, kwargs))
+            return self
+
+        return record
+
+    def execute(self) -> list:
+        commands, self.__commands = self.__commands, []
+        return [
+            getattr(self.__backend, name)(*args, **kwargs)
+            for name, args, kwargs in commands
+        ]
+
+
+class _LocalBackend:
+    def __unsupported(self, *args, **kwargs) -> None:  # noqa: ARG002
+        msg = "Redis Streams are only supported by the `redis` backend."
+        raise RuntimeError(msg)
+
+    xadd = __unsupported
+    xgroup_create = __unsupported
+    xreadgroup = __unsupported
+    xautoclaim = __unsupported
+    xack = __unsupported
+    xdel = __unsupported
+
+    def pipeline(
+        self,
+        transaction: bool = True,  # noqa: ARG002, FBT001, FBT002
+    ) -> _Pipeline:
+        return _Pipeline(self)
+
+
+class InProcessBackend(_LocalBackend):
+    def __init__(self) -> None:
+        self.__values: dict[bytes, tuple[bytes, float | None]] = {}
+        self.__lists: dict[bytes, collections.deque] = {}
+        self.__condition = threading.Condition()
+
+    def __get_value(self, key: bytes) -> bytes | None:
+        if key not in self.__values:
+            return None
+        value, expire_at = self.__values[key]
+        if expire_at is not None and expire_at <= time.monotonic():
+            del self.__values[key]
+            return None
+        return value
+
+    def set(
+        self,
+        name: bytes,
+        value: bytes,
+        *,
+        ex: ExpiryT | None = None,
+        px: ExpiryT | None = None,
+        nx: bool = False,
+        xx: bool = False,
+    ) -> bool | None:
+        with self.__condition:
+            exists = self.__get_value(name) is not None
+            if (nx and exists) or (xx and not exists):
+                return None
+            seconds = _to_seconds(ex=ex, px=px)
+            expire_at = None
+            if seconds is not None:
+                expire_at = time.monotonic() + seconds
+            self.__values[name] = (value, expire_at)
+            return True
+
+    def get(self, name: bytes) -> bytes | None:
+        with self.__condition:
+            return self.__get_value(name)
+
+    def __push(
+        self,
+        name: bytes,
+        values: tuple[bytes, ...],
+        *,
+        left: bool,
+        exist_only: bool,
+    ) -> int:
+        with self.__condition:
+            if exist_only and len(self.__lists.get(name, ())) == 0:
+                return 0
+            items = self.__lists.setdefault(name, collections.deque())
+            if left:
+                items.extendleft(values)
+            else:
+                items.extend(values)
+            self.__condition.notify_all()
+            return len(items)
+
+    def lpush(self, name: bytes, *values: bytes) -> int:
+        return self.__push(name, values, left=True, exist_only=False)
+
+    def lpushx(self, name: bytes, *values: bytes) -> int:
+        return self.__push(name, values, left=True, exist_only=True)
+
+    def rpush(self, name: bytes, *values: bytes) -> int:
+        return self.__push(name, values, left=False, exist_only=False)
+
+    def rpushx(self, name: bytes, *values: bytes) -> int:
+        return self.__push(name, values, left=False, exist_only=True)
+
+    def llen(self, name: bytes) -> int:
+        with self.__condition:
+            return len(self.__lists.get(name, ()))
+
+    def __pop(self, name: bytes, count: int) -> list[bytes]:
+        items = self.__lists.get(name)
+        if not items:
+            return []
+        values = [items.popleft() for _ in range(min(count, len(items)))]
+        if len(items) == 0:
+            del self.__lists[name]
+        return values
+
+    def lpop(
+        self,
+        name: bytes,
+        count: int | None = None,
+    ) -> bytes | list[bytes] | None:
+        with self.__condition:
+            values = self.__pop(name, 1 if count is None else count)
+        if len(values) == 0:
+            return None
+        if count is None:
+            return values[0]
+        return values
+
+    def __wait_and_pop(
+        self,
+        keys: list[bytes],
+        timeout: float,
+        count: int,
+    ) -> tuple[bytes, list[bytes]] | None:
+        deadline = None if timeout == 0 else time.monotonic() + timeout
+        with self.__condition:
+            while True:
+                for key in keys:
+                    values = self.__pop(key, count)
+                    if len(values) > 0:
+                        return key, values
+                if deadline is None:
+                    self.__condition.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.__condition.wait(remaining)
+
+    def blpop(
+        self,
+        keys: bytes | Iterable[bytes],
+        timeout: float = 0,
+    ) -> tuple[bytes, bytes] | None:
+        result = self.__wait_and_pop(_normalize_keys(keys), timeout, 1)
+        if result is None:
+            return None
+        key, values = result
+        return key, values[0]
+
+    def blmpop(
+        self,
+        timeout: float,
+        numkeys: int,  # noqa: ARG002
+        *args: bytes,
+        direction: str,
+        count: int = 1,
+    ) -> list | None:
+        if direction != "LEFT":
+            msg = f"{direction}: An unsupported direction."
+            raise RuntimeError(msg)
+        result = self.__wait_and_pop(_normalize_keys(args), timeout, count)
+        if result is None:
+            return None
+        key, values = result
+        return [key, values]
+
+    def lrange(self, name: bytes, start: int, end: int) -> list[bytes]:
+        with self.__condition:
+            items = list(self.__lists.get(name, ()))
+        if end == -1:
+            return items[start:]
+        return items[start : end + 1]
+
+    def ltrim(self, name: bytes, start: int, end: int) -> bool:
+        with self.__condition:
+            items = self.__lists.get(name)
+            if items is None:
+                return True
+            kept = list(items)
+            kept = kept[start:] if end == -1 else kept[start : end + 1]
+            if len(kept) == 0:
+                del self.__lists[name]
+            else:
+                self.__lists[name] = collections.deque(kept)
+        return True
+
+    def scan_iter(
+        self,
+        match: bytes | None = None,
+        count: int | None = None,  # noqa: ARG002
+    ) -> list[bytes]:
+        with self.__condition:
+            keys = [
+                key
+                for key in list(self.__values)
+                if self.__get_value(key) is not None
+            ]
+            keys.extend(self.__lists)
+        return _filter_keys(keys, match)
+
+    def delete(self, *names: bytes) -> int:
+        deleted = 0
+        with self.__condition:
+            for name in names:
+                if self.__values.pop(name, None) is not None:
+                    deleted += 1
+                if self.__lists.pop(name, None) is not None:
+                    deleted += 1
+        return deleted
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kv (
+    key BLOB PRIMARY KEY,
+    value BLOB NOT NULL,
+    expire_at REAL
+);
+CREATE TABLE IF NOT EXISTS list_item (
+    key BLOB NOT NULL,
+    position INTEGER NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (key, position)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteBackend(_LocalBackend):
+    # 複数プロセスから同じファイルを共有できるように，ブロッキングする
+    # 操作はポーリングで実装する．
+    _POLL_INTERVAL_MIN = 0.001
+    _POLL_INTERVAL_MAX = 0.1
+
+    def __init__(self, path: pathlib.Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.__connection = sqlite3.connect(
+            path,
+            timeout=60.0,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        self.__lock = threading.Lock()
+        with self.__lock:
+            self.__connection.execute("PRAGMA journal_mode=WAL")
+            self.__connection.execute("PRAGMA synchronous=NORMAL")
+            self.__connection.executescript(_SQLITE_SCHEMA)
+
+    def __transaction(self, function: Callable) -> object:
+        with self.__lock:
+            cursor = self.__connection.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                result = function(cursor)
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+            return result
+
+    @staticmethod
+    def __get_value(cursor: sqlite3.Cursor, key: bytes) -> bytes | None:
+        row = cursor.execute(
+            "SELECT value, expire_at FROM kv WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        value, expire_at = row
+        if expire_at is not None and expire_at <= time.time():
+            cursor.execute("DELETE FROM kv WHERE key = ?", (key,))
+            return None
+        return value
+
+    def set(
+        self,
+        name: bytes,
+        value: bytes,
+        *,
+        ex: ExpiryT | None = None,
+        px: ExpiryT | None = None,
+        nx: bool = False,
+        xx: bool = False,
+    ) -> bool | None:
+        seconds = _to_seconds(ex=ex, px=px)
+        expire_at = None if seconds is None else time.time() + seconds
+
+        def set_(cursor: sqlite3.Cursor) -> bool | None:
+            exists = self.__get_value(cursor, name) is not None
+            if (nx and exists) or (xx and not exists):
+                return None
+            cursor.execute(
+                "INSERT OR REPLACE INTO kv VALUES (?, ?, ?)",
+                (name, value, expire_at),
+            )
+            return True
+
+        return self.__transaction(set_)
+
+    def get(self, name: bytes) -> bytes | None:
+        return self.__transaction(lambda c: self.__get_value(c, name))
+
+    def __push(
+        self,
+        name: bytes,
+        values: tuple[bytes, ...],
+        *,
+        left: bool,
+        exist_only: bool,
+    ) -> int:
+        def push(cursor: sqlite3.Cursor) -> int:
+            low, high, length = cursor.execute(
+                """SELECT MIN(position), MAX(position), COUNT(*)
+FROM list_item WHERE key = ?""",
+                (name,),
+            ).fetchone()
+            if length == 0:
+                if exist_only:
+                    return 0
+                low, high = 1, 0
+            if left:
+                rows = [(name, low - i - 1, v) for i, v in enumerate(values)]
+            else:
+                rows = [(name, high + i + 1, v) for i, v in enumerate(values)]
+            cursor.executemany(
+                "INSERT INTO list_item VALUES (?, ?, ?)",
+                rows,
+            )
+            return length + len(values)
+
+        return self.__transaction(push)
+
+    def lpush(self, name: bytes, *values: bytes) -> int:
+        return self.__push(name, values, left=True, exist_only=False)
+
+    def lpushx(self, name: bytes, *values: bytes) -> int:
+        return self.__push(name, values, left=True, exist_only=True)
+
+    def rpush(self, name: bytes, *values: bytes) -> int:
+        return self.__push(name, values, left=False, exist_only=False)
+
+    def rpushx(self, name: bytes, *values: bytes) -> int:
+        return self.__push(name, values, left=False, exist_only=True)
+
+    def llen(self, name: bytes) -> int:
+        return self.__transaction(
+            lambda c: c.execute(
+                "SELECT COUNT(*) FROM list_item WHERE key = ?",
+                (name,),
+            ).fetchone()[0],
+        )
+
+    def __pop(self, name: bytes, count: int) -> list[bytes]:
+        def pop(cursor: sqlite3.Cursor) -> list[bytes]:
+            rows = cursor.execute(
+                """SELECT position, value FROM list_item WHERE key = ?
+ORDER BY position LIMIT ?""",
+                (name, count),
+            ).fetchall()
+            if len(rows) > 0:
+                cursor.execute(
+                    "DELETE FROM list_item WHERE key = ? AND position <= ?",
+                    (name, rows[-1][0]),
+                )
+            return [value for _, value in rows]
+
+        return self.__transaction(pop)
+
+    def lpop(
+        self,
+        name: bytes,
+        count: int | None = None,
+    ) -> bytes | list[bytes] | None:
+        values = self.__pop(name, 1 if count is None else count)
+        if len(values) == 0:
+            return None
+        if count is None:
+            return values[0]
+        return values
+
+    def __wait_and_pop(
+        self,
+        keys: list[bytes],
+        timeout: float,
+        count: int,
+    ) -> tuple[bytes, list[bytes]] | None:
+        deadline = None if timeout == 0 else time.monotonic() + timeout
+        interval = self._POLL_INTERVAL_MIN
+        while True:
+            for key in keys:
+                values = self.__pop(key, count)
+                if len(values) > 0:
+                    return key, values
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(interval)
+            interval = min(interval * 2, self._POLL_INTERVAL_MAX)
+
+    def blpop(
+        self,
+        keys: bytes | Iterable[bytes],
+        timeout: float = 0,
+    ) -> tuple[bytes, bytes] | None:
+        result = self.__wait_and_pop(_normalize_keys(keys), timeout, 1)
+        if result is None:
+            return None
+        key, values = result
+        return key, values[0]
+
+    def blmpop(
+        self,
+        timeout: float,
+        numkeys: int,  # noqa: ARG002
+        *args: bytes,
+        direction: str,
+        count: int = 1,
+    ) -> list | None:
+        if direction != "LEFT":
+            msg = f"{direction}: An unsupported direction."
+            raise RuntimeError(msg)
+        result = self.__wait_and_pop(_normalize_keys(args), timeout, count)
+        if result is None:
+            return None
+        key, values = result
+        return [key, values]
+
+    def lrange(self, name: bytes, start: int, end: int) -> list[bytes]:
+        rows = self.__transaction(
+            lambda c: c.execute(
+                """SELECT value FROM list_item WHERE key = ?
+ORDER BY position""",
+                (name,),
+            ).fetchall(),
+        )
+        items = [value for (value,) in rows]
+        if end == -1:
+            return items[start:]
+        return items[start : end + 1]
+
+    def ltrim(self, name: bytes, start: int, end: int) -> bool:
+        def trim(cursor: sqlite3.Cursor) -> None:
+            positions = [
+                position
+                for (position,) in cursor.execute(
+                    """SELECT position FROM list_item WHERE key = ?
+ORDER BY position""",
+                    (name,),
+                ).fetchall()
+            ]
+            kept = (
+                positions[start:] if end == -1 else positions[start : end + 1]
+            )
+            kept = set(kept)
+            cursor.executemany(
+                "DELETE FROM list_item WHERE key = ? AND position = ?",
+                [(name, p) for p in positions if p not in kept],
+            )
+
+        self.__transaction(trim)
+        return True
+
+    def scan_iter(
+        self,
+        match: bytes | None = None,
+        count: int | None = None,  # noqa: ARG002
+    ) -> list[bytes]:
+        rows = self.__transaction(
+            lambda c: c.execute(
+                """SELECT key FROM kv WHERE expire_at IS NULL OR expire_at > ?
+UNION SELECT DISTINCT key FROM list_item""",
+                (time.time(),),
+            ).fetchall(),
+        )
+        return _filter_keys((key for (key,) in rows), match)
+
+    def delete(self, *names: bytes) -> int:
+        def delete_(cursor: sqlite3.Cursor) -> int:
+            deleted = 0
+            for name in names:
+                deleted += cursor.execute(
+                    "DELETE FROM kv WHERE key = ?",
+                    (name,),
+                ).rowcount
+                if (
+                    cursor.execute(
+                        "DELETE FROM list_item WHERE key = ?",
+                        (name,),
+                    ).rowcount
+                    > 0
+                ):
+                    deleted += 1
+            return deleted
+
+        return self.__transaction(delete_)
+
+
+class _AsyncPipeline:
+    # `redis.asyncio` のパイプラインと同様に，コマンドの記録は同期的で
+    # `execute` だけがコルーチンになる．
+    def __init__(self, pipeline: _Pipeline) -> None:
+        self.__pipeline = pipeline
+
+    def __getattr__(self, name: str) -> Callable:
+        command = getattr(self.__pipeline, name)
+
+        def record(*args, **kwargs) -> "_AsyncPipeline":
+            command(*args, **kwargs)
+            return self
+
+        return record
+
+    async def execute(self) -> list:
+        return await asyncio.to_thread(self.__pipeline.execute)
+
+
+class AsyncAdapter:
+    # 同期的なバックエンドを `redis.asyncio.Redis` と同じ形で呼び出せる
+    # ようにする．ブロッキングする操作はスレッドで実行する．
+    def __init__(self, backend: InProcessBackend | SQLiteBackend) -> None:
+        self.__backend = backend
+
+    def pipeline(
+        self,
+        transaction: bool = True,  # noqa: FBT001, FBT002
+    ) -> _AsyncPipeline:
+        return _AsyncPipeline(self.__backend.pipeline(transaction))
+
+    def __getattr__(self, name: str) -> Callable:
+        method = getattr(self.__backend, name)
+
+        @functools.wraps(method)
+        async def wrapper(*args, **kwargs) -> object:
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return wrapper
+
+    async def aclose(self) -> None:
+        pass
+
+
+_in_process_backend = None
+_in_process_backend_lock = threading.Lock()
+
+
+def get_in_process_backend() -> InProcessBackend:
+    # 同じプロセス内の全ての `Redis` インスタンスが同じデータを共有する．
+    global _in_process_backend  # noqa: PLW0603
+
+    with _in_process_backend_lock:
+        if _in_process_backend is None:
+            _in_process_backend = InProcessBackend()
+        return _in_process_backend
+
+
+@functools.cache
+def get_sqlite_backend(path: str) -> SQLiteBackend:
+    return SQLiteBackend(pathlib.Path(path))
@@ -1,12 +1,29 @@
 #!/usr/bin/env python3
+# ruff: noqa: RUF003
 
+import collections
 import logging
+import sys
+import threading
+import traceback
 
 import mahjongsoul_sniffer.config as config_
 import mahjongsoul_sniffer.redis as redis_
 
+# `max_entries` が 0 (無制限) のときにバッファに溜めるログの最大数．
+_DEFAULT_MAX_BUFFER_SIZE = 10000
+# `close` で書き込みスレッドの終了を待つ最長の時間 (秒)．
+_CLOSE_TIMEOUT = 5.0
+
 
 class RedisLogHandler(logging.Handler):
+    # `emit` はフォーマットしたログをバッファに積むだけで，Redis への
+    # 書き込みは専用のスレッドが `RPUSH` と `LTRIM` のパイプラインで
+    # まとめて行う．呼び出し元 (mitmproxy のイベントフック等) を Redis の
+    # 往復で待たせないため．
+    #
+    # バッファが溢れたら古いログから捨てる．`max_entries` を超える分は
+    # どのみち `LTRIM` で捨てられるので，バッファの大きさもそれに揃える．
     def __init__(self, *, module_name: str, service_name: str) -> None:
         config = config_.get(module_name)
         config = config[service_name]
@@ -19,16 +36,64 @@ class RedisLogHandler(logging.Handler):
         self.__key = config["key"]
         self.__max_entries = config["max_entries"]
 
-    def emit(self, record: logging.LogRecord) -> None:
-        message = super().format(record)
-        message = message.encode("UTF-8")
-        self.__redis.rpush(self.__key, message)
+        max_buffer_size = self.__max_entries
+        if max_buffer_size == 0:
+            max_buffer_size = _DEFAULT_MAX_BUFFER_SIZE
+        self.__buffer: collections.deque[bytes] = collections.deque(
+            maxlen=max_buffer_size,
+        )
+        self.__condition = threading.Condition()
+        self.__closed = False
+
+        self.__thread = threading.Thread(
+            target=self.__run,
+            name="RedisLogHandler",
+            daemon=True,
+        )
+        self.__thread.start()
 
-        if self.__max_entries == 0:
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            message = self.format(record)
+            message = message.encode("UTF-8")
+        except Exception:  # noqa: BLE001
+            self.handleError(record)
             return
 
+        with self.__condition:
+            self.__buffer.append(message)
+            self.__condition.notify()
+
+    def __write(self, messages: list[bytes]) -> None:
+        pipeline = self.__redis.pipeline()
+        pipeline.rpush(self.__key, *messages)
+        if self.__max_entries != 0:
+            pipeline.ltrim(self.__key, -self.__max_entries, -1)
+        try:
+            pipeline.execute()
+        except Exception:  # noqa: BLE001
+            # ここで `logging` を使うと自分自身に戻ってくるので，
+            # `Handler.handleError` と同様に標準エラー出力に書く．
+            if logging.raiseExceptions:
+                traceback.print_exc(file=sys.stderr)
+
+    def __run(self) -> None:
         while True:
-            length = self.__redis.llen(self.__key)
-            if length <= self.__max_entries:
-                break
-            self.__redis.lpop(self.__key)
+            with self.__condition:
+                while len(self.__buffer) == 0 and not self.__closed:
+                    self.__condition.wait()
+                if len(self.__buffer) == 0:
+                    return
+                messages = list(self.__buffer)
+                self.__buffer.clear()
+
+            self.__write(messages)
+
+    def close(self) -> None:
+        # バッファに残っているログを書き込んでから終了する．
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify()
+        self.__thread.join(_CLOSE_TIMEOUT)
+
+        super().close()
@@ -1,18 +1,31 @@
 #!/usr/bin/env python3
 # ruff: noqa: S101, RUF003
 
-import base64
+import collections
 import datetime
+import functools
 import json
 import logging
+import os
+import pathlib
 import re
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Callable
 
-import jsonschema
 import wsproto.frame_protocol
+from mitmproxy.http import HTTPFlow
 from mitmproxy.websocket import WebSocketData
 
+import mahjongsoul_sniffer.claim_check as claim_check_
+import mahjongsoul_sniffer.config as config_
+import mahjongsoul_sniffer.descriptor_tables as descriptor_tables_
+import mahjongsoul_sniffer.logging as logging_
+import mahjongsoul_sniffer.metrics as metrics_
 import mahjongsoul_sniffer.redis as redis_
-from mahjongsoul_sniffer import mahjongsoul_pb2
+import mahjongsoul_sniffer.websocket_message as websocket_message_
 
 _NOP_ACTION_CONFIG_SCHEMA = {
     "const": "NOP",
@@ -91,6 +104,24 @@ _RPUSHX_ACTION_CONFIG_SCHEMA = {
 }
 
 
+_XADD_ACTION_CONFIG_SCHEMA = {
+    "type": "object",
+    "required": [
+        "command",
+        "key",
+    ],
+    "properties": {
+        "command": {
+            "const": "XADD",
+        },
+        "key": {
+            "type": "string",
+        },
+    },
+    "additionalProperties": False,
+}
+
+
 _SET_ACTION_CONFIG_SCHEMA = {
     "type": "object",
     "required": [
@@ -128,6 +159,7 @@ _ACTION_CONFIG_SCHEMA = {
         _LPUSHX_ACTION_CONFIG_SCHEMA,
         _RPUSH_ACTION_CONFIG_SCHEMA,
         _RPUSHX_ACTION_CONFIG_SCHEMA,
+        _XADD_ACTION_CONFIG_SCHEMA,
         _SET_ACTION_CONFIG_SCHEMA,
     ],
 }
@@ -172,32 +204,66 @@ _WEBSOCKET_MESSAGE_CONFIG_SCHEMA = {
 }
 
 
-_METHOD_NAMES = [
-    "." + mdesc.full_name
-    for sdesc in mahjongsoul_pb2.DESCRIPTOR.services_by_name.values()
-    for mdesc in sdesc.methods
-]
+# キーはサービスのメソッド名かメッセージ型名．`mahjongsoul.proto` に
+# あるかどうかはスキーマではなく `descriptor_tables` で確かめる．
+_WEBSOCKET_CONFIG_SCHEMA = {
+    "type": "object",
+    "additionalProperties": _WEBSOCKET_MESSAGE_CONFIG_SCHEMA,
+}
 
 
-_MESSAGE_TYPE_NAMES = [
-    "." + tdesc.full_name
-    for tdesc in mahjongsoul_pb2.DESCRIPTOR.message_types_by_name.values()
-]
+_WRITER_CONFIG_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "max_queue_size": {
+            "type": "integer",
+            "minimum": 1,
+        },
+        "max_batch_size": {
+            "type": "integer",
+            "minimum": 1,
+        },
+        "overflow_policy": {
+            "enum": [
+                "block",
+                "drop-oldest",
+                "spill-to-disk",
+            ],
+        },
+        "spool_directory": {
+            "type": "string",
+        },
+        "spool_segment_size": {
+            "type": "integer",
+            "minimum": 1,
+        },
+        "retry_interval": {
+            "type": "number",
+            "exclusiveMinimum": 0,
+        },
+        "socket_timeout": {
+            "type": "number",
+            "exclusiveMinimum": 0,
+        },
+    },
+    "additionalProperties": False,
+}
 
 
-_WEBSOCKET_CONFIG_SCHEMA = {
+_CORRELATION_CONFIG_SCHEMA = {
     "type": "object",
-    "properties": {},
+    "properties": {
+        "ttl": {
+            "type": "number",
+            "exclusiveMinimum": 0,
+        },
+        "max_pending": {
+            "type": "integer",
+            "minimum": 1,
+        },
+    },
     "additionalProperties": False,
 }
-for mname in _METHOD_NAMES:
-    _WEBSOCKET_CONFIG_SCHEMA["properties"][mname] = (
-        _WEBSOCKET_MESSAGE_CONFIG_SCHEMA
-    )
-for tname in _MESSAGE_TYPE_NAMES:
-    _WEBSOCKET_CONFIG_SCHEMA["properties"][tname] = (
-        _WEBSOCKET_MESSAGE_CONFIG_SCHEMA
-    )
 
 
 _CONFIG_SCHEMA = {
@@ -205,19 +271,132 @@ _CONFIG_SCHEMA = {
     "properties": {
         "http": _HTTP_CONFIG_SCHEMA,
         "websocket": _WEBSOCKET_CONFIG_SCHEMA,
+        "writer": _WRITER_CONFIG_SCHEMA,
+        "correlation": _CORRELATION_CONFIG_SCHEMA,
     },
     "additionalProperties": False,
 }
 
 
-def _execute_action(data: dict, action: dict, r: redis_.Redis) -> None:  # noqa: C901
+_FRAME_TYPE_NOTIFY = 1
+_FRAME_TYPE_REQUEST = 2
+_FRAME_TYPE_RESPONSE = 3
+
+_DIRECTION_MASKS = {
+    "inbound": 0x01,
+    "outbound": 0x02,
+    "both": 0x03,
+}
+
+
+def _decode_frame_header(  # noqa: C901
+    content: bytes,
+) -> tuple[int, int | None, str] | None:
+    # フレームは
+    #
+    #   type (1 byte) [| index (2 bytes, LE)] | `.lq.Wrapper`
+    #
+    # で，`.lq.Wrapper` は `name` (field 1) から始まる．正規表現を使わず
+    # に type, index, name を直接読み取る．形式が異なれば `None` を返す．
+    length = len(content)
+    if length == 0:
+        return None
+
+    type_ = content[0]
+    if type_ == _FRAME_TYPE_NOTIFY:
+        index = None
+        offset = 1
+    elif type_ in (_FRAME_TYPE_REQUEST, _FRAME_TYPE_RESPONSE):
+        if length < 3:
+            return None
+        index = content[1] | (content[2] << 8)
+        offset = 3
+    else:
+        return None
+
+    # `name` のタグ (field 1, length-delimited)．
+    if offset >= length or content[offset] != 0x0A:
+        return None
+    offset += 1
+
+    # `name` の長さ (varint)．
+    name_length = 0
+    shift = 0
+    while True:
+        if offset >= length or shift > 28:
+            return None
+        byte = content[offset]
+        offset += 1
+        name_length |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+
+    # `data` のタグ (field 2, length-delimited) が続くはず．
+    name_end = offset + name_length
+    if name_end >= length or content[name_end] != 0x12:
+        return None
+
+    name = content[offset:name_end].decode("UTF-8")
+    if type_ == _FRAME_TYPE_RESPONSE and name != "":
+        return None
+
+    return type_, index, name
+
+
+def _compile_http_rules(
+    rules: list[dict],
+) -> Callable[[str], dict | str | None] | None:
+    # URL に最初に一致した規則のアクションを返す関数．規則が無ければ
+    # `None`．どのパターンも捕獲グループとインラインのフラグを持たなけ
+    # れば，全てのパターンを 1 つの選言にまとめ，各パターンを囲む名前付き
+    # グループ (`match.lastgroup`) からアクションを引く．`re.match` は
+    # 選言を左から試すので，設定の先頭に近い規則が優先される．そうで
+    # ない場合 (後方参照や `(?i)` 等はまとめると意味が変わるか，コンパイル
+    # できなくなる) は規則を順に試す．
+    if len(rules) == 0:
+        return None
+
+    patterns = [re.compile(rule["url_pattern"]) for rule in rules]
+    actions = [rule["action"] for rule in rules]
+
+    if all(p.groups == 0 and p.flags == re.UNICODE for p in patterns):
+        matcher = re.compile(
+            "|".join(
+                f"(?P<rule{i}>{p.pattern})" for i, p in enumerate(patterns)
+            ),
+        )
+        group_actions = {
+            f"rule{i}": action for i, action in enumerate(actions)
+        }
+
+        def match_combined(url: str) -> dict | str | None:
+            match = matcher.match(url)
+            if match is None:
+                return None
+            return group_actions[match.lastgroup]
+
+        return match_combined
+
+    def match_each(url: str) -> dict | str | None:
+        for pattern, action in zip(patterns, actions, strict=True):
+            if pattern.match(url) is not None:
+                return action
+        return None
+
+    return match_each
+
+
+def _execute_action(  # noqa: C901
+    encoded_data: bytes,
+    action: dict,
+    r: redis_.Redis | redis_.Pipeline,
+) -> None:
     if isinstance(action, str) and action == "NOP":
         return
 
     command = action["command"]
     key = action["key"]
-    dumped_data = json.dumps(data, allow_nan=False, separators=(",", ":"))
-    encoded_data = dumped_data.encode("UTF-8")
 
     if command == "LPUSH":
         r.lpush(key, encoded_data)
@@ -227,6 +406,8 @@ def _execute_action(data: dict, action: dict, r: redis_.Redis) -> None:  # noqa:
         r.rpush(key, encoded_data)
     elif command == "RPUSHX":
         r.rpushx(key, encoded_data)
+    elif command == "XADD":
+        r.xadd(key, encoded_data)
     elif command == "SET":
         options = {}
         if "ex" in action:
@@ -240,14 +421,545 @@ def _execute_action(data: dict, action: dict, r: redis_.Redis) -> None:  # noqa:
         r.set(key, encoded_data, **options)
 
 
+# スプールのレコードヘッダ (アクションの JSON とデータの長さ，CRC-32)．
+_SPOOL_RECORD_HEADER = struct.Struct("<III")
+_SPOOL_SEGMENT_SUFFIX = ".log"
+_SPOOL_FIRST_SEQUENCE = 10**18
+
+
+def _encode_spool_record(data: bytes, action: dict) -> bytes:
+    encoded_action = json.dumps(action, separators=(",", ":"))
+    encoded_action = encoded_action.encode("UTF-8")
+    header = _SPOOL_RECORD_HEADER.pack(
+        len(encoded_action),
+        len(data),
+        zlib.crc32(data, zlib.crc32(encoded_action)),
+    )
+    return header + encoded_action + data
+
+
+def _read_spool_segment(path: pathlib.Path) -> list[tuple[bytes, dict]]:
+    records = []
+    content = path.read_bytes()
+    offset = 0
+    while offset + _SPOOL_RECORD_HEADER.size <= len(content):
+        action_length, data_length, crc = _SPOOL_RECORD_HEADER.unpack_from(
+            content,
+            offset,
+        )
+        offset += _SPOOL_RECORD_HEADER.size
+        action = content[offset : offset + action_length]
+        offset += action_length
+        data = content[offset : offset + data_length]
+        offset += data_length
+        if (
+            len(data) != data_length
+            or zlib.crc32(data, zlib.crc32(action)) != crc
+        ):
+            # 書き込み途中で停止した末尾のレコード．
+            logging.warning("%s: Discarded a truncated spool record.", path)
+            break
+        records.append((data, json.loads(action.decode("UTF-8"))))
+    return records
+
+
+class _SegmentLog:
+    # ローカルディスク上の追記専用のセグメントログ．`append` ごとに
+    # まとめて書き込んで 1 回だけ fsync する．古いセグメントから順に
+    # 読み出して，書き込み終わったものを削除する．
+    def __init__(self, directory: pathlib.Path, max_segment_size: int) -> None:
+        if directory.exists() and not directory.is_dir():
+            msg = f"{directory}: Not a directory."
+            raise RuntimeError(msg)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        self.__directory = directory
+        self.__max_segment_size = max_segment_size
+        self.__lock = threading.Lock()
+        # 前回の実行で残ったセグメントも引き継ぐ．
+        self.__segments = collections.deque(
+            sorted(directory.glob("*" + _SPOOL_SEGMENT_SUFFIX)),
+        )
+        # `prepend` で先頭にもセグメントを作れるよう，連番は途中から
+        # 始める．
+        self.__next_sequence = _SPOOL_FIRST_SEQUENCE
+        if len(self.__segments) > 0:
+            self.__next_sequence = int(self.__segments[-1].stem) + 1
+        self.__file = None
+        self.__file_size = 0
+
+    def empty(self) -> bool:
+        with self.__lock:
+            return len(self.__segments) == 0
+
+    def __get_path(self, sequence: int) -> pathlib.Path:
+        return self.__directory / f"{sequence:020d}{_SPOOL_SEGMENT_SUFFIX}"
+
+    def __sync_directory(self) -> None:
+        # 新しいセグメントのディレクトリエントリも永続化する．
+        fd = os.open(self.__directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def __open_segment(self) -> None:
+        if self.__file is not None:
+            self.__file.close()
+        path = self.__get_path(self.__next_sequence)
+        self.__next_sequence += 1
+        self.__file = path.open("ab")
+        self.__file_size = 0
+        self.__segments.append(path)
+        self.__sync_directory()
+
+    def append(self, records: list[tuple[bytes, dict]]) -> None:
+        content = b"".join(
+            _encode_spool_record(data, action) for data, action in records
+        )
+        with self.__lock:
+            if (
+                self.__file is None
+                or self.__file_size >= self.__max_segment_size
+            ):
+                self.__open_segment()
+            self.__file.write(content)
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+            self.__file_size += len(content)
+
+    def prepend(self, records: list[tuple[bytes, dict]]) -> None:
+        # 既存のどのセグメントよりも先に読み出される新しいセグメントに
+        # 書き込む．再生中のセグメントの前に入れてはならない．
+        content = b"".join(
+            _encode_spool_record(data, action) for data, action in records
+        )
+        with self.__lock:
+            if len(self.__segments) == 0:
+                sequence = self.__next_sequence
+                self.__next_sequence += 1
+            else:
+                sequence = int(self.__segments[0].stem) - 1
+            path = self.__get_path(sequence)
+            with path.open("xb") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            self.__segments.appendleft(path)
+            self.__sync_directory()
+
+    def read_oldest(
+        self,
+    ) -> tuple[pathlib.Path, list[tuple[bytes, dict]]] | None:
+        with self.__lock:
+            if len(self.__segments) == 0:
+                return None
+            path = self.__segments[0]
+            if len(self.__segments) == 1 and self.__file is not None:
+                # 書き込み中のセグメントを閉じ，以降の追記は新しい
+                # セグメントに行う．
+                self.__file.close()
+                self.__file = None
+        return path, _read_spool_segment(path)
+
+    def remove(self, path: pathlib.Path) -> None:
+        with self.__lock:
+            assert self.__segments[0] == path
+            self.__segments.popleft()
+        path.unlink()
+
+
+_MESSAGES = metrics_.counter(
+    "redis_mirroring_messages_total",
+    "WebSocket messages seen by the sniffer.",
+)
+_MESSAGE_BYTES = metrics_.counter(
+    "redis_mirroring_message_bytes_total",
+    "Bytes of WebSocket messages seen by the sniffer.",
+)
+_WRITE_SECONDS = metrics_.histogram(
+    "redis_mirroring_write_seconds",
+    "Latency of pipelined writes of mirrored messages to Redis.",
+)
+
+
+class _RedisWriter:
+    # mitmproxy のイベントフックから Redis への書き込みを切り離し，
+    # 専用のスレッドでパイプラインにまとめて書き込む．
+    #
+    # スプールが設定されている場合，Redis に書き込めなかったメッセージは
+    # ローカルディスクのセグメントログに追記し，`retry_interval` 秒ごとに
+    # Redis へ再生する．スプールが空になるまでは後続のメッセージもスプール
+    # に追記するので，順序は保たれる．
+    def __init__(self, r: redis_.Redis, config: dict) -> None:
+        self.__redis = r
+        self.__max_queue_size = config.get("max_queue_size", 10000)
+        self.__max_batch_size = config.get("max_batch_size", 100)
+        self.__overflow_policy = config.get("overflow_policy", "block")
+        self.__retry_interval = config.get("retry_interval", 1.0)
+
+        self.__spool = None
+        if "spool_directory" in config:
+            self.__spool = _SegmentLog(
+                pathlib.Path(config["spool_directory"]),
+                config.get("spool_segment_size", 64 * 1024 * 1024),
+            )
+        if self.__overflow_policy == "spill-to-disk" and self.__spool is None:
+            msg = "`writer.spool_directory` is required for `spill-to-disk`."
+            raise RuntimeError(msg)
+
+        self.__queue: collections.deque[tuple[bytes, dict]] = (
+            collections.deque()
+        )
+        self.__condition = threading.Condition()
+        self.__closed = False
+        self.__next_retry_time = 0.0
+        # 再生中のセグメントのうち，既に Redis に書き込んだレコードの数．
+        self.__replay_position = 0
+        self.__stats = {
+            "max_queue_depth": 0,
+            "written": 0,
+            "dropped": 0,
+            "spooled": 0,
+            "replayed": 0,
+            "failed": 0,
+        }
+
+        self.__thread = threading.Thread(
+            target=self.__run,
+            name="RedisMirroringWriter",
+            daemon=True,
+        )
+        self.__thread.start()
+
+    def submit(self, data: bytes, action: dict) -> None:
+        with self.__condition:
+            if self.__closed:
+                msg = "The Redis writer has already been closed."
+                raise RuntimeError(msg)
+
+            if len(self.__queue) >= self.__max_queue_size:
+                if self.__overflow_policy == "block":
+                    while (
+                        len(self.__queue) >= self.__max_queue_size
+                        and not self.__closed
+                    ):
+                        self.__condition.wait()
+                elif self.__overflow_policy == "drop-oldest":
+                    self.__queue.popleft()
+                    self.__stats["dropped"] += 1
+                else:
+                    assert self.__overflow_policy == "spill-to-disk"
+                    # キューの内容ごとスプールに移す．スプールが空に
+                    # なるまでは後続のメッセージもスプールを経由する．
+                    # 書き込み中のバッチが失敗したら，`__run` がそれを
+                    # スプールの先頭に入れるので，ここでは待たない．
+                    records = list(self.__queue)
+                    records.append((data, action))
+                    self.__queue.clear()
+                    self.__spool.append(records)
+                    self.__stats["spooled"] += len(records)
+                    self.__condition.notify_all()
+                    return
+
+                if self.__closed:
+                    # 待っている間に閉じられた．キューはもう誰も読まない．
+                    self.__stats["dropped"] += 1
+                    msg = "The Redis writer was closed while waiting."
+                    raise RuntimeError(msg)
+
+            self.__queue.append((data, action))
+            self.__stats["max_queue_depth"] = max(
+                self.__stats["max_queue_depth"],
+                len(self.__queue),
+            )
+            self.__condition.notify_all()
+
+    def __write(self, batch: list[tuple[bytes, dict]]) -> bool:
+        pipeline = self.__redis.pipeline()
+        for data, action in batch:
+            _execute_action(data, action, pipeline)
+        try:
+            with _WRITE_SECONDS.time():
+                pipeline.execute()
+        except Exception:
+            logging.exception(
+                "Failed to write %d mirrored messages to Redis.",
+                len(batch),
+            )
+            return False
+        with self.__condition:
+            self.__stats["written"] += len(batch)
+        return True
+
+    def __spool_batch(self, batch: list[tuple[bytes, dict]]) -> None:
+        # `submit` のスプールへの追記と順序が入れ替わらないよう，ロックを
+        # 取ったまま追記する．
+        with self.__condition:
+            self.__spool.append(batch)
+            self.__stats["spooled"] += len(batch)
+
+    def __replay(self) -> None:
+        while True:
+            segment = self.__spool.read_oldest()
+            if segment is None:
+                return
+            path, records = segment
+
+            while self.__replay_position < len(records):
+                batch = records[
+                    self.__replay_position : self.__replay_position
+                    + self.__max_batch_size
+                ]
+                if not self.__write(batch):
+                    self.__next_retry_time = (
+                        time.monotonic() + self.__retry_interval
+                    )
+                    return
+                self.__replay_position += len(batch)
+                with self.__condition:
+                    self.__stats["replayed"] += len(batch)
+
+            self.__spool.remove(path)
+            self.__replay_position = 0
+
+    def __run(self) -> None:  # noqa: C901
+        while True:
+            with self.__condition:
+                while True:
+                    if len(self.__queue) > 0 or self.__closed:
+                        break
+                    if self.__spool is not None and not self.__spool.empty():
+                        timeout = self.__next_retry_time - time.monotonic()
+                        if timeout <= 0.0:
+                            break
+                        self.__condition.wait(timeout)
+                    else:
+                        self.__condition.wait()
+
+                closing = self.__closed and len(self.__queue) == 0
+                batch = []
+                while (
+                    len(self.__queue) > 0
+                    and len(batch) < self.__max_batch_size
+                ):
+                    batch.append(self.__queue.popleft())
+                # スプールが空でなければ，取り出したバッチもロックを
+                # 取ったままスプールに追記して順序を保つ．
+                if (
+                    len(batch) > 0
+                    and self.__spool is not None
+                    and not self.__spool.empty()
+                ):
+                    self.__spool_batch(batch)
+                    batch = []
+                self.__condition.notify_all()
+
+            if len(batch) > 0 and not self.__write(batch):
+                if self.__spool is None:
+                    with self.__condition:
+                        self.__stats["failed"] += len(batch)
+                else:
+                    # 書き込んでいる間に `submit` がスプールに追記した
+                    # メッセージより前に置く．
+                    with self.__condition:
+                        self.__spool.prepend(batch)
+                        self.__stats["spooled"] += len(batch)
+                    self.__next_retry_time = (
+                        time.monotonic() + self.__retry_interval
+                    )
+
+            if (
+                self.__spool is not None
+                and not self.__spool.empty()
+                and (closing or time.monotonic() >= self.__next_retry_time)
+            ):
+                self.__replay()
+
+            if closing:
+                # 再生できなかった分はスプールに残り，次回の起動時に
+                # 再生される．
+                return
+
+    def get_stats(self) -> dict:
+        with self.__condition:
+            stats = dict(self.__stats)
+            stats["queue_depth"] = len(self.__queue)
+            return stats
+
+    def close(self, timeout: float | None = None) -> None:
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+        self.__thread.join(timeout)
+
+
+def _check_url_pattern(pattern: str) -> None:
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        msg = f"{pattern}: An invalid URL pattern: {e}"
+        raise RuntimeError(msg) from e
+
+
+def _validate_config(config: dict) -> None:
+    # `websocket` には同じ設定が何百も並ぶことがある (api-visualizer は
+    # すべてのメソッドとメッセージ型に同じ設定を使う) ので，同じ内容の
+    # 設定は 1 つだけ検証する．
+    websocket_config = config.get("websocket", {})
+    if isinstance(websocket_config, dict):
+        distinct_configs = {}
+        for name, message_config in websocket_config.items():
+            key = json.dumps(message_config, sort_keys=True, default=repr)
+            distinct_configs.setdefault(key, (name, message_config))
+        config = {**config, "websocket": dict(distinct_configs.values())}
+    config_.validate(instance=config, schema=_CONFIG_SCHEMA)
+
+    for rule in config.get("http", []):
+        _check_url_pattern(rule["url_pattern"])
+
+    names = descriptor_tables_.get_names()
+    for name in websocket_config:
+        if name not in names:
+            msg = f"{name}: An unknown WebSocket method or message type."
+            raise RuntimeError(msg)
+
+
 class RedisMirroring:
     def __init__(self, *, module_name: str, config: dict) -> None:
-        self.__redis = redis_.Redis(module_name=module_name)
-        jsonschema.validate(instance=config, schema=_CONFIG_SCHEMA)
-        self.__config = config
-        self.__websocket_message_queue: dict = {}
+        _validate_config(config)
+        writer_config = config.get("writer", {})
+        # Redis が応答しなくなっても書き込みのスレッドが止まり続けない
+        # よう，応答を待つ時間に上限を設ける．
+        self.__redis = redis_.Redis(
+            module_name=module_name,
+            socket_timeout=writer_config.get("socket_timeout", 10.0),
+        )
+        self.__claim_check = claim_check_.create(module_name=module_name)
+        # 応答待ちのリクエストメッセージ．同じ mitmdump を複数の WebSocket
+        # 接続が通ることがあるので，(flow ID, index) をキーにする．挿入順
+        # が古い順になるので，TTL や上限を超えた分は先頭から捨てる．
+        self.__websocket_message_queue: collections.OrderedDict = (
+            collections.OrderedDict()
+        )
+        correlation_config = config.get("correlation", {})
+        self.__correlation_ttl = correlation_config.get("ttl", 60.0)
+        self.__max_pending_requests = correlation_config.get(
+            "max_pending",
+            10000,
+        )
+        self.__writer = _RedisWriter(self.__redis, writer_config)
+        metrics_.gauge(
+            "redis_mirroring_pending_requests",
+            "WebSocket requests waiting for their responses.",
+        ).set_function(lambda: len(self.__websocket_message_queue))
+        metrics_.gauge(
+            "redis_mirroring_writer_queue_depth",
+            "Mirrored messages waiting to be written.",
+        ).set_function(
+            functools.partial(self.__get_writer_stat, "queue_depth"),
+        )
+        for name, help_ in (
+            ("written", "Mirrored messages written to Redis."),
+            ("dropped", "Mirrored messages dropped on queue overflow."),
+            ("spooled", "Mirrored messages appended to the spool."),
+            ("replayed", "Mirrored messages replayed from the spool."),
+            ("failed", "Mirrored messages that failed to be written."),
+        ):
+            metrics_.counter(
+                f"redis_mirroring_writer_{name}_total",
+                help_,
+            ).set_function(
+                functools.partial(self.__get_writer_stat, name),
+            )
 
-    def on_websocket_message(self, websocket_data: WebSocketData) -> None:  # noqa: C901
+        # name → (request direction mask, action) の表を予め作っておく．
+        # action が `None` の場合は NOP．
+        self.__websocket_actions: dict = {}
+        for name, message_config in config.get("websocket", {}).items():
+            mask = _DIRECTION_MASKS[message_config["request_direction"]]
+            action = message_config["action"]
+            if isinstance(action, str) and action == "NOP":
+                self.__websocket_actions[name] = (mask, None)
+                continue
+            self.__websocket_actions[name] = (
+                mask,
+                functools.partial(self.__writer.submit, action=action),
+            )
+
+        self.__http_matcher = _compile_http_rules(
+            config.get("http", []),
+        )
+
+    def get_writer_stats(self) -> dict:
+        return self.__writer.get_stats()
+
+    def __get_writer_stat(self, name: str) -> int:
+        return self.__writer.get_stats()[name]
+
+    def close(self) -> None:
+        self.__writer.close()
+
+    @staticmethod
+    def __warn_unanswered_request(request: dict) -> None:
+        logging.warning(
+            """There is not any response message\
+ for the following WebSocket request message:
+direction: %s
+content: %s""",
+            request["direction"],
+            logging_.payload(request["request"]),
+        )
+
+    def __evict_pending_requests(self, now: float) -> None:
+        queue = self.__websocket_message_queue
+        while len(queue) > 0:
+            request = next(iter(queue.values()))
+            if (
+                now - request["time"] <= self.__correlation_ttl
+                and len(queue) <= self.__max_pending_requests
+            ):
+                break
+            queue.popitem(last=False)
+            self.__warn_unanswered_request(request)
+
+    def on_websocket_end(self, flow_id: str) -> None:
+        # 接続が閉じたら，その接続で応答待ちのリクエストは捨てる．
+        queue = self.__websocket_message_queue
+        for key in [key for key in queue if key[0] == flow_id]:
+            self.__warn_unanswered_request(queue.pop(key))
+
+    def on_http_response(self, flow: HTTPFlow) -> None:
+        if self.__http_matcher is None or flow.response is None:
+            return
+
+        url = flow.request.url
+        action = self.__http_matcher(url)
+        if action is None:
+            return
+        if isinstance(action, str) and action == "NOP":
+            return
+
+        # WebSocket メッセージと同じエンベロープに，リクエストとして URL
+        # を，レスポンスとしてレスポンスボディを格納する．
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        data = websocket_message_.encode(
+            {
+                "request_direction": "outbound",
+                "request": url.encode("UTF-8"),
+                "response": flow.response.content,
+                "timestamp": now,
+            },
+            self.__claim_check,
+        )
+        self.__writer.submit(data, action)
+
+    def on_websocket_message(  # noqa: C901
+        self,
+        websocket_data: WebSocketData,
+        *,
+        flow_id: str = "",
+    ) -> None:
         if len(websocket_data.messages) == 0:
             msg = "`len(websocket_data.messages)` == 0"
             raise RuntimeError(msg)
@@ -260,47 +972,39 @@ class RedisMirroring:
         direction = "outbound" if message.from_client else "inbound"
 
         content = message.content
+        _MESSAGES.inc()
+        _MESSAGE_BYTES.inc(len(content))
 
-        m = re.search(
-            b"^(?:\x01|\x02..)\n.(.*?)\x12",
-            content,
-            flags=re.DOTALL,
-        )
-        if m is not None:
-            type_ = content[0]
-            assert type_ in [1, 2]
-
-            number = None
-            if type_ == 2:
-                number = int.from_bytes(content[1:3], byteorder="little")
-
-            name = m.group(1).decode("UTF-8")
-
-            if type_ == 2:
-                # レスポンスメッセージを期待するリクエストメッセージの処理．
-                # 対応するレスポンスメッセージが検出されるまでメッセージを
-                # キューに保存しておく．
-                if number in self.__websocket_message_queue:
-                    prev_request = self.__websocket_message_queue[number]
-                    logging.warning(
-                        """There is not any response message\
- for the following WebSocket request message:
-direction: %s
-content: %s""",
-                        prev_request["direction"],
-                        prev_request["request"],
-                    )
+        header = _decode_frame_header(content)
+        if header is None:
+            msg = f"""An unknown WebSocket message:
+direction: {direction}
+content: {content!r}"""
+            raise RuntimeError(msg)
+        type_, number, name = header
 
-                self.__websocket_message_queue[number] = {
-                    "direction": direction,
-                    "name": name,
-                    "request": content,
-                }
+        if type_ == _FRAME_TYPE_REQUEST:
+            # レスポンスメッセージを期待するリクエストメッセージの処理．
+            # 対応するレスポンスメッセージが検出されるまでメッセージを
+            # キューに保存しておく．
+            now = time.monotonic()
+            key = (flow_id, number)
+            prev_request = self.__websocket_message_queue.pop(key, None)
+            if prev_request is not None:
+                self.__warn_unanswered_request(prev_request)
 
-                return
+            self.__websocket_message_queue[key] = {
+                "direction": direction,
+                "name": name,
+                "request": content,
+                "time": now,
+            }
+            self.__evict_pending_requests(now)
+
+            return
 
+        if type_ == _FRAME_TYPE_NOTIFY:
             # レスポンスを必要としないリクエストメッセージの処理．
-            assert type_ == 1
             assert number is None
 
             request_direction = direction
@@ -315,28 +1019,23 @@ content: %s""",
         else:
             # レスポンスメッセージ．
             # キューから対応するリクエストメッセージを探し出す．
-            m = re.search(b"^\x03..\n\x00\x12", content, flags=re.DOTALL)
-            if m is None:
-                msg = f"""An unknown WebSocket message:
-direction: {direction}
-content: {content!r}"""
-                raise RuntimeError(msg)
+            assert type_ == _FRAME_TYPE_RESPONSE
 
-            number = int.from_bytes(content[1:3], byteorder="little")
-            if number not in self.__websocket_message_queue:
+            pending_request = self.__websocket_message_queue.pop(
+                (flow_id, number),
+                None,
+            )
+            if pending_request is None:
                 msg = f"""An WebSocket response message\
  that does not match to any request message:
 direction: {direction}
 content: {content!r}"""
                 raise RuntimeError(msg)
 
-            request_direction = self.__websocket_message_queue[number][
-                "direction"
-            ]
-            name = self.__websocket_message_queue[number]["name"]
-            request = self.__websocket_message_queue[number]["request"]
+            request_direction = pending_request["direction"]
+            name = pending_request["name"]
+            request = pending_request["request"]
             response = content
-            del self.__websocket_message_queue[number]
 
         if request_direction == "inbound":
             if direction == "inbound":
@@ -352,41 +1051,25 @@ content: {content!r}"""
                 raise RuntimeError(msg)
             assert direction == "inbound"
 
-        match = True
-        while True:
-            if "websocket" not in self.__config:
-                match = False
-                break
-            websocket_config = self.__config["websocket"]
-            if name not in websocket_config:
-                match = False
-                break
-            expected_request_direction = websocket_config[name][
-                "request_direction"
-            ]
-            if expected_request_direction not in [request_direction, "both"]:
-                match = False
-                break
-            break
-
-        if match:
-            decoded_request = base64.b64encode(request).decode("UTF-8")
-            if response is not None:
-                decoded_response = base64.b64encode(response).decode("UTF-8")
-            else:
-                decoded_response = None
+        entry = self.__websocket_actions.get(name)
+        if (
+            entry is not None
+            and entry[0] & _DIRECTION_MASKS[request_direction]
+        ):
+            action = entry[1]
+            if action is None:
+                return
             now = datetime.datetime.now(tz=datetime.timezone.utc)
-            data = {
-                "request_direction": request_direction,
-                "request": decoded_request,
-                "response": decoded_response,
-                "timestamp": now.timestamp(),
-            }
-            _execute_action(
-                data,
-                self.__config["websocket"][name]["action"],
-                self.__redis,
+            data = websocket_message_.encode(
+                {
+                    "request_direction": request_direction,
+                    "request": request,
+                    "response": response,
+                    "timestamp": now,
+                },
+                self.__claim_check,
             )
+            action(data)
             return
 
         logging.warning(
@@ -395,6 +1078,6 @@ request_direction: %s
 request: %s
 response: %s""",
             request_direction,
-            request,
-            response,
+            logging_.payload(request),
+            logging_.payload(response),
         )
@@ -1,20 +1,262 @@
 #!/usr/bin/env python3
+# ruff: noqa: RUF003
 
+import atexit
+import collections
+import concurrent.futures
 import datetime
 import email.parser
 import email.policy
+import itertools
 import json
 import logging
+import os
 import re
+import socket
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
 from email.message import EmailMessage
 from pathlib import Path
 
-import boto3
 import botocore.exceptions
 import jsonschema
 
 import mahjongsoul_sniffer.config as config_
 import mahjongsoul_sniffer.game_detail as game_detail_
+import mahjongsoul_sniffer.game_detail_compression as game_detail_compression_
+import mahjongsoul_sniffer.redis as redis_
+import mahjongsoul_sniffer.s3_backend as s3_backend_
+import mahjongsoul_sniffer.trace as trace_
+
+# `get_game_abstracts(resume=True)` が使う Redis のキー．前回の一覧の続き
+# から再開するためのカーソル (`ack_game_abstract` で処理済みになった
+# ところまで) と，まだ取得しても仕方がない牌譜概要のキー → 取得して
+# よくなる時刻 (UNIX 時間) の表．
+_GAME_ABSTRACT_CURSOR_KEY = "game-abstract-cursor"
+_GAME_ABSTRACT_NOT_BEFORE_KEY = "game-abstract-not-before"
+
+# `DeleteObjects` 1 回で削除できるキーの最大数．
+_MAX_DELETE_KEYS = 1000
+# 遅延削除するキーを溜めておく最長の時間 (秒)．
+_DELETION_FLUSH_INTERVAL = 10.0
+
+# 牌譜詳細の存在インデックスで，日付ごとのプレフィックスを一覧し直す
+# 間隔 (秒)．
+_GAME_DETAIL_INDEX_REFRESH_INTERVAL = 600.0
+# 前後 1 日のプレフィックスにはアーカイバが書き込み続けるので，一覧して
+# からこれ以上経っていれば，インデックスに無い牌譜詳細を HEAD で
+# 確かめる (秒)．
+_GAME_DETAIL_INDEX_TRUSTED_PERIOD = 60.0
+# 存在インデックスに保持する日付ごとのプレフィックスの最大数．最近
+# 使ったものから残す．
+_MAX_GAME_DETAIL_INDEX_PREFIXES = 8
+
+# 認証メールのヘッダを読むために最初に取得するバイト数．ヘッダがこれに
+# 収まらなければメール全体を取得する．
+_AUTHENTICATION_EMAIL_HEADER_SIZE = 16 * 1024
+
+# 牌譜概要のセグメントとマニフェストのキーの接尾辞．
+_SEGMENT_SUFFIX = ".ndjson"
+_MANIFEST_SUFFIX = ".manifest.json"
+
+
+def _map_concurrently(
+    function: Callable,
+    items: Iterable,
+    concurrency: int,
+    *,
+    thread_name_prefix: str,
+) -> Iterator:
+    # 共有のクライアントで並列にリクエストを投げ，終わったものから順に
+    # 結果を返す．同時に投げるリクエストは `concurrency` 個まで．
+    items = iter(items)
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=concurrency,
+        thread_name_prefix=thread_name_prefix,
+    )
+    pending = set()
+    try:
+        while True:
+            for item in items:
+                pending.add(executor.submit(function, item))
+                if len(pending) >= concurrency:
+                    break
+            if len(pending) == 0:
+                break
+
+            done, pending = concurrent.futures.wait(
+                pending,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            for future in done:
+                yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _GameAbstractSegmentWriter:
+    # 牌譜概要を 1 行 1 件の NDJSON にしてメモリに溜め，`max_size` バイト
+    # 溜まるか，最も古い行を溜めてから `max_age` 秒経つか，時間が
+    # 変わったときに，溜めた分を 1 つのセグメントとして書き出す．S3 の
+    # オブジェクトには追記できないので，書き出したセグメントは以後
+    # 書き換えない．
+    #
+    # マニフェストは 1 時間 × 書き込み元ごとに 1 つで，その時間に書き
+    # 出したセグメントのキー，サイズと件数を持つ．セグメントを書いた後で
+    # マニフェストを書き直すので，読み出し側はマニフェストにあるセグメント
+    # を範囲指定の GET でそのまま読める．
+    def __init__(
+        self,
+        client: object,
+        bucket_name: str,
+        config: dict,
+    ) -> None:
+        self.__client = client
+        self.__bucket_name = bucket_name
+        self.__key_prefix = re.sub("/*$", "", config["key_prefix"])
+        self.__max_size = config.get("max_size", 1024 * 1024)
+        self.__max_age = config.get("max_age", 300)
+        # 再起動しても前回のマニフェストを上書きしないよう，起動時刻も
+        # 含める．
+        self.__writer_id = (
+            f"{socket.gethostname()}-{os.getpid()}-{int(time.time())}"
+        )
+        self.__sequence = 0
+        self.__hour_prefix = None
+        self.__manifest: list[dict] = []
+        self.__data = bytearray()
+        self.__count = 0
+        self.__buffered_at = 0.0
+        self.__lock = threading.Lock()
+
+    def __flush(self) -> None:
+        if self.__count == 0:
+            return
+
+        segment = {
+            "key": f"{self.__hour_prefix}/{self.__writer_id}"
+            f".{self.__sequence:06d}{_SEGMENT_SUFFIX}",
+            "size": len(self.__data),
+            "count": self.__count,
+        }
+        self.__client.put_object(
+            Bucket=self.__bucket_name,
+            Key=segment["key"],
+            Body=bytes(self.__data),
+        )
+        self.__sequence += 1
+        self.__data = bytearray()
+        self.__count = 0
+
+        self.__manifest.append(segment)
+        manifest = json.dumps(
+            {"segments": self.__manifest},
+            separators=(",", ":"),
+        )
+        self.__client.put_object(
+            Bucket=self.__bucket_name,
+            Key=f"{self.__hour_prefix}/{self.__writer_id}{_MANIFEST_SUFFIX}",
+            Body=manifest.encode("UTF-8"),
+        )
+
+    def append(self, lines: list[bytes]) -> None:
+        if len(lines) == 0:
+            return
+
+        now = datetime.datetime.now(tz=datetime.timezone.utc)
+        hour_prefix = now.strftime(self.__key_prefix)
+        with self.__lock:
+            if hour_prefix != self.__hour_prefix:
+                self.__flush()
+                self.__hour_prefix = hour_prefix
+                self.__manifest = []
+
+            if self.__count == 0:
+                self.__buffered_at = time.monotonic()
+            for line in lines:
+                self.__data += line
+                self.__data += b"\n"
+            self.__count += len(lines)
+
+            if (
+                len(self.__data) >= self.__max_size
+                or time.monotonic() - self.__buffered_at >= self.__max_age
+            ):
+                self.__flush()
+
+    def flush(self) -> None:
+        with self.__lock:
+            self.__flush()
+
+
+class _DeletionQueue:
+    # 遅延削除するキーを溜めておき，`_MAX_DELETE_KEYS` 個溜まるか
+    # `_DELETION_FLUSH_INTERVAL` 秒経つごとに，バックグラウンドの
+    # スレッドからまとめて削除する．
+    def __init__(self, delete_objects: Callable[[list[str]], None]) -> None:
+        self.__delete_objects = delete_objects
+        self.__keys: list[str] = []
+        self.__condition = threading.Condition()
+        self.__thread = threading.Thread(
+            target=self.__run,
+            name="S3DeletionQueue",
+            daemon=True,
+        )
+        self.__thread.start()
+        atexit.register(self.flush)
+
+    def put(self, key: str) -> None:
+        with self.__condition:
+            self.__keys.append(key)
+            if len(self.__keys) >= _MAX_DELETE_KEYS:
+                self.__condition.notify_all()
+
+    def __take(self) -> list[str]:
+        keys, self.__keys = self.__keys, []
+        return keys
+
+    def flush(self) -> None:
+        with self.__condition:
+            keys = self.__take()
+        if len(keys) > 0:
+            self.__delete_objects(keys)
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                self.__condition.wait_for(
+                    lambda: len(self.__keys) >= _MAX_DELETE_KEYS,
+                    timeout=_DELETION_FLUSH_INTERVAL,
+                )
+                keys = self.__take()
+            if len(keys) == 0:
+                continue
+            try:
+                self.__delete_objects(keys)
+            except Exception:
+                logging.exception(
+                    "Failed to delete %d objects in the background.",
+                    len(keys),
+                )
+
+
+# バケット名 → `_DeletionQueue`．同じプロセスで同じバケットの `Bucket` を
+# 何度作っても，削除のスレッドと `atexit` のフックは 1 つにする．
+_deletion_queues: dict[str, _DeletionQueue] = {}
+_deletion_queues_lock = threading.Lock()
+
+
+def _get_deletion_queue(
+    bucket_name: str,
+    delete_objects: Callable[[list[str]], None],
+) -> _DeletionQueue:
+    with _deletion_queues_lock:
+        deletion_queue = _deletion_queues.get(bucket_name)
+        if deletion_queue is None:
+            deletion_queue = _DeletionQueue(delete_objects)
+            _deletion_queues[bucket_name] = deletion_queue
+        return deletion_queue
 
 
 class Bucket:
@@ -22,31 +264,126 @@ class Bucket:
         self.__config = config_.get(module_name)
         self.__config = self.__config["s3"]
 
+        self.__module_name = module_name
         self.__game_abstract_schema = None
-
-        s3 = boto3.resource("s3")
-        bucket_name = self.__config["bucket_name"]
-        self.__bucket = s3.Bucket(bucket_name)
+        self.__redis = None
+        self.__game_abstract_not_before = None
+        # `get_game_abstracts(resume=True)` の一覧の状態．次に一覧を始める
+        # キー，一覧した順のキー，そのうちまだ処理済みになっていないキー．
+        self.__game_abstract_listing = None
+        # 日付ごとのプレフィックス → 牌譜詳細の UUID の集合，最後に一覧
+        # したキー，最後に一覧した時刻．最近使った順．
+        self.__game_detail_index: collections.OrderedDict[str, dict] = (
+            collections.OrderedDict()
+        )
+        self.__game_detail_codec = game_detail_compression_.create(
+            self.__config.get("game_detail_compression"),
+        )
+        self.__game_abstract_segment_writer = None
+        # 認証メールのキー → (ETag 等，パースしたヘッダ)．ポーリングの
+        # たびに同じメールを取得し直さないためのキャッシュ．
+        self.__authentication_email_headers: dict[
+            str,
+            tuple[tuple, EmailMessage],
+        ] = {}
+
+        # クライアントはスレッド間で共有できる．並列に取得するスレッドの
+        # 数だけ接続をプールする．
+        self.__concurrency = self.__config.get("concurrency", 16)
+        self.__client = s3_backend_.create_client(
+            self.__config,
+            max_pool_connections=max(self.__concurrency, 10),
+        )
+        self.__bucket_name = self.__config["bucket_name"]
+
+    def __list_objects(
+        self,
+        prefix: str,
+        *,
+        start_after: str | None = None,
+    ) -> Iterator[dict]:
+        options = {"Bucket": self.__bucket_name, "Prefix": prefix}
+        if start_after is not None:
+            options["StartAfter"] = start_after
+        paginator = self.__client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(**options):
+            yield from page.get("Contents", [])
+
+    def __list_keys(
+        self,
+        prefix: str,
+        *,
+        start_after: str | None = None,
+    ) -> Iterator[str]:
+        for content in self.__list_objects(prefix, start_after=start_after):
+            yield content["Key"]
+
+    def __get_authentication_email_headers(self, key: str) -> EmailMessage:
+        # メールの先頭だけを取得してヘッダをパースする．空のオブジェクト
+        # への範囲指定の GET は 416 (InvalidRange) になるので，空のメール
+        # として扱う．
+        try:
+            obj = self.__client.get_object(
+                Bucket=self.__bucket_name,
+                Key=key,
+                Range=f"bytes=0-{_AUTHENTICATION_EMAIL_HEADER_SIZE - 1}",
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] != "InvalidRange":
+                raise
+            data = b""
+        else:
+            data = obj["Body"].read()
+        if (
+            len(data) >= _AUTHENTICATION_EMAIL_HEADER_SIZE
+            and b"\r\n\r\n" not in data
+            and b"\n\n" not in data
+        ):
+            obj = self.__client.get_object(Bucket=self.__bucket_name, Key=key)
+            data = obj["Body"].read()
+
+        parser = email.parser.BytesHeaderParser(policy=email.policy.default)
+        message = parser.parsebytes(data)
+        assert isinstance(message, EmailMessage)  # noqa: S101
+        return message
 
     def get_authentication_emails(self) -> dict[str, EmailMessage]:
+        # ヘッダだけを持つメールを返す．本文が必要なメールは
+        # `get_authentication_email` で改めて取得する．
         key_prefix = self.__config["authentication_email_key_prefix"]
 
-        objects = self.__bucket.objects.filter(Prefix=key_prefix)
-
+        cache = self.__authentication_email_headers
         emails = {}
-        email_parser = email.parser.BytesParser(policy=email.policy.default)
 
-        for summary in objects:
-            key = summary.key
-            obj = summary.get()
-            body = obj["Body"]
-            obj_bytes = body.read()
-            message = email_parser.parsebytes(obj_bytes)
-            assert isinstance(message, EmailMessage)  # noqa: S101
-            emails[key] = message
+        for content in self.__list_objects(key_prefix):
+            key = content["Key"]
+            # 同じキーに別のメールが置かれた場合に備えて，ETag 等が
+            # 変わっていればパースし直す．
+            version = (
+                content.get("ETag"),
+                content.get("Size"),
+                content.get("LastModified"),
+            )
+            if key not in cache or cache[key][0] != version:
+                cache[key] = (
+                    version,
+                    self.__get_authentication_email_headers(key),
+                )
+            emails[key] = cache[key][1]
+
+        # 削除されたメールをキャッシュから取り除く．
+        for key in [key for key in cache if key not in emails]:
+            del cache[key]
 
         return emails
 
+    def get_authentication_email(self, key: str) -> EmailMessage:
+        obj = self.__client.get_object(Bucket=self.__bucket_name, Key=key)
+        email_parser = email.parser.BytesParser(policy=email.policy.default)
+        message = email_parser.parsebytes(obj["Body"].read())
+        assert isinstance(message, EmailMessage)  # noqa: S101
+        return message
+
     def __get_game_abstract_schema(self) -> dict:
         if self.__game_abstract_schema is None:
             with Path("schema/game-abstract.json").open() as schema_file:
@@ -54,20 +391,11 @@ class Bucket:
 
         return self.__game_abstract_schema
 
-    def put_game_abstract(self, game_abstract: dict) -> None:
-        key_prefix = self.__config["game_abstract_key_prefix"]
-        key_prefix = re.sub("/*$", "", key_prefix)
-
-        uuid = game_abstract["uuid"]
-        mode = game_abstract["mode"]
-        start_time = game_abstract["start_time"]
-        key_prefix = start_time.strftime(key_prefix)
-        key = f"{key_prefix}/{uuid}"
-
+    def __encode_game_abstract(self, game_abstract: dict) -> bytes:
         game_abstract = {
-            "uuid": uuid,
-            "mode": mode,
-            "start_time": int(start_time.timestamp()),
+            "uuid": game_abstract["uuid"],
+            "mode": game_abstract["mode"],
+            "start_time": int(game_abstract["start_time"].timestamp()),
         }
         jsonschema.validate(
             instance=game_abstract,
@@ -80,97 +408,476 @@ class Bucket:
             allow_nan=False,
             separators=(",", ":"),
         )
-        data = data.encode("UTF-8")
-        self.__bucket.put_object(Key=key, Body=data)
+        return data.encode("UTF-8")
 
-    def get_game_abstracts(self, max_keys: int = 1000) -> list[dict]:
+    def __decode_game_abstract(self, data: bytes, key: str) -> dict:
+        game_abstract = data.decode("UTF-8")
+        game_abstract = json.loads(game_abstract)
+        jsonschema.validate(
+            instance=game_abstract,
+            schema=self.__get_game_abstract_schema(),
+        )
+        game_abstract["start_time"] = datetime.datetime.fromtimestamp(
+            game_abstract["start_time"],
+            tz=datetime.timezone.utc,
+        )
+        game_abstract["key"] = key
+        return game_abstract
+
+    def put_game_abstract(self, game_abstract: dict) -> None:
         key_prefix = self.__config["game_abstract_key_prefix"]
-        key_prefix = key_prefix.rstrip("/") + "/"
+        key_prefix = re.sub("/*$", "", key_prefix)
 
-        # https://github.com/boto/boto3/issues/2186
-        game_abstract_objects = self.__bucket.objects.filter(Prefix=key_prefix)
-        game_abstract_objects = game_abstract_objects.limit(count=max_keys)
+        uuid = game_abstract["uuid"]
+        start_time = game_abstract["start_time"]
+        key_prefix = start_time.strftime(key_prefix)
+        key = f"{key_prefix}/{uuid}"
 
-        game_abstracts = []
+        data = self.__encode_game_abstract(game_abstract)
+        self.__client.put_object(Bucket=self.__bucket_name, Key=key, Body=data)
+
+    def put_game_abstracts(self, game_abstracts: list[dict]) -> None:
+        # 牌譜詳細のクローラは 1 件ずつのオブジェクトを一覧して処理し，
+        # 処理済みのものを削除するので，常に 1 件ずつオブジェクトを作る．
+        # `game_abstract_segment` が設定されていれば，それに加えて
+        # セグメントにもまとめて追記する．
+        for game_abstract in game_abstracts:
+            self.put_game_abstract(game_abstract)
+
+        if "game_abstract_segment" not in self.__config:
+            return
+        if self.__game_abstract_segment_writer is None:
+            self.__game_abstract_segment_writer = _GameAbstractSegmentWriter(
+                self.__client,
+                self.__bucket_name,
+                self.__config["game_abstract_segment"],
+            )
+            atexit.register(self.flush_game_abstracts)
+        self.__game_abstract_segment_writer.append(
+            [self.__encode_game_abstract(g) for g in game_abstracts],
+        )
 
-        for game_abstract_object in game_abstract_objects:
-            try:
-                game_abstract = game_abstract_object.get()
-            except botocore.exceptions.ClientError as e:
-                if e.response["Error"]["Code"] == "NoSuchKey":
-                    logging.info(
-                        "Skipped getting an already deleted\
- game abstract `%s`.",
-                        game_abstract_object.key,
-                    )
+    def flush_game_abstracts(self) -> None:
+        # セグメントに書き出さずに溜めている牌譜概要を書き出す．
+        if self.__game_abstract_segment_writer is not None:
+            self.__game_abstract_segment_writer.flush()
+
+    def get_segmented_game_abstracts(
+        self,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+    ) -> Iterator[dict]:
+        # `[start_time, end_time)` の各時間のマニフェストを読み，
+        # セグメントごとに範囲指定の GET を 1 回ずつ発行する．返す牌譜
+        # 概要の `key` はセグメントのキー．
+        key_prefix = self.__config["game_abstract_segment"]["key_prefix"]
+        key_prefix = re.sub("/*$", "", key_prefix)
+
+        hour = start_time.replace(minute=0, second=0, microsecond=0)
+        while hour < end_time:
+            hour_prefix = hour.strftime(key_prefix)
+            hour += datetime.timedelta(hours=1)
+
+            for manifest_key in self.__list_keys(f"{hour_prefix}/"):
+                if not manifest_key.endswith(_MANIFEST_SUFFIX):
                     continue
-                raise
-            game_abstract = game_abstract["Body"]
-            game_abstract = game_abstract.read()
-            game_abstract = game_abstract.decode("UTF-8")
-            game_abstract = json.loads(game_abstract)
-            jsonschema.validate(
-                instance=game_abstract,
-                schema=self.__get_game_abstract_schema(),
+                manifest = self.__client.get_object(
+                    Bucket=self.__bucket_name,
+                    Key=manifest_key,
+                )
+                manifest = json.loads(manifest["Body"].read())
+
+                for segment in manifest["segments"]:
+                    if segment["size"] == 0:
+                        continue
+                    data = self.__client.get_object(
+                        Bucket=self.__bucket_name,
+                        Key=segment["key"],
+                        Range=f"bytes=0-{segment['size'] - 1}",
+                    )
+                    data = data["Body"].read()
+                    for line in data.splitlines():
+                        yield self.__decode_game_abstract(line, segment["key"])
+
+    def __get_redis(self) -> redis_.Redis:
+        if self.__redis is None:
+            self.__redis = redis_.Redis(module_name=self.__module_name)
+        return self.__redis
+
+    def __get_game_abstract_not_before(self) -> dict[str, int]:
+        if self.__game_abstract_not_before is None:
+            data = self.__get_redis().get(_GAME_ABSTRACT_NOT_BEFORE_KEY)
+            self.__game_abstract_not_before = (
+                {} if data is None else json.loads(data.decode("UTF-8"))
             )
-            game_abstract["start_time"] = datetime.datetime.fromtimestamp(
-                game_abstract["start_time"],
-                tz=datetime.timezone.utc,
+        return self.__game_abstract_not_before
+
+    def defer_game_abstract(
+        self,
+        game_abstract: dict,
+        not_before: datetime.datetime,
+    ) -> None:
+        # `not_before` までは `get_game_abstracts(resume=True)` が
+        # この牌譜概要を取得しないようにする．次の `get_game_abstracts`
+        # の呼び出し時に Redis に保存される．
+        not_before_table = self.__get_game_abstract_not_before()
+        not_before_table[game_abstract["key"]] = int(not_before.timestamp())
+
+    def __save_game_abstract_cursor(self) -> None:
+        # 先頭から連続して処理済みになったキーの最後をカーソルとして保存
+        # する．処理の順序は一覧の順序と一致しないので，一覧した最後の
+        # キーを保存すると，未処理のキーが次の一周まで読み飛ばされる．
+        listing = self.__game_abstract_listing
+        keys = listing["keys"]
+        unacked_keys = listing["unacked_keys"]
+        cursor = None
+        while len(keys) > 0 and keys[0] not in unacked_keys:
+            cursor = keys.popleft()
+        if cursor is not None:
+            self.__get_redis().set(
+                _GAME_ABSTRACT_CURSOR_KEY,
+                cursor.encode("UTF-8"),
             )
-            game_abstract["key"] = game_abstract_object.key
-            game_abstracts.append(game_abstract)
 
-        return game_abstracts
+    def __list_game_abstract_keys(
+        self,
+        key_prefix: str,
+        max_keys: int,
+    ) -> list[str]:
+        r = self.__get_redis()
+
+        now = datetime.datetime.now(tz=datetime.timezone.utc).timestamp()
+        not_before_table = self.__get_game_abstract_not_before()
+        for key, not_before in list(not_before_table.items()):
+            if not_before <= now:
+                del not_before_table[key]
+        data = json.dumps(not_before_table, separators=(",", ":"))
+        r.set(_GAME_ABSTRACT_NOT_BEFORE_KEY, data.encode("UTF-8"))
+
+        if self.__game_abstract_listing is None:
+            cursor = r.get(_GAME_ABSTRACT_CURSOR_KEY)
+            if cursor is not None:
+                cursor = cursor.decode("UTF-8")
+            self.__game_abstract_listing = {
+                "cursor": cursor,
+                "keys": collections.deque(),
+                "unacked_keys": set(),
+            }
+        listing = self.__game_abstract_listing
+
+        keys = []
+        for key in self.__list_keys(key_prefix, start_after=listing["cursor"]):
+            listing["cursor"] = key
+            listing["keys"].append(key)
+            if key in not_before_table:
+                continue
+            listing["unacked_keys"].add(key)
+            keys.append(key)
+            if len(keys) >= max_keys:
+                break
+        else:
+            # プレフィックスの末尾まで一覧したので，次は先頭からやり直す．
+            # 未処理のキーは先頭からの一覧でまた現れるので，保存する
+            # カーソルも先頭に戻す．
+            self.__game_abstract_listing = {
+                "cursor": None,
+                "keys": collections.deque(),
+                "unacked_keys": set(),
+            }
+            r.delete(_GAME_ABSTRACT_CURSOR_KEY)
+            return keys
+
+        self.__save_game_abstract_cursor()
+        return keys
+
+    def ack_game_abstract(self, game_abstract: dict) -> None:
+        # `get_game_abstracts(resume=True)` が返した牌譜概要の処理 (削除，
+        # 延期，牌譜詳細の取得) が済んだことを記録する．処理済みになる
+        # までは，再起動しても次の一覧でまた返す．
+        self.__ack_game_abstract_key(game_abstract["key"])
+
+    def __ack_game_abstract_key(self, key: str) -> None:
+        listing = self.__game_abstract_listing
+        if listing is None or key not in listing["unacked_keys"]:
+            return
+        listing["unacked_keys"].remove(key)
+        self.__save_game_abstract_cursor()
+
+    def __get_game_abstract(self, key: str) -> dict | None:
+        try:
+            game_abstract = self.__client.get_object(
+                Bucket=self.__bucket_name,
+                Key=key,
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "NoSuchKey":
+                logging.info(
+                    "Skipped getting an already deleted game abstract `%s`.",
+                    key,
+                )
+                return None
+            raise
+        return self.__decode_game_abstract(game_abstract["Body"].read(), key)
+
+    def get_game_abstracts(
+        self,
+        max_keys: int = 1000,
+        *,
+        concurrency: int | None = None,
+        resume: bool = False,
+    ) -> Iterator[dict]:
+        key_prefix = self.__config["game_abstract_key_prefix"]
+        key_prefix = key_prefix.rstrip("/") + "/"
 
-    def has_game_detail(self, game_abstract: dict) -> bool:
-        uuid = game_abstract["uuid"]
-        start_time = game_abstract["start_time"]
+        if concurrency is None:
+            concurrency = self.__concurrency
 
+        if resume:
+            keys = self.__list_game_abstract_keys(key_prefix, max_keys)
+        else:
+            keys = itertools.islice(self.__list_keys(key_prefix), max_keys)
+        keys = iter(keys)
+
+        for key, game_abstract in _map_concurrently(
+            lambda key: (key, self.__get_game_abstract(key)),
+            keys,
+            concurrency,
+            thread_name_prefix="GetGameAbstract",
+        ):
+            if game_abstract is None:
+                # 既に削除されていたので処理済みとみなす．
+                self.__ack_game_abstract_key(key)
+                continue
+            yield game_abstract
+
+    def __get_game_detail_key_prefix(
+        self,
+        start_time: datetime.datetime,
+    ) -> str:
         key_prefix = self.__config["game_detail_key_prefix"]
         key_prefix = re.sub("/*$", "", key_prefix)
-        key_prefix = start_time.strftime(key_prefix)
-
-        key = f"{key_prefix}/{uuid}"
-
-        game_detail_object = self.__bucket.Object(key)
-        try:
-            game_detail_object.load()
-        except botocore.exceptions.ClientError:
-            pass
+        return start_time.strftime(key_prefix)
+
+    def __get_game_detail_index(self, key_prefix: str) -> dict:
+        # プレフィックスの下をすべて一覧して UUID の集合を作り，
+        # `_GAME_DETAIL_INDEX_REFRESH_INTERVAL` 秒経ったら作り直す．UUID は
+        # 時刻順ではないので，途中からの差分の一覧では後から書き込まれた
+        # キーを拾えない．
+        index = self.__game_detail_index.get(key_prefix)
+        if index is None:
+            index = {"uuids": set(), "listed_at": None}
+            self.__game_detail_index[key_prefix] = index
+            while (
+                len(self.__game_detail_index) > _MAX_GAME_DETAIL_INDEX_PREFIXES
+            ):
+                self.__game_detail_index.popitem(last=False)
         else:
-            return True
+            self.__game_detail_index.move_to_end(key_prefix)
+
+        now = time.monotonic()
+        if (
+            index["listed_at"] is not None
+            and now - index["listed_at"] < _GAME_DETAIL_INDEX_REFRESH_INTERVAL
+        ):
+            return index
+
+        index["uuids"] = {
+            key.rsplit("/", 1)[-1]
+            for key in self.__list_keys(f"{key_prefix}/")
+        }
+        index["listed_at"] = now
 
-        start_time += datetime.timedelta(days=1)
+        return index
 
-        key_prefix = self.__config["game_detail_key_prefix"]
-        key_prefix = re.sub("/*$", "", key_prefix)
-        key_prefix = start_time.strftime(key_prefix)
+    def __has_object(self, key: str) -> bool:
+        try:
+            self.__client.head_object(Bucket=self.__bucket_name, Key=key)
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
 
-        key = f"{key_prefix}/{uuid}"
+    def has_game_detail(self, game_abstract: dict) -> bool:
+        uuid = game_abstract["uuid"]
+        start_time = game_abstract["start_time"]
 
-        game_detail_object = self.__bucket.Object(key)
-        try:
-            game_detail_object.load()
-        except botocore.exceptions.ClientError:
-            pass
-        else:
+        # 牌譜詳細は開始日か翌日のプレフィックスに置かれる．日付ごとの
+        # 存在インデックスを引き，無ければ基本的に存在しないとみなす．
+        # ただし，アーカイバが書き込み続けている前後 1 日のプレフィックス
+        # は，一覧してから時間が経っていれば HEAD で確かめる．
+        key_prefixes = [
+            self.__get_game_detail_key_prefix(
+                start_time + datetime.timedelta(days=days),
+            )
+            for days in (0, 1)
+        ]
+        indices = [
+            self.__get_game_detail_index(key_prefix)
+            for key_prefix in key_prefixes
+        ]
+        if any(uuid in index["uuids"] for index in indices):
             return True
 
+        today = datetime.datetime.now(tz=datetime.timezone.utc)
+        recent_key_prefixes = {
+            self.__get_game_detail_key_prefix(
+                today + datetime.timedelta(days=days),
+            )
+            for days in (-1, 0, 1)
+        }
+        now = time.monotonic()
+        for key_prefix, index in zip(key_prefixes, indices, strict=True):
+            if key_prefix not in recent_key_prefixes:
+                continue
+            if now - index["listed_at"] < _GAME_DETAIL_INDEX_TRUSTED_PERIOD:
+                continue
+            if self.__has_object(f"{key_prefix}/{uuid}"):
+                index["uuids"].add(uuid)
+                return True
+
         return False
 
-    def put_game_detail(self, message: bytes) -> None:
+    def put_game_detail(
+        self,
+        message: bytes,
+        *,
+        trace: dict | None = None,
+    ) -> None:
         game_abstract = game_detail_.get_game_abstract(message)
         uuid = game_abstract["uuid"]
         start_time = game_abstract["start_time"]
 
-        key_prefix = self.__config["game_detail_key_prefix"]
-        key_prefix = re.sub("/*$", "", key_prefix)
-        key_prefix = start_time.strftime(key_prefix)
-
+        key_prefix = self.__get_game_detail_key_prefix(start_time)
         key = f"{key_prefix}/{uuid}"
 
-        self.__bucket.put_object(Key=key, Body=message)
+        metadata = {}
+        if trace is not None:
+            metadata[trace_.METADATA_KEY] = trace_.to_metadata(trace)
+
+        codec = self.__game_detail_codec
+        if codec.encoding is None:
+            self.__client.put_object(
+                Bucket=self.__bucket_name,
+                Key=key,
+                Body=message,
+                Metadata=metadata,
+            )
+        else:
+            metadata["uncompressed-length"] = str(len(message))
+            if codec.dictionary_id is not None:
+                metadata["zstd-dictionary-id"] = str(codec.dictionary_id)
+            self.__client.put_object(
+                Bucket=self.__bucket_name,
+                Key=key,
+                Body=codec.compress(message),
+                ContentEncoding=codec.encoding,
+                Metadata=metadata,
+            )
+
+        if key_prefix in self.__game_detail_index:
+            self.__game_detail_index[key_prefix]["uuids"].add(uuid)
+
+    def get_game_detail(self, key: str) -> bytes:
+        game_detail = self.__client.get_object(
+            Bucket=self.__bucket_name,
+            Key=key,
+        )
+        data = game_detail["Body"].read()
+        return self.__game_detail_codec.decompress(
+            data,
+            game_detail.get("ContentEncoding"),
+        )
+
+    def __get_game_detail_trace(self, key: str) -> dict | None:
+        try:
+            response = self.__client.head_object(
+                Bucket=self.__bucket_name,
+                Key=key,
+            )
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        trace = trace_.from_metadata(response.get("Metadata", {}))
+        if trace is None:
+            return None
+        trace["key"] = key
+        return trace
+
+    def get_game_detail_traces(
+        self,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        *,
+        lookback: datetime.timedelta = datetime.timedelta(days=7),
+        concurrency: int | None = None,
+    ) -> Iterator[dict]:
+        # `[start_time, end_time)` に書き込まれた牌譜詳細のトレース．
+        # 牌譜詳細のキーは対局の開始日で分かれているので，`lookback`
+        # だけ遡った日から一覧し，一覧の LastModified で絞り込んでから
+        # メタデータを読む．
+        if concurrency is None:
+            concurrency = self.__concurrency
+
+        key_prefixes = []
+        date = start_time - lookback
+        while date < end_time + datetime.timedelta(days=1):
+            key_prefix = self.__get_game_detail_key_prefix(date)
+            if key_prefix not in key_prefixes:
+                key_prefixes.append(key_prefix)
+            date += datetime.timedelta(days=1)
+
+        keys = (
+            content["Key"]
+            for key_prefix in key_prefixes
+            for content in self.__list_objects(f"{key_prefix}/")
+            if start_time <= content["LastModified"] < end_time
+        )
+        for trace in _map_concurrently(
+            self.__get_game_detail_trace,
+            keys,
+            concurrency,
+            thread_name_prefix="GetGameDetailTrace",
+        ):
+            if trace is not None:
+                yield trace
+
+    def delete_objects(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        for i in range(0, len(keys), _MAX_DELETE_KEYS):
+            response = self.__client.delete_objects(
+                Bucket=self.__bucket_name,
+                Delete={
+                    "Objects": [
+                        {"Key": key} for key in keys[i : i + _MAX_DELETE_KEYS]
+                    ],
+                    "Quiet": True,
+                },
+            )
+            errors = response.get("Errors", [])
+            if len(errors) > 0:
+                details = "\n".join(
+                    f"{error['Key']}: {error['Code']}: {error['Message']}"
+                    for error in errors
+                )
+                msg = f"Failed to delete {len(errors)} objects:\n{details}"
+                raise RuntimeError(msg)
+
+    def delete_object(self, key: str, *, deferred: bool = False) -> None:
+        if deferred:
+            # 他のキーとまとめて，後でバックグラウンドで削除する．
+            deletion_queue = _get_deletion_queue(
+                self.__bucket_name,
+                self.delete_objects,
+            )
+            deletion_queue.put(key)
+            return
+
+        self.__client.delete_object(Bucket=self.__bucket_name, Key=key)
 
-    def delete_object(self, key: str) -> None:
-        obj = self.__bucket.Object(key)
-        obj.delete()
+    def flush_deletions(self) -> None:
+        with _deletion_queues_lock:
+            deletion_queue = _deletion_queues.get(self.__bucket_name)
+        if deletion_queue is not None:
+            deletion_queue.flush()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# ruff: noqa: N803, RUF003
+
+import datetime
+import io
+import json
+import os
+import pathlib
+import re
+import tempfile
+import time
+from collections.abc import Iterator
+
+import boto3
+import botocore.config
+import botocore.exceptions
+import botocore.model
+
+import mahjongsoul_sniffer.metrics as metrics_
+
+# `mahjongsoul_sniffer.s3.Bucket` が使う boto3 の S3 クライアントの
+# メソッドのうち，必要なものだけを同じシグネチャで実装する．オブジェクトは
+# `<root>/objects/<bucket>/<key>` に，メタデータは
+# `<root>/metadata/<bucket>/<key>` に置くので，キーの構造がそのまま
+# ディレクトリ構造になる．
+
+
+def _no_such_key(
+    *,
+    operation_name: str,
+    key: str,
+) -> botocore.exceptions.ClientError:
+    return botocore.exceptions.ClientError(
+        {
+            "Error": {
+                "Code": "NoSuchKey",
+                "Message": f"{key}: The specified key does not exist.",
+            },
+        },
+        operation_name,
+    )
+
+
+def _write_atomically(path: pathlib.Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        pathlib.Path(temp_path).replace(path)
+    except BaseException:
+        pathlib.Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+class _Paginator:
+    def __init__(self, client: "DirectoryClient", operation_name: str) -> None:
+        if operation_name not in ("list_objects", "list_objects_v2"):
+            msg = f"{operation_name}: An unsupported paginator."
+            raise RuntimeError(msg)
+        self.__client = client
+        self.__operation_name = operation_name
+
+    def paginate(self, **kwargs) -> Iterator[dict]:
+        operation = getattr(self.__client, self.__operation_name)
+        while True:
+            page = operation(**kwargs)
+            yield page
+            if not page["IsTruncated"]:
+                return
+            if self.__operation_name == "list_objects":
+                kwargs["Marker"] = page["NextMarker"]
+            else:
+                kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+
+class DirectoryClient:
+    def __init__(self, root: pathlib.Path) -> None:
+        if root.exists() and not root.is_dir():
+            msg = f"{root}: Not a directory."
+            raise RuntimeError(msg)
+        self.__root = root
+
+    def __get_object_path(self, bucket: str, key: str) -> pathlib.Path:
+        if key == "" or key.startswith("/") or ".." in key.split("/"):
+            msg = f"{key}: An unsupported key."
+            raise RuntimeError(msg)
+        return self.__root / "objects" / bucket / key
+
+    def __get_metadata_path(self, bucket: str, key: str) -> pathlib.Path:
+        return self.__root / "metadata" / bucket / key
+
+    def put_object(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        Body: bytes,
+        ContentEncoding: str | None = None,
+        Metadata: dict[str, str] | None = None,
+    ) -> dict:
+        metadata = {"Metadata": Metadata or {}}
+        if ContentEncoding is not None:
+            metadata["ContentEncoding"] = ContentEncoding
+        _write_atomically(
+            self.__get_metadata_path(Bucket, Key),
+            json.dumps(metadata).encode("UTF-8"),
+        )
+        _write_atomically(self.__get_object_path(Bucket, Key), Body)
+        return {}
+
+    def head_object(self, *, Bucket: str, Key: str) -> dict:
+        path = self.__get_object_path(Bucket, Key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError as e:
+            raise _no_such_key(operation_name="HeadObject", key=Key) from e
+        response = {
+            "ContentLength": stat.st_size,
+            "LastModified": datetime.datetime.fromtimestamp(
+                stat.st_mtime,
+                tz=datetime.timezone.utc,
+            ),
+            "Metadata": {},
+        }
+        try:
+            metadata_path = self.__get_metadata_path(Bucket, Key)
+            response.update(json.loads(metadata_path.read_bytes()))
+        except FileNotFoundError:
+            pass
+        return response
+
+    def get_object(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        Range: str | None = None,
+    ) -> dict:
+        path = self.__get_object_path(Bucket, Key)
+        try:
+            body = path.read_bytes()
+        except FileNotFoundError as e:
+            raise _no_such_key(operation_name="GetObject", key=Key) from e
+        response = self.head_object(Bucket=Bucket, Key=Key)
+        if Range is not None:
+            # `bytes=<first>-<last>` の形式だけに対応する．
+            match = re.fullmatch(r"bytes=(\d+)-(\d*)", Range)
+            if match is None:
+                msg = f"{Range}: An unsupported range."
+                raise RuntimeError(msg)
+            first = int(match.group(1))
+            last = len(body) - 1
+            if match.group(2) != "":
+                last = min(int(match.group(2)), last)
+            response["ContentRange"] = f"bytes {first}-{last}/{len(body)}"
+            body = body[first : last + 1]
+            response["ContentLength"] = len(body)
+        response["Body"] = io.BytesIO(body)
+        return response
+
+    def delete_object(self, *, Bucket: str, Key: str) -> dict:
+        self.__get_object_path(Bucket, Key).unlink(missing_ok=True)
+        self.__get_metadata_path(Bucket, Key).unlink(missing_ok=True)
+        return {}
+
+    def delete_objects(self, *, Bucket: str, Delete: dict) -> dict:
+        deleted = []
+        for obj in Delete["Objects"]:
+            self.delete_object(Bucket=Bucket, Key=obj["Key"])
+            deleted.append({"Key": obj["Key"]})
+        if Delete.get("Quiet", False):
+            return {}
+        return {"Deleted": deleted}
+
+    def __list_keys(self, bucket: str, prefix: str) -> list[str]:
+        # プレフィックスの最後の `/` までに対応するディレクトリだけを
+        # 辿る．
+        bucket_path = self.__root / "objects" / bucket
+        directory = prefix.rpartition("/")[0]
+        start_path = (
+            bucket_path / directory if directory != "" else bucket_path
+        )
+        keys = []
+        for dirpath, _, filenames in os.walk(start_path):
+            relative_path = pathlib.Path(dirpath).relative_to(bucket_path)
+            for filename in filenames:
+                if filename.startswith("."):
+                    # 書き込み途中の一時ファイル．
+                    continue
+                key = (relative_path / filename).as_posix()
+                if key.startswith(prefix):
+                    keys.append(key)
+        keys.sort()
+        return keys
+
+    def __list(
+        self,
+        bucket: str,
+        prefix: str,
+        start_after: str | None,
+        max_keys: int,
+    ) -> tuple[list[dict], bool]:
+        keys = self.__list_keys(bucket, prefix)
+        if start_after is not None:
+            keys = [key for key in keys if key > start_after]
+        truncated = len(keys) > max_keys
+        contents = []
+        for key in keys[:max_keys]:
+            stat = self.__get_object_path(bucket, key).stat()
+            contents.append(
+                {
+                    "Key": key,
+                    "Size": stat.st_size,
+                    "LastModified": datetime.datetime.fromtimestamp(
+                        stat.st_mtime,
+                        tz=datetime.timezone.utc,
+                    ),
+                },
+            )
+        return contents, truncated
+
+    def list_objects(
+        self,
+        *,
+        Bucket: str,
+        Prefix: str = "",
+        Marker: str | None = None,
+        MaxKeys: int = 1000,
+    ) -> dict:
+        contents, truncated = self.__list(Bucket, Prefix, Marker, MaxKeys)
+        response = {"Contents": contents, "IsTruncated": truncated}
+        if truncated:
+            response["NextMarker"] = contents[-1]["Key"]
+        return response
+
+    def list_objects_v2(
+        self,
+        *,
+        Bucket: str,
+        Prefix: str = "",
+        StartAfter: str | None = None,
+        ContinuationToken: str | None = None,
+        MaxKeys: int = 1000,
+    ) -> dict:
+        start_after = ContinuationToken or StartAfter
+        contents, truncated = self.__list(Bucket, Prefix, start_after, MaxKeys)
+        response = {
+            "Contents": contents,
+            "KeyCount": len(contents),
+            "IsTruncated": truncated,
+        }
+        if truncated:
+            response["NextContinuationToken"] = contents[-1]["Key"]
+        return response
+
+    def get_paginator(self, operation_name: str) -> _Paginator:
+        return _Paginator(self, operation_name)
+
+
+def _start_request_timer(context: dict, **kwargs) -> None:  # noqa: ARG001
+    context["metrics_start_time"] = time.perf_counter()
+
+
+def _observe_request_time(
+    model: botocore.model.OperationModel,
+    context: dict,
+    **kwargs,  # noqa: ARG001
+) -> None:
+    if "metrics_start_time" not in context:
+        return
+    metrics_.histogram(
+        "s3_request_seconds",
+        "Latency of S3 requests including retries.",
+        labels={"operation": model.name},
+    ).observe(time.perf_counter() - context["metrics_start_time"])
+
+
+def create_client(config: dict, *, max_pool_connections: int = 10):  # noqa: ANN201
+    # `config` は設定ファイルの `s3` セクション．
+    backend_config = config.get("backend", {"type": "s3"})
+    backend_type = backend_config["type"]
+
+    if backend_type == "directory":
+        return DirectoryClient(pathlib.Path(backend_config["path"]))
+
+    assert backend_type == "s3"  # noqa: S101
+    client = boto3.client(
+        "s3",
+        endpoint_url=backend_config.get("endpoint_url"),
+        config=botocore.config.Config(
+            max_pool_connections=max_pool_connections,
+        ),
+    )
+    client.meta.events.register("before-call.s3", _start_request_timer)
+    client.meta.events.register("after-call.s3", _observe_request_time)
+    return client
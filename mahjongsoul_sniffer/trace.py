@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import json
+import math
+import time
+from collections.abc import Iterable
+
+# 牌譜詳細がスニファから S3 に届くまでの各段階．
+#
+# - `sniffed`: スニファが `SET game-detail` したとき (エンベロープの
+#   `timestamp`)．
+# - `polled`: クローラが `game-detail` を読み出したとき．
+# - `enqueued`: クローラが `game-detail-list` に積んだとき．
+# - `dequeued`: アーカイバが `game-detail-list` から取り出したとき．
+# - `uploading`: アーカイバが S3 への書き込みを始めたとき．検証の時間は
+#   `dequeued` からここまでに含まれる．
+#
+# トレースコンテキストは `{"uuid": ..., "stages": {段階: UNIX 時間}}`
+# で，WebSocket メッセージのエンベロープに載せて運び，最後に牌譜詳細の
+# オブジェクトのメタデータ `trace` に書く．メタデータは書き込みと同時に
+# 決まるので，書き込みを終えた時刻は載せられない．書き込みの所要時間は
+# アーカイバのメトリクス `game_detail_upload_seconds` で見る．
+STAGES = (
+    "sniffed",
+    "polled",
+    "enqueued",
+    "dequeued",
+    "uploading",
+)
+
+METADATA_KEY = "trace"
+
+
+def mark(
+    message: dict,
+    stage: str,
+    *,
+    uuid: str | None = None,
+    timestamp: float | None = None,
+) -> None:
+    if stage not in STAGES:
+        msg = f"{stage}: An unknown trace stage."
+        raise RuntimeError(msg)
+
+    trace = message.setdefault("trace", {})
+    if trace.get("uuid") is None:
+        trace["uuid"] = uuid
+    stages = trace.setdefault("stages", {})
+    if "sniffed" not in stages and "timestamp" in message:
+        stages["sniffed"] = message["timestamp"].timestamp()
+    stages[stage] = time.time() if timestamp is None else timestamp
+
+
+def to_metadata(trace: dict) -> str:
+    return json.dumps(trace, separators=(",", ":"))
+
+
+def from_metadata(metadata: dict[str, str]) -> dict | None:
+    if METADATA_KEY not in metadata:
+        return None
+    return json.loads(metadata[METADATA_KEY])
+
+
+def _percentile(values: list[float], p: float) -> float:
+    # `values` はソート済み．最近傍順位法．
+    rank = max(math.ceil(p / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(traces: Iterable[dict]) -> list[dict]:
+    # 隣り合う段階の間と，最初から最後までの所要時間 (秒) の件数，
+    # p50，p99，最大値．段階が欠けているトレースはその区間だけ数えない．
+    intervals = [(STAGES[i], STAGES[i + 1]) for i in range(len(STAGES) - 1)]
+    intervals.append((STAGES[0], STAGES[-1]))
+    durations: dict[tuple[str, str], list[float]] = {
+        interval: [] for interval in intervals
+    }
+
+    for trace in traces:
+        stages = trace.get("stages", {})
+        for start, end in intervals:
+            if start in stages and end in stages:
+                durations[start, end].append(stages[end] - stages[start])
+
+    summary = []
+    for (start, end), values in durations.items():
+        values.sort()
+        entry = {"from": start, "to": end, "count": len(values)}
+        if len(values) > 0:
+            entry["p50"] = _percentile(values, 50)
+            entry["p99"] = _percentile(values, 99)
+            entry["max"] = values[-1]
+        summary.append(entry)
+    return summary
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# ruff: noqa: RUF003
+
+import base64
+import datetime
+import json
+import struct
+
+import jsonschema
+
+from mahjongsoul_sniffer.claim_check import ClaimCheck
+
+# バイナリ形式のエンベロープ．
+#
+#   magic (4 bytes) | version (1 byte) | flags (1 byte) |
+#   timestamp (float64, LE) | request length (uint32, LE) |
+#   response length (uint32, LE) | request | response
+#
+# JSON 形式のメッセージは必ず `{` から始まるので，先頭の magic で
+# どちらの形式かを判別できる．
+#
+# バージョン 2 では，閾値を超える request / response の代わりに
+# claim check のダイジェストを格納できる (対応するフラグで示す)．
+#
+# バージョン 3 では，response の後ろにトレースコンテキスト
+# (`mahjongsoul_sniffer.trace`) を
+#
+#   trace length (uint32, LE) | trace (JSON)
+#
+# の形で付けられる (対応するフラグで示す)．
+_MAGIC = b"MSWS"
+_VERSION = 3
+_SUPPORTED_VERSIONS = (1, 2, 3)
+_HEADER = struct.Struct("<4sBBdII")
+_TRACE_LENGTH = struct.Struct("<I")
+_FLAG_OUTBOUND = 0x01
+_FLAG_HAS_RESPONSE = 0x02
+_FLAG_REQUEST_CLAIM_CHECK = 0x04
+_FLAG_RESPONSE_CLAIM_CHECK = 0x08
+_FLAG_HAS_TRACE = 0x10
+
+
+_WEBSOCKET_MESSAGE_SCHEMA = {
+    "type": "object",
+    "required": [
+        "request_direction",
+        "request",
+        "response",
+        "timestamp",
+    ],
+    "properties": {
+        "request_direction": {
+            "enum": [
+                "inbound",
+                "outbound",
+            ],
+        },
+        "request": {
+            "type": "string",
+        },
+        "response": {
+            "type": [
+                "string",
+                "null",
+            ],
+        },
+        "timestamp": {
+            "type": "number",
+        },
+    },
+    "additionalProperties": False,
+}
+
+
+def encode(message: dict, claim_check: ClaimCheck | None = None) -> bytes:
+    request_direction = message["request_direction"]
+    request = message["request"]
+    response = message["response"]
+    timestamp = message["timestamp"]
+
+    flags = 0
+    if request_direction == "outbound":
+        flags |= _FLAG_OUTBOUND
+    elif request_direction != "inbound":
+        msg = f"{request_direction}: An invalid request direction."
+        raise RuntimeError(msg)
+    if response is not None:
+        flags |= _FLAG_HAS_RESPONSE
+    else:
+        response = b""
+
+    if claim_check is not None:
+        if claim_check.should_offload(request):
+            request = claim_check.put(request)
+            flags |= _FLAG_REQUEST_CLAIM_CHECK
+        if claim_check.should_offload(response):
+            response = claim_check.put(response)
+            flags |= _FLAG_RESPONSE_CLAIM_CHECK
+
+    trace = b""
+    if message.get("trace"):
+        flags |= _FLAG_HAS_TRACE
+        trace = json.dumps(message["trace"], separators=(",", ":"))
+        trace = trace.encode("UTF-8")
+        trace = _TRACE_LENGTH.pack(len(trace)) + trace
+
+    header = _HEADER.pack(
+        _MAGIC,
+        _VERSION,
+        flags,
+        timestamp.timestamp(),
+        len(request),
+        len(response),
+    )
+    return b"".join((header, request, response, trace))
+
+
+def encode_json(message: dict) -> bytes:
+    request = base64.b64encode(message["request"]).decode("UTF-8")
+    response = message["response"]
+    if response is not None:
+        response = base64.b64encode(response).decode("UTF-8")
+    message = {
+        "request_direction": message["request_direction"],
+        "request": request,
+        "response": response,
+        "timestamp": message["timestamp"].timestamp(),
+    }
+    jsonschema.validate(instance=message, schema=_WEBSOCKET_MESSAGE_SCHEMA)
+
+    message = json.dumps(message, allow_nan=False, separators=(",", ":"))
+    return message.encode("UTF-8")
+
+
+def _resolve(data: bytes, claim_check: ClaimCheck | None) -> bytes:
+    if claim_check is None:
+        msg = "A claim-checked WebSocket message is read without a claim\
+ check."
+        raise RuntimeError(msg)
+    return claim_check.get(data)
+
+
+def _decode_binary(data: bytes, claim_check: ClaimCheck | None) -> dict:
+    if len(data) < _HEADER.size:
+        msg = f"{len(data)}: A truncated WebSocket message header."
+        raise RuntimeError(msg)
+
+    _, version, flags, timestamp, request_length, response_length = (
+        _HEADER.unpack_from(data)
+    )
+    if version not in _SUPPORTED_VERSIONS:
+        msg = f"{version}: An unsupported WebSocket message version."
+        raise RuntimeError(msg)
+
+    request_end = _HEADER.size + request_length
+    response_end = request_end + response_length
+    end = response_end
+    trace = None
+    if flags & _FLAG_HAS_TRACE:
+        if len(data) < response_end + _TRACE_LENGTH.size:
+            msg = "A truncated trace of a WebSocket message."
+            raise RuntimeError(msg)
+        (trace_length,) = _TRACE_LENGTH.unpack_from(data, response_end)
+        trace_start = response_end + _TRACE_LENGTH.size
+        end = trace_start + trace_length
+        trace = json.loads(data[trace_start:end])
+    if end != len(data):
+        msg = f"""The length of a WebSocket message does not match its header:
+header: {end}
+actual: {len(data)}"""
+        raise RuntimeError(msg)
+
+    request = data[_HEADER.size : request_end]
+    if flags & _FLAG_REQUEST_CLAIM_CHECK:
+        request = _resolve(request, claim_check)
+    response = None
+    if flags & _FLAG_HAS_RESPONSE:
+        response = data[request_end:response_end]
+        if flags & _FLAG_RESPONSE_CLAIM_CHECK:
+            response = _resolve(response, claim_check)
+
+    message = {
+        "request_direction": (
+            "outbound" if flags & _FLAG_OUTBOUND else "inbound"
+        ),
+        "request": request,
+        "response": response,
+        "timestamp": datetime.datetime.fromtimestamp(
+            timestamp,
+            tz=datetime.timezone.utc,
+        ),
+    }
+    if trace is not None:
+        message["trace"] = trace
+    return message
+
+
+def _decode_json(data: bytes) -> dict:
+    message = data.decode("UTF-8")
+    message = json.loads(message)
+    jsonschema.validate(instance=message, schema=_WEBSOCKET_MESSAGE_SCHEMA)
+
+    message["request"] = base64.b64decode(message["request"])
+    if message["response"] is not None:
+        message["response"] = base64.b64decode(message["response"])
+    message["timestamp"] = datetime.datetime.fromtimestamp(
+        message["timestamp"],
+        tz=datetime.timezone.utc,
+    )
+
+    return message
+
+
+def decode(data: bytes, claim_check: ClaimCheck | None = None) -> dict:
+    if data.startswith(_MAGIC):
+        return _decode_binary(data, claim_check)
+    # バイナリ形式導入前に書き込まれた JSON 形式のメッセージ．
+    return _decode_json(data)
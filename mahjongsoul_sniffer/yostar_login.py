@@ -31,11 +31,12 @@ class YostarLogin:
 
         target_date = None
         target_content = None
+        # 削除するメールは最後にまとめて削除する．
+        keys_to_delete = []
 
         for key, email in emails.items():
             if "Date" not in email:
-                self.__s3_bucket.delete_object(key)
-                logging.info("Deleted the object `%s`.", key)
+                keys_to_delete.append(key)
                 continue
             date = datetime.datetime.strptime(
                 email["Date"],
@@ -46,13 +47,11 @@ class YostarLogin:
             if date < now - datetime.timedelta(minutes=30):
                 # 認証コードの有効期限が30分なので，30分以上前に送られた
                 # メールは無条件で削除する．
-                self.__s3_bucket.delete_object(key)
-                logging.info("Deleted the object `%s`.", key)
+                keys_to_delete.append(key)
                 continue
 
             if "To" not in email:
-                self.__s3_bucket.delete_object(key)
-                logging.info("Deleted the object `%s`.", key)
+                keys_to_delete.append(key)
                 continue
             if email["To"] != self.__email_address:
                 # 宛先が異なるメールは他のクローラに対して送られた
@@ -60,37 +59,35 @@ class YostarLogin:
                 continue
 
             if date < start_time:
-                self.__s3_bucket.delete_object(key)
-                logging.info("Deleted the object `%s`.", key)
+                keys_to_delete.append(key)
                 continue
             if target_date is not None and date < target_date:
-                self.__s3_bucket.delete_object(key)
-                logging.info("Deleted the object `%s`.", key)
+                keys_to_delete.append(key)
                 continue
 
             if "From" not in email:
-                self.__s3_bucket.delete_object(key)
-                logging.info("Deleted the object `%s`.", key)
+                keys_to_delete.append(key)
                 continue
             if email["From"] != "info@passport.yostar.co.jp":
-                self.__s3_bucket.delete_object(key)
-                logging.info("Deleted the object `%s`.", key)
+                keys_to_delete.append(key)
                 continue
 
             if "Subject" not in email:
-                self.__s3_bucket.delete_object(key)
-                logging.info("Deleted the object `%s`.", key)
+                keys_to_delete.append(key)
                 continue
             if email["Subject"] != "Eメールアドレスの確認":
-                self.__s3_bucket.delete_object(key)
-                logging.info("Deleted the object `%s`.", key)
+                keys_to_delete.append(key)
                 continue
 
+            # 本文は条件を満たすメールについてだけ取得する．
             target_date = date
-            body = email.get_body()
+            body = self.__s3_bucket.get_authentication_email(key).get_body()
             target_content = body.get_content()
 
-            self.__s3_bucket.delete_object(key)
+            keys_to_delete.append(key)
+
+        self.__s3_bucket.delete_objects(keys_to_delete)
+        for key in keys_to_delete:
             logging.info("Deleted the object `%s`.", key)
 
         if target_content is None: